@@ -1,26 +1,102 @@
 import environment as env
+import pipeline
+import forecasting
+import kernels
 from scenario import Scenario
 import config
 
+import copy
 import pandas as pd
 import datetime as dt
 import numpy as np
 
+LOG_COLUMNS = ["offer_DA", "offer_IA", "offer_IC", "grid_feedin", "costs", "battery_charge", "pv", "load", "balance",
+               "grid_demand", "grid_supply", "Time"]
+ACTION_COLUMNS = ["Time", "Market", "Price", "Quantity"]
+VIOLATION_COLUMNS = ["Time", "Text"]
+
+# ring buffers of the forecast window of the agent
+FORECAST_BUFFERS = ["pv_forecast", "load_forecast", "battery_forecast", "discharge", "charge", "grid_demand", "grid_supply", "surplus_agg"]
+
+def check_step(sc : Scenario, index, time, charge, discharge, grid_demand, grid_supply, load, pv, battery, delivered) -> tuple:
+    """
+    Checks the validity of the action taken in a time step through different constraints
+    :param sc: the scenario
+    :param index: the index of the time step
+    :param time: the time of the time step
+    :param charge: the battery charge in the time step
+    :param discharge: the battery discharge in the time step
+    :param grid_demand: the energy bought from the grid in the time step
+    :param grid_supply: the energy fed into the grid in the time step
+    :param load: the load in the time step
+    :param pv: the pv generation in the time step
+    :param battery: the battery state in the time step
+    :param delivered: the energy quantity delivered to the market in the time step
+    :return: the load balance of the time step and a list of violation log rows
+    """
+
+    # the numbers are formatted as floats, whether they are Python ints, Python floats or NumPy floats
+    rows = list()
+
+    # non-negativity
+    if(charge < 0):
+        rows.append([time, f"{index}: non-negativity charge: {float(charge)}"])
+
+    if(discharge < 0):
+        rows.append([time, f"{index}: non-negativity charge: {float(discharge)}"])
+
+    if(grid_demand < 0):
+        rows.append([time, f"{index}: non-negativity grid_demand: {float(grid_demand)}"])
+
+    if(grid_supply < 0):
+        rows.append([time, f"{index}: non-negativity grid_supply: {float(grid_supply)}"])
+
+    # battery state
+    if(battery < sc.battery_charge_min):
+        rows.append([time, f"{index}: battery minimum charge: {float(battery)}"])
+
+    if(battery > sc.battery_charge_max):
+        rows.append([time, f"{index}: battery maximum charge: {float(battery)}"])
+
+    # only one of grid supply/demand and battery charge/discharge
+    if(grid_demand > 0.000001 and grid_supply > 0.000001):
+        rows.append([time, f"{index}: grid supply and demand: {float(grid_supply)}; {float(grid_demand)}"])
+
+    if(charge > 0.000001 and discharge > 0.000001):
+        rows.append([time, f"{index}: battery charge and discharge: {float(charge)}; {float(discharge)}"])
+
+    # load balancing
+    balance = pv + discharge - charge + \
+        grid_demand - grid_supply - delivered - load
+    if(not np.isclose(balance, 0, atol = 0.000001)):
+        rows.append([time, f"{index}: load balance: {float(balance)}"])
+
+    return (balance, rows)
+
+
 class Agent():
     """
     Models the agent and contains the algorithm for taking optimized actions
     """
 
-    def __init__(self, sc : Scenario) -> None:
-        self.market = env.Market(sc)
-        self.household = env.Household(sc)
+    def __init__(self, sc : Scenario, data = None) -> None:
+        """
+        :param sc: the scenario
+        :param data: an optional environment.DataSet shared between runs, read from the data source of the scenario if None
+        """
+
+        if(len(sc.changes) > 0): # the changes during the run are applied to a copy of the scenario shared by the agent and its environment
+            sc = copy.copy(sc)
+
+        self.market = env.Market(sc, data)
+        self.household = env.Household(sc, data)
 
         self.scenario = sc
 
         self.time = self.scenario.t_start
 
         # technical housekeeping variables
-        self.length_forecast = 192 # 2 * 96 to observe future pv, load and battery data up to 2 days in advance
+        self.length_forecast = sc.forecast_steps # to observe future pv, load and battery data up to 2 days in advance
         self.index_f = 0 # current forecast index
         self.valid_f = 0 # forecast validity index
 
@@ -36,129 +112,475 @@ class Agent():
         
         self.contracts = list() # a list of active contracts
 
+        # optional kernels.Kernels for the loops over the forecast window and the contracts, see the scenario key kernels
+        # the kernels work on the battery and surplus forecasts as arrays and on the delivery steps and quantities of the contracts
+        self.kernels = kernels.load(sc.kernels)
+        if(self.kernels is not None):
+            self.battery_forecast = np.array(self.battery_forecast, dtype = float)
+            self.surplus_agg = np.array(self.surplus_agg, dtype = float)
+            self.contract_book = kernels.ContractBook()
+
         self.price_dict = dict() # initialize market price estimates with start prices
-        self.price_dict["DA"] = [0] * 96
-        self.price_dict["IA"] = [0] * 96
-        self.price_dict["IC"] = [0] * 96
+        self.price_dict["DA"] = [0] * sc.steps_per_day
+        self.price_dict["IA"] = [0] * sc.steps_per_day
+        self.price_dict["IC"] = [0] * sc.steps_per_day
+
+        # logging dataframes, built from the row buffers at the end of the run
+        self.log_pd = pd.DataFrame(columns=LOG_COLUMNS)
+        self.action_log = pd.DataFrame(columns=ACTION_COLUMNS)
+        self.violation_log = pd.DataFrame(columns=VIOLATION_COLUMNS)
+
+        # row buffers for the logs, appending to a DataFrame row by row is too slow for long runs
+        self.log_rows = list()
+        self.action_rows = list()
+        self.violation_rows = list()
+
+        # optional logstore.LogStore to which the logs are written in chunks while the run progresses
+        self.log_store = None
+        self.flushed = {"log": 0, "actions": 0, "violations": 0} # number of rows already written per log
 
-        # logging dataframes
-        self.log_pd = pd.DataFrame(columns=["offer_DA", "offer_IA", "offer_IC", "grid_feedin", "costs", "battery_charge", "pv", "load", "balance", "Time"])
-        self.action_log = pd.DataFrame(columns=["Time", "Market", "Price", "Quantity"])
-        self.violation_log = pd.DataFrame(columns=["Time", "Text"])
+        # optional pipeline.LogPipeline that validates and logs the time steps in a background thread, see the scenario key log-pipeline
+        self.pipeline = None
+
+        # optional telemetry.Telemetry that reports the progress of the run
+        self.telemetry = None
+
+        # optional forecasting.ForecastErrors of the pv and load forecasts, generated from the scenario at the start of the run if None,
+        # see the scenario keys forecast-error-pv and forecast-error-load
+        self.forecast_errors = None
+
+        # optional snapshots.Recorder that stores snapshots of the state at given time steps, see session.Session
+        self.snapshots = None
+        self.reused_steps = 0 # number of time steps restored from a snapshot instead of simulated
+
+        self.next_change = 0 # index of the next change of the scenario to take effect, see the scenario key changes
 
         # violation counter for validation and debug purposes
         self.violations = 0
 
-    def run(self) -> None:
+    def run(self, state = None) -> None:
         """
         Runs the optimization over the given time for the given environment
+        :param state: an optional snapshot of the state at a time step, see getState, the run continues from it
         """
 
-        LAMBDA = self.scenario.price_average_coefficient
+        self.gains = dict()
+        self.gains["grid"] = 0
+        self.gains["DA"] = 0
+        self.gains["IA"] = 0
+        self.gains["IC"] = 0
 
-        gains = dict()
-        gains["grid"] = 0
-        gains["DA"] = 0
-        gains["IA"] = 0
-        gains["IC"] = 0
+        self.costs = 0
 
-        costs = 0
+        if(self.scenario.log_pipeline and len(self.scenario.changes) > 0):
+            raise ValueError("changes during a run cannot be combined with the log pipeline, which validates the time steps later")
 
-        # handle the situation in the first time step
-        # here, no market offer is possible
-        (load, pv, battery, _, _, _, _) = self.getForecasts(0)
-        if(pv - load > 0): # if there is an energy surplus, use is to charge the battery or feed it into the grid
-            if(battery + pv - load <= self.scenario.battery_charge_max): self.updateForecasts(0, pv - load, 0, 0, 0, 0)
-            else: self.updateForecasts(0, 0, 0, 0, pv - load, 0)
-        else: self.updateForecasts(0, 0, 0, load - pv, 0, 0) # satisfy a deficit from the grid
+        if(self.forecast_errors is None and forecasting.enabled(self.scenario)):
+            self.forecast_errors = forecasting.generate(self.scenario, 1, self.scenario.forecast_error_seed)[0]
 
-        for index in range(self.scenario.number_of_intervals):
+        # fast-forwarding is only valid for the greedy policy implemented in this class and for fixed forecasts
+        fast_forward = self.scenario.fast_forward and type(self).greedy is Agent.greedy and self.forecast_errors is None
+        if(fast_forward):
+            self.events = self.getEventSchedule()
+            if(self.snapshots is not None): # the snapshots are taken between two time steps
+                self.events[self.snapshots.indices] = True
 
-            prices = self.market.getMarketPrices()
+        if(state is not None):
+            self.setState(state)
+        else:
+            # handle the situation in the first time step
+            # here, no market offer is possible
+            (load, pv, battery, _, _, _, _) = self.getForecasts(0)
+            if(pv - load > 0): # if there is an energy surplus, use is to charge the battery or feed it into the grid
+                if(battery + pv - load <= self.scenario.battery_charge_max): self.updateForecasts(0, pv - load, 0, 0, 0, 0)
+                else: self.updateForecasts(0, 0, 0, 0, pv - load, 0)
+            else: self.updateForecasts(0, 0, 0, load - pv, 0, 0) # satisfy a deficit from the grid
+
+        if(self.scenario.log_pipeline):
+            self.pipeline = pipeline.LogPipeline(self.scenario, self.log_store)
+
+        if(self.telemetry is not None):
+            self.telemetry.start(self.scenario)
+
+        status = "failed"
+        try:
+            self.simulate(fast_forward, self.reused_steps)
+            status = "done"
+        finally:
+            # also write the logs of the time steps simulated so far if the run is interrupted
+            if(self.pipeline is not None):
+                self.pipeline.close()
+            elif(self.log_store is not None):
+                self.flushLogs()
+            if(self.telemetry is not None):
+                self.telemetry.finish(self, status)
+
+        if(self.pipeline is not None):
+            self.log_pd = self.pipeline.getLog()
+            self.action_rows = self.pipeline.action_rows
+            self.violation_rows = self.pipeline.violation_rows
+            self.violations += self.pipeline.violations
+        else:
+            self.log_pd = pd.DataFrame(self.log_rows, columns=LOG_COLUMNS)
+        self.action_log = pd.DataFrame(self.action_rows, columns=ACTION_COLUMNS)
+        self.violation_log = pd.DataFrame(self.violation_rows, columns=VIOLATION_COLUMNS)
+
+    def simulate(self, fast_forward, index = 0) -> None:
+        """
+        Simulates the time steps of the run
+        :param fast_forward: whether to advance through stretches of time steps without events at once
+        :param index: the index of the first time step to simulate
+        """
 
-            delivered = 0 # cumulated energy quantity to deliver to the market in this time slot
-            # check if contracts need to be fulfilled at the current time
-            i = 0
-            while i < len(self.contracts):
-                (market, delivery_time, quantity, _) = self.contracts[i]
+        while index < self.scenario.number_of_intervals:
 
-                if(delivery_time <= self.time): # if the contract is to be fulfilled now
-                    gains[market] += prices[market] * quantity # obtain the money
-                    delivered += quantity
-                    self.action_log.loc[len(self.action_log)] = [self.time, market, prices[market], quantity] # log the action
-                    self.contracts.pop(i) # delete the fulfilled contract from the list of open contracts
-                    i -= 1
-                i += 1
+            if(self.snapshots is not None and index == self.snapshots.next_index):
+                self.snapshots.record(self, index)
+
+            # apply the changes of the scenario that take effect in this time step
+            while(self.next_change < len(self.scenario.changes) and self.scenario.changes[self.next_change][0] <= self.time):
+                self.scenario.apply(self.scenario.changes[self.next_change][1])
+                self.next_change += 1
+            LAMBDA = self.scenario.price_average_coefficient
+
+            if(self.telemetry is not None and index >= self.telemetry.next_index):
+                self.telemetry.report(self, index)
+
+            if(self.pipeline is None and self.log_store is not None and len(self.log_rows) - self.flushed["log"] >= config.LOG_CHUNK_SIZE):
+                self.flushLogs()
+
+            # advance through a stretch of time steps without events at once if possible
+            if(fast_forward and not self.events[index]):
+                advanced = self.fastForward(index)
+                if(advanced > 0):
+                    index += advanced
+                    continue
+
+            # revise the forecasts of the lookahead window, the current time step gets its realized pv and load
+            if(self.forecast_errors is not None):
+                self.forecast_errors.revise(self, index)
+
+            prices = self.market.getMarketPrices()
+            actions = len(self.action_rows) # rows logged in this time step, handed over to the pipeline
+            violations = len(self.violation_rows)
+
+            # fulfill the contracts to be delivered at the current time
+            (delivered, unexecuted) = self.settleContracts(index, prices)
 
             # update running price average
-            self.price_dict["DA"][(index + 48) % 96] = self.price_dict["DA"][(index + 48) % 96] * LAMBDA + prices["DA"] * (1 - LAMBDA)
-            self.price_dict["IA"][(index + 48) % 96] = self.price_dict["IA"][(index + 48) % 96] * LAMBDA + prices["IA"] * (1 - LAMBDA)
-            self.price_dict["IC"][(index + 48) % 96] = self.price_dict["IC"][(index + 48) % 96] * LAMBDA + prices["IC"] * (1 - LAMBDA)
+            p = (index + self.scenario.steps_per_day // 2) % self.scenario.steps_per_day
+            self.price_dict["DA"][p] = self.price_dict["DA"][p] * LAMBDA + prices["DA"] * (1 - LAMBDA)
+            self.price_dict["IA"][p] = self.price_dict["IA"][p] * LAMBDA + prices["IA"] * (1 - LAMBDA)
+            self.price_dict["IC"][p] = self.price_dict["IC"][p] * LAMBDA + prices["IC"] * (1 - LAMBDA)
 
             # determine the action to take using a greedy approach
             self.greedy()
+            if(self.forecast_errors is not None):
+                self.forecast_errors.settle(self)
 
-            # check the validity of the action through different constraints
-            # non-negativity
-            if(self.charge[self.index_f] < 0):
-                self.violation_log.loc[len(self.violation_log)] = \
-                    [self.time, f"{index}: non-negativity charge: {self.charge[self.index_f]}"]
-                self.violations += 1
-            
-            if(self.discharge[self.index_f] < 0):
-                self.violation_log.loc[len(self.violation_log)] = \
-                    [self.time, f"{index}: non-negativity charge: {self.discharge[self.index_f]}"]
-                self.violations += 1
-            
-            if(self.grid_demand[self.index_f] < 0):
-                self.violation_log.loc[len(self.violation_log)] = \
-                    [self.time, f"{index}: non-negativity grid_demand: {self.grid_demand[self.index_f]}"]
-                self.violations += 1
-            
-            if(self.grid_supply[self.index_f] < 0):
-                self.violation_log.loc[len(self.violation_log)] = \
-                    [self.time, f"{index}: non-negativity grid_supply: {self.grid_supply[self.index_f]}"]
-                self.violations += 1
-
-            # battery state
             (load, pv, battery, _, _, _, _) = self.getForecasts(0)
-            if(battery < self.scenario.battery_charge_min):
-                self.violation_log.loc[len(self.violation_log)] = \
-                    [self.time, f"{index}: battery minimum charge: {battery}"]
-                self.violations += 1
-            
-            if(battery > self.scenario.battery_charge_max):
-                self.violation_log.loc[len(self.violation_log)] = \
-                    [self.time, f"{index}: battery maximum charge: {battery}"]
-                self.violations += 1
-
-            # only one of grid supply/demand and battery charge/discharge
-            if(self.grid_demand[self.index_f] > 0.000001 and self.grid_supply[self.index_f] > 0.000001):
-                self.violation_log.loc[len(self.violation_log)] = \
-                    [self.time, f"{index}: grid supply and demand: {self.grid_supply[self.index_f]}; {self.grid_demand[self.index_f]}"]
-                self.violations += 1
-
-            if(self.charge[self.index_f] > 0.000001 and self.discharge[self.index_f] > 0.000001):
-                self.violation_log.loc[len(self.violation_log)] = \
-                    [self.time, f"{index}: battery charge and discharge: {self.charge[self.index_f]}; {self.discharge[self.index_f]}"]
-                self.violations += 1
-            
-            # load balancing
-            balance = pv + self.discharge[self.index_f] - self.charge[self.index_f] + \
-                self.grid_demand[self.index_f] - self.grid_supply[self.index_f] - delivered - load
-            if(not np.isclose(balance, 0, atol = 0.000001)):
-                self.violation_log.loc[len(self.violation_log)] = \
-                    [self.time, f"{index}: load balance: {balance}"]
-                self.violations += 1
-
-            costs += self.grid_demand[self.index_f] * self.scenario.grid_price_residential
-            gains["grid"] += self.grid_supply[self.index_f] * self.scenario.grid_price_feedin
-
-            self.log_pd.loc[len(self.log_pd)] = [gains["DA"], gains["IA"], gains["IC"], gains["grid"], costs,
-                                                 battery, pv, load, balance, self.time]
+            r = self.index_f
+
+            self.costs += self.grid_demand[r] * self.scenario.grid_price_residential
+            self.gains["grid"] += self.grid_supply[r] * self.scenario.grid_price_feedin
+
+            if(self.pipeline is not None): # the validation and logging is done in the background
+                self.pipeline.push((index, self.time, self.charge[r], self.discharge[r], self.grid_demand[r], self.grid_supply[r],
+                                    battery, pv, load, delivered, unexecuted, self.gains["DA"], self.gains["IA"], self.gains["IC"],
+                                    self.gains["grid"], self.costs, self.action_rows[actions:], self.violation_rows[violations:]))
+                del self.action_rows[actions:]
+                del self.violation_rows[violations:]
+            else:
+                # check the validity of the action through different constraints
+                balance = self.checkConstraints(index, r, load, pv, battery, delivered)
+                self.log_rows.append([self.gains["DA"], self.gains["IA"], self.gains["IC"], self.gains["grid"], self.costs,
+                                      battery, pv, load, balance, self.grid_demand[r], self.grid_supply[r] + unexecuted, self.time])
             
             self.updateHousekeeping()
-            self.time = self.time + config.T_DELTA
+            self.time = self.time + self.scenario.t_delta
+            index += 1
+
+    def settleContracts(self, index, prices) -> tuple:
+        """
+        Settles the contracts to be delivered at the current time on the market and removes them from the open contracts
+        :param index: the index of the current time step
+        :param prices: the market prices of the current time step
+        :return: the energy quantity delivered to the market and the energy quantity of offers that were not executed on the market
+        and is fed into the grid, in the form (delivered, unexecuted)
+        """
+
+        delivered = 0 # cumulated energy quantity to deliver to the market in this time slot
+        unexecuted = 0 # energy quantity of offers that were not executed on the market and is fed into the grid
+
+        if(self.kernels is not None): # find the due contracts by their delivery steps
+            due = self.kernels.due_contracts(self.contract_book.steps, self.contract_book.count, index)
+            settled = [self.contracts[i] for i in due]
+            self.contract_book.remove(due)
+            due = set(due.tolist())
+            self.contracts = [c for i, c in enumerate(self.contracts) if i not in due]
+        else:
+            settled = list()
+            i = 0
+            while i < len(self.contracts):
+                if(self.contracts[i][1] <= self.time): # if the contract is to be fulfilled now
+                    settled.append(self.contracts.pop(i)) # delete the fulfilled contract from the list of open contracts
+                    i -= 1
+                i += 1
+
+        for c in settled:
+            (market, delivery_time, quantity, _) = c
+            (revenue, executed, price) = self.market.settle(c, prices[market])
+            self.gains[market] += revenue # obtain the money
+            delivered += quantity
+            if(executed < quantity): # energy of an offer that was not executed on the market is fed into the grid
+                self.gains["grid"] += (quantity - executed) * self.scenario.grid_price_feedin
+                unexecuted += quantity - executed
+            # offers without any execution are not logged, except offers of zero quantity, which are executed completely
+            if(executed > 0 or quantity == 0):
+                self.action_rows.append([self.time, market, price, executed]) # log the action
+        return (delivered, unexecuted)
+
+    def checkConstraints(self, index, r, load, pv, battery, delivered) -> float:
+        """
+        Checks the validity of the action taken in a time step through different constraints and logs all violations
+        :param index: the index of the time step
+        :param r: the position of the time step in the forecast arrays
+        :param load: the load in the time step
+        :param pv: the pv generation in the time step
+        :param battery: the battery state in the time step
+        :param delivered: the energy quantity delivered to the market in the time step
+        :return: the load balance of the time step
+        """
+
+        (balance, rows) = check_step(self.scenario, index, self.time, self.charge[r], self.discharge[r], self.grid_demand[r], self.grid_supply[r],
+                                     load, pv, battery, delivered)
+        if(len(rows) > 0):
+            self.violation_rows.extend(rows)
+            self.violations += len(rows)
+        return balance
+
+    def getEventSchedule(self) -> np.ndarray:
+        """
+        Precomputes the time steps at which the greedy policy does more than planning the next time step on the IC market,
+        i.e. the gate closure times, the last time step of a day on which the IA or DA market is still open and the changes of the scenario
+        :return: a boolean array that is True for every time step with an event
+        """
+
+        n = self.scenario.number_of_intervals
+        steps_per_day = self.scenario.steps_per_day
+        start = dt.timedelta(hours = self.scenario.t_start.hour, minutes = self.scenario.t_start.minute) // self.scenario.t_delta
+        step_of_day = (start + np.arange(n)) % steps_per_day
+
+        closures = [dt.timedelta(hours = c.hour, minutes = c.minute) / self.scenario.t_delta
+                    for c in (self.scenario.intraday_auction_closure, self.scenario.day_ahead_closure)]
+
+        events = np.isin(step_of_day, closures)
+        # in the last time step of a day, plan_decision(1, ...) may pick a market that is still open for the next day
+        events |= (step_of_day == steps_per_day - 1) & (step_of_day <= max(closures))
+        # the changes of the scenario during the run
+        for (t, _) in self.scenario.changes:
+            events[(t - self.scenario.t_start) // self.scenario.t_delta] = True
+        return events
+
+    def fastForward(self, index) -> int:
+        """
+        Advances through a stretch of time steps in which the greedy policy reduces to using the battery and the grid,
+        i.e. there is no gate closure, no contract delivery and no possible market offer in any step of the stretch.
+        The results are identical to advancing step by step.
+        :param index: the index of the current time step
+        :return: the number of time steps advanced, 0 if no stretch starts at the current time step
+        """
+
+        n_max = min(self.scenario.number_of_intervals - index, # end of the simulation
+                    self.valid_f - 2, # the forecasts of all steps in the stretch are already loaded
+                    self.scenario.steps_per_day) # every position of the running price averages is updated at most once
+        if(n_max < config.FAST_FORWARD_MIN_STEPS):
+            return 0
+
+        # stop at the next event
+        next_events = np.flatnonzero(self.events[index:index + n_max])
+        if(len(next_events) > 0):
+            n_max = next_events[0]
+
+        # stop before the next contract delivery, which is also planned for one time step ahead
+        if(len(self.contracts) > 0):
+            next_delivery = min(c[1] for c in self.contracts)
+            n_max = min(n_max, (next_delivery - self.time) // self.scenario.t_delta - 1)
+
+        if(n_max < config.FAST_FORWARD_MIN_STEPS):
+            return 0
+
+        # unroll the ring buffers of the forecast window
+        V = self.valid_f
+        ring = (self.index_f + np.arange(V)) % self.length_forecast
+        pv = np.array(self.pv_forecast, dtype = float)[ring]
+        load = np.array(self.load_forecast, dtype = float)[ring]
+        charge = np.array(self.charge, dtype = float)[ring]
+        discharge = np.array(self.discharge, dtype = float)[ring]
+        grid_demand = np.array(self.grid_demand, dtype = float)[ring]
+        grid_supply = np.array(self.grid_supply, dtype = float)[ring]
+        battery = np.array(self.battery_forecast, dtype = float)[ring]
+        surplus_agg = np.array(self.surplus_agg, dtype = float)[ring]
+
+        # surplus of the time steps planned in the stretch, which are not changed by earlier steps of the stretch
+        surplus = pv[1:n_max + 1] - load[1:n_max + 1] + discharge[1:n_max + 1] - charge[1:n_max + 1] + \
+            grid_demand[1:n_max + 1] - grid_supply[1:n_max + 1]
+
+        # plan the next time step of every step in the stretch as done by plan_decision(1, ["IC"]),
+        # as long as the decision is given by the battery and the grid only
+        sc = self.scenario
+        actions = list()
+        for j in range(n_max):
+            s = j + 1
+            max_discharge = battery[s:V].min() - sc.battery_charge_min
+            charge_j, discharge_j, grid_demand_j, grid_supply_j = 0, 0, 0, 0
+
+            if(surplus[j] < 0):
+                # satisfy the deficit from the battery and the grid
+                if(surplus[j] + max_discharge >= 0):
+                    discharge_j = - surplus[j]
+                else:
+                    discharge_j = max_discharge
+                    grid_demand_j = - (max_discharge + surplus[j])
+            else:
+                # charge the battery or feed into the grid if the minimum offer quantity cannot be satisfied
+                min_surplus = surplus_agg[s:V].min()
+                if(not (surplus[j] + max_discharge < sc.min_offer_quantity or min_surplus + max_discharge < sc.min_offer_quantity or min_surplus < 0)):
+                    break # the decision depends on the market prices and may lead to an offer
+
+                if(battery[s] + surplus[j] < sc.battery_charge_max):
+                    charge_j = surplus[j]
+                else:
+                    charge_j = sc.battery_charge_max - battery[s]
+                    grid_supply_j = surplus[j] - charge_j
+
+            grid_demand[s] += grid_demand_j
+            grid_supply[s] += grid_supply_j
+            charge[s] += charge_j
+            discharge[s] += discharge_j
+            battery[s:V] += charge_j - discharge_j
+            surplus_agg[s:V] += discharge_j - charge_j + grid_demand_j - grid_supply_j - 0
+            actions.append((charge_j, discharge_j, grid_demand_j, grid_supply_j))
+
+        n = len(actions)
+        if(n < config.FAST_FORWARD_MIN_STEPS):
+            return 0
+
+        # commit the planned actions to the forecasts
+        for j in range(n):
+            r = ring[j + 1]
+            (charge_j, discharge_j, grid_demand_j, grid_supply_j) = actions[j]
+            self.grid_demand[r] += grid_demand_j
+            self.grid_supply[r] += grid_supply_j
+            self.charge[r] += charge_j
+            self.discharge[r] += discharge_j
+
+        for p in range(1, V):
+            self.battery_forecast[ring[p]] = battery[p]
+            self.surplus_agg[ring[p]] = surplus_agg[p]
+
+        # update the running price averages
+        LAMBDA = self.scenario.price_average_coefficient
+        prices = self.market.getMarketPriceBlock(n)
+        positions = (index + np.arange(n) + self.scenario.steps_per_day // 2) % self.scenario.steps_per_day
+        for m in ("DA", "IA", "IC"):
+            average = np.array(self.price_dict[m], dtype = float)[positions] * LAMBDA + prices[m] * (1 - LAMBDA)
+            for j in range(n):
+                self.price_dict[m][positions[j]] = average[j]
+
+        # validate and log the time steps of the stretch
+        balance = pv[:n] + discharge[:n] - charge[:n] + grid_demand[:n] - grid_supply[:n] - 0 - load[:n]
+        invalid = (charge[:n] < 0) | (discharge[:n] < 0) | (grid_demand[:n] < 0) | (grid_supply[:n] < 0) | \
+            (battery[:n] < self.scenario.battery_charge_min) | (battery[:n] > self.scenario.battery_charge_max) | \
+            ((grid_demand[:n] > 0.000001) & (grid_supply[:n] > 0.000001)) | \
+            ((charge[:n] > 0.000001) & (discharge[:n] > 0.000001)) | \
+            ~np.isclose(balance, 0, atol = 0.000001)
+
+        costs = np.cumsum(np.concatenate(([self.costs], grid_demand[:n] * self.scenario.grid_price_residential)))[1:]
+        feedin = np.cumsum(np.concatenate(([self.gains["grid"]], grid_supply[:n] * self.scenario.grid_price_feedin)))[1:]
+
+        for j in range(n):
+            if(self.pipeline is not None):
+                r = ring[j]
+                self.pipeline.push((index + j, self.time, self.charge[r], self.discharge[r], self.grid_demand[r], self.grid_supply[r],
+                                    battery[j], pv[j], load[j], 0, 0, self.gains["DA"], self.gains["IA"], self.gains["IC"], feedin[j], costs[j], [], []))
+                self.time = self.time + self.scenario.t_delta
+                continue
+            if(invalid[j]):
+                self.checkConstraints(index + j, ring[j], load[j], pv[j], battery[j], 0)
+            self.log_rows.append([self.gains["DA"], self.gains["IA"], self.gains["IC"], feedin[j], costs[j],
+                                  battery[j], pv[j], load[j], balance[j], grid_demand[j], grid_supply[j], self.time])
+            self.time = self.time + self.scenario.t_delta
+
+        self.costs = costs[-1]
+        self.gains["grid"] = feedin[-1]
+
+        self.index_f = (self.index_f + n) % self.length_forecast
+        self.valid_f -= n
+
+        return n
+
+    def flushLogs(self) -> None:
+        """
+        Writes the log rows created since the last flush to the attached log store
+        """
+
+        rows = {"log": (self.log_rows, LOG_COLUMNS),
+                "actions": (self.action_rows, ACTION_COLUMNS),
+                "violations": (self.violation_rows, VIOLATION_COLUMNS)}
+
+        for kind, (buffer, columns) in rows.items():
+            chunk = pd.DataFrame(buffer[self.flushed[kind]:], columns=columns)
+            self.log_store.append(kind, chunk)
+            self.flushed[kind] = len(buffer)
+
+    def getState(self, index) -> dict:
+        """
+        Takes a snapshot of the state of the agent and its environment between two time steps, without the logs
+        :param index: the index of the next time step
+        :return: a dictionary that can be pickled, see setState
+        """
+
+        state = {"index": index, "time": self.time, "index_f": self.index_f, "valid_f": self.valid_f,
+                 "contracts": list(self.contracts), "price_dict": {m: list(p) for m, p in self.price_dict.items()},
+                 "gains": dict(self.gains), "costs": self.costs, "violations": self.violations, "next_change": self.next_change,
+                 "market": self.market.getState(), "household": self.household.getState()}
+        for name in FORECAST_BUFFERS: # as Python values, NumPy floats are slow to pickle
+            state[name] = [float(v) if isinstance(v, np.floating) else v for v in getattr(self, name)]
+        return state
+
+    def setState(self, state) -> None:
+        """
+        Restores a snapshot of the state of the agent and its environment, see getState
+        :param state: the snapshot, with the log rows up to the time step of the snapshot as "log_rows", "action_rows" and "violation_rows"
+        """
+
+        self.reused_steps = state["index"]
+        self.time = state["time"]
+        (self.index_f, self.valid_f) = (state["index_f"], state["valid_f"])
+        for name in FORECAST_BUFFERS:
+            setattr(self, name, list(state[name]))
+        if(self.kernels is not None):
+            self.battery_forecast = np.array(self.battery_forecast, dtype = float)
+            self.surplus_agg = np.array(self.surplus_agg, dtype = float)
+            self.contract_book = kernels.ContractBook()
+            for c in state["contracts"]:
+                self.contract_book.append(self.getStep(c[1]), c[2])
+
+        self.contracts = list(state["contracts"])
+        self.price_dict = {m: list(p) for m, p in state["price_dict"].items()}
+        self.gains = dict(state["gains"])
+        self.costs = state["costs"]
+        self.violations = state["violations"]
+        for (_, change) in self.scenario.changes[:state["next_change"]]:
+            self.scenario.apply(change)
+        self.next_change = state["next_change"]
+        self.market.setState(state["market"])
+        self.household.setState(state["household"])
+
+        self.log_rows = list(state["log_rows"])
+        self.action_rows = list(state["action_rows"])
+        self.violation_rows = list(state["violation_rows"])
 
     def greedy(self) -> None:
         """
@@ -171,11 +593,11 @@ class Agent():
 
         # if the gate closure time for the intraday auction market is reached, plan decisions for the next day (IA and IC market)
         if(self.time.time() == self.scenario.intraday_auction_closure):
-            for t in range(33, 33+96):
+            for t in range(self.scenario.intraday_auction_offset, self.scenario.intraday_auction_offset + self.scenario.steps_per_day):
                 self.plan_decision(t, ["IA"])
         # if the gate closure time for the day-ahead market is reached, plan decisions for the next day (DA, IA and IC market)
         if(self.time.time() == self.scenario.day_ahead_closure):
-            for t in range(49, 49+96):
+            for t in range(self.scenario.day_ahead_offset, self.scenario.day_ahead_offset + self.scenario.steps_per_day):
                 self.plan_decision(t, ["DA"])
 
     def plan_decision(self, ahead_time, closing_markets) -> None:
@@ -185,7 +607,7 @@ class Agent():
         :param closing_markets: a list of markets for which this call of plan_decision is the last chance to place an offer
         """
 
-        placement_time = self.time + config.T_DELTA * ahead_time
+        placement_time = self.time + self.scenario.t_delta * ahead_time
         (load, pv, battery, charge_old, discharge_old, grid_demand_old, grid_supply_old) = self.getForecasts(ahead_time)
         prices = self.getMarketPrediction(ahead_time)
         (min_surplus, max_discharge) = self.getMinSurplus(ahead_time)
@@ -218,10 +640,15 @@ class Agent():
 
         # calculate the energy surplus for the given time point, taking contracts already made for this time point into account
         surplus = pv - load + discharge_old - charge_old + grid_demand_old - grid_supply_old
-        for c in self.contracts:
-            (_, t, q, _) = c
-            if(placement_time == t):
-                surplus -= q
+        if(self.kernels is not None):
+            if(self.contract_book.count > 0):
+                surplus = self.kernels.contract_surplus(surplus, self.contract_book.steps, self.contract_book.quantities,
+                                                        self.contract_book.count, self.getStep(placement_time))
+        else:
+            for c in self.contracts:
+                (_, t, q, _) = c
+                if(placement_time == t):
+                    surplus -= q
         
         # first, satisfy own demand when the base load is higher than the pv generation and the demand from already made contracts
         if(surplus < 0):
@@ -283,12 +710,13 @@ class Agent():
         :return: a dictionary with the markets as keys and the price forecasts as values
         """
 
-        index = ((dt.timedelta(hours = self.time.hour, minutes = self.time.minute) // config.T_DELTA) + ahead_time) % 96
+        index = ((dt.timedelta(hours = self.time.hour, minutes = self.time.minute) // self.scenario.t_delta) + ahead_time) % self.scenario.steps_per_day
+        horizon = self.scenario.t_delta * ahead_time / config.T_DELTA # the volatilities refer to time steps of the default size
 
         res = dict()
-        res["DA"] = self.price_dict["DA"][index] * (1 - np.sqrt(ahead_time) * self.scenario.vola_da)
-        res["IA"] = self.price_dict["IA"][index] * (1 - np.sqrt(ahead_time) * self.scenario.vola_ia)
-        res["IC"] = self.price_dict["IC"][index] * (1 - np.sqrt(ahead_time) * self.scenario.vola_ic)
+        res["DA"] = self.price_dict["DA"][index] * (1 - np.sqrt(horizon) * self.scenario.vola_da)
+        res["IA"] = self.price_dict["IA"][index] * (1 - np.sqrt(horizon) * self.scenario.vola_ia)
+        res["IC"] = self.price_dict["IC"][index] * (1 - np.sqrt(horizon) * self.scenario.vola_ic)
         return res
 
     def getForecasts(self, ahead_time) -> tuple():
@@ -304,6 +732,8 @@ class Agent():
             # get the pv and load data
             load = self.household.getLoad()
             pv = self.household.getPV()
+            if(self.forecast_errors is not None): # the agent only knows a forecast of the realized values
+                (load, pv) = self.forecast_errors.forecast(self.valid_f, load, pv)
             self.pv_forecast[(self.index_f + self.valid_f) % self.length_forecast] = pv
             self.load_forecast[(self.index_f + self.valid_f) % self.length_forecast] = load
 
@@ -339,6 +769,11 @@ class Agent():
         in the form (min_surplus, allowed_discharge)
         """
 
+        if(self.kernels is not None):
+            (min, battery_min) = self.kernels.min_surplus(self.surplus_agg, self.battery_forecast, self.index_f + ahead_time,
+                                                          self.index_f + self.valid_f, self.length_forecast)
+            return (min, battery_min - self.scenario.battery_charge_min)
+
         min = self.surplus_agg[(self.index_f + ahead_time) % self.length_forecast]
 
         battery_min = self.battery_forecast[(self.index_f + ahead_time) % self.length_forecast]
@@ -384,6 +819,11 @@ class Agent():
         self.charge[(self.index_f + ahead_time) % self.length_forecast] += charge
         self.discharge[(self.index_f + ahead_time) % self.length_forecast] += discharge
 
+        if(self.kernels is not None):
+            self.kernels.update(self.surplus_agg, self.battery_forecast, self.index_f + ahead_time, self.index_f + self.valid_f,
+                                self.length_forecast, float(charge - discharge), float(discharge - charge + grid_demand - grid_supply - delivered))
+            return
+
         for i in range(ahead_time, self.valid_f):
             index = (self.index_f + i) % self.length_forecast
             self.battery_forecast[index] += charge - discharge
@@ -397,8 +837,17 @@ class Agent():
         # place the contract on the market
         c = (market, del_time, quantity, bid_price)
         self.contracts.append(c)
+        if(self.kernels is not None):
+            self.contract_book.append(self.getStep(del_time), quantity)
         valid = self.market.place_offer(c) # place offer and observe its validity
         if(not valid):
             self.violations += 1
-            self.violation_log.loc[len(self.violation_log)] = \
-                [self.time, f"invalid market offer: market: {market}, delivery time: {del_time}, quantity: {quantity}, price: {bid_price}"]
+            self.violation_rows.append(
+                [self.time, f"invalid market offer: market: {market}, delivery time: {del_time}, quantity: {quantity}, price: {bid_price}"])
+
+    def getStep(self, time) -> int:
+        """
+        :return: the index of the time step starting at the given time
+        """
+
+        return (time - self.scenario.t_start) // self.scenario.t_delta
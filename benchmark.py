@@ -0,0 +1,642 @@
+import scenario
+import agent
+import optimizer
+import orderbook
+import synthdata
+import datastore
+import session
+import settlement
+import resultstore
+import kpi
+import logstore
+import telemetry
+import report
+import forecasting
+import ingest
+import kernels
+import workqueue
+import snapshots
+import config
+
+import os
+import sys
+import time
+import tempfile
+import subprocess
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+# This file contains benchmarks for the performance-relevant parts of the program.
+# Run a benchmark with
+#   python benchmark.py <benchmark> [<scenario> ...]
+
+def timed(function, *args):
+    """
+    Runs the given function and measures its wall time
+    :return: the result of the function and the wall time in seconds
+    """
+
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run_agent(ag):
+    """
+    Runs the given agent and returns it
+    """
+
+    ag.run()
+    return ag
+
+
+def assert_same_logs(ag_ref, ag):
+    """
+    Asserts that two agents produced exactly the same logs
+    """
+
+    pd.testing.assert_frame_equal(ag_ref.log_pd, ag.log_pd, check_exact = True)
+    pd.testing.assert_frame_equal(ag_ref.action_log, ag.action_log, check_exact = True)
+    pd.testing.assert_frame_equal(ag_ref.violation_log, ag.violation_log, check_exact = True)
+    assert ag_ref.violations == ag.violations
+
+
+def bench_fast_forward(names):
+    """
+    Compares the step-by-step simulation with the fast-forwarding one and checks that the results are identical,
+    also for a variant of each scenario with a minimum battery charge above the maximum, which causes constraint violations in most time steps.
+    Only the run itself is timed, not the loading of the data.
+    :param names: the scenario names
+    """
+
+    for name in names:
+        base = scenario.Scenario(name)
+        for sc in (base, base.variant(f"{name} with violations", battery_charge_min = 25, battery_charge_max = 15)):
+            ag_ref, t_ref = timed(run_agent, agent.Agent(sc.variant(sc.name, fast_forward = False)))
+            ag, t = timed(run_agent, agent.Agent(sc.variant(sc.name, fast_forward = True)))
+
+            assert_same_logs(ag_ref, ag)
+            steps = sc.number_of_intervals
+            print(f"{sc.name}: step by step {t_ref:.2f} s ({steps / t_ref:.0f} steps/s), "
+                  f"fast-forward {t:.2f} s ({steps / t:.0f} steps/s), speedup {t_ref / t:.2f}, {ag.violations} violations, results identical")
+
+
+def net_revenue(ag) -> float:
+    """
+    :return: the net revenue of an agent after its run
+    """
+
+    last = ag.log_pd.iloc[-1]
+    return last["offer_DA"] + last["offer_IA"] + last["offer_IC"] + last["grid_feedin"] - last["costs"]
+
+
+def bench_optimizer(names):
+    """
+    Compares the greedy agent with the dynamic programming optimizer in terms of run time and net revenue
+    :param names: the scenario names
+    """
+
+    for name in names:
+        sc = scenario.Scenario(name)
+        sc.fast_forward = True
+        ag_greedy, t_greedy = timed(run_agent, agent.Agent(sc))
+
+        results = list()
+        for rolling in (False, True):
+            ag, t = timed(run_agent, optimizer.OptimizerAgent(scenario.Scenario(name), rolling = rolling))
+            results.append(f"optimizer{' (rolling)' if rolling else ''} {net_revenue(ag):.2f} € in {t:.2f} s with {ag.violations} violations")
+
+        print(f"{name}: greedy {net_revenue(ag_greedy):.2f} € in {t_greedy:.2f} s, {', '.join(results)}")
+
+
+def bench_order_book(names):
+    """
+    Measures the matching throughput of the intraday continuous order book for a growing number of agents,
+    each of which submits offers to the same delivery time step with many thousands of resting orders
+    :param names: unused
+    """
+
+    rng = np.random.default_rng(0)
+    for agents in (1, 10, 100, 1000, 10000):
+        books = orderbook.IntradayOrderBooks(np.full(1, 0.15), orders = 20000, depth = 100000)
+        book = books.get(0)
+
+        offers = 20000
+        owners = rng.integers(agents, size = offers)
+        sides = rng.choice(["buy", "sell"], size = offers)
+        prices = 0.15 + rng.normal(0, 0.02, size = offers)
+        quantities = rng.exponential(20, size = offers)
+
+        start = time.perf_counter()
+        fills = 0
+        for i in range(offers):
+            fills += len(book.submit(sides[i], prices[i], quantities[i], owners[i], rest = True))
+        t = time.perf_counter() - start
+
+        print(f"{agents} agents: {offers / t:.0f} offers/s, {fills / t:.0f} fills/s, "
+              f"{len(book.bids) + len(book.asks)} resting orders at the end")
+
+
+def bench_scaling(names):
+    """
+    Measures the loading and run time and the peak memory for growing horizons on a synthetic ten-year dataset
+    (see synthdata.py), written to a temporary data store
+    :param names: the scenario names, whose settings apart from the horizon and the data are used
+    """
+
+    import resource # only available on Unix
+
+    start = dt.datetime(2030, 1, 1)
+    with tempfile.TemporaryDirectory() as path:
+        # one year more than the longest horizon, as the agent looks up to two days beyond the end of the horizon
+        synthdata.write_store(datastore.DataStore(path), start, synthdata.generate(start, 11 * 365))
+
+        for name in names:
+            for years in (1, 2, 5, 10):
+                t_end = start + dt.timedelta(days = 365 * years)
+                sc = scenario.Scenario(name).variant(name, t_start = start.strftime("%Y-%m-%d %H:%M"),
+                                                     t_end = t_end.strftime("%Y-%m-%d %H:%M"), data_store = path)
+                sc.fast_forward = True
+
+                ag, t_load = timed(agent.Agent, sc)
+                _, t = timed(run_agent, ag)
+                peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+                steps = sc.number_of_intervals
+                print(f"{name}, {years} years ({steps} steps): loading {t_load:.2f} s, run {t:.2f} s ({steps / t:.0f} steps/s), "
+                      f"peak memory {peak:.0f} MB")
+
+
+def bench_session(names):
+    """
+    Compares running several variants of a scenario with a fresh agent each against running them in one session with shared data
+    :param names: the scenario names
+    """
+
+    for name in names:
+        base = scenario.Scenario(name)
+        variants = [base.variant(f"{name}_{pv}", pv_power_stc = pv, fast_forward = True) for pv in (20, 40, 60, 80)]
+
+        start = time.perf_counter()
+        fresh = [run_agent(agent.Agent(sc)) for sc in variants]
+        t_fresh = time.perf_counter() - start
+
+        start = time.perf_counter()
+        s = session.Session()
+        results = s.runMany(variants)
+        t_session = time.perf_counter() - start
+
+        for ag, result in zip(fresh, results):
+            pd.testing.assert_frame_equal(ag.log_pd, result.log, check_exact = True)
+        print(f"{name}: {len(variants)} variants with fresh agents {t_fresh:.2f} s, in one session {t_session:.2f} s, results identical")
+
+
+def bench_settlement(names):
+    """
+    Revalues the trades of a run for many price scenarios at once and compares this with the time of the run itself.
+    The revaluation at the realized prices and the scenario tariffs must reproduce the logged revenues.
+    :param names: the scenario names
+    """
+
+    for name in names:
+        sc = scenario.Scenario(name)
+        sc.fast_forward = True
+        ag, t_run = timed(run_agent, agent.Agent(sc))
+
+        s = settlement.Settlement(ag.log_pd, ag.action_log)
+        prices = settlement.realized_prices(ag.market, sc.number_of_intervals)
+        realized = s.revalue(prices, sc.grid_price_residential, sc.grid_price_feedin)
+        assert np.isclose(realized["net_revenue"], net_revenue(ag), rtol = 1e-9)
+
+        count = 1000
+        scenarios = settlement.perturbed_prices(prices, count, 0.2)
+        result, t = timed(s.revalue, scenarios, np.linspace(0.2, 0.4, count), sc.grid_price_feedin)
+        summary = settlement.distribution(result["net_revenue"])
+        print(f"{name}: run {t_run:.2f} s, revaluation of {count} price scenarios {1000 * t:.1f} ms, "
+              f"net revenue mean {summary['mean']:.2f} €, 5-95% range {summary['p5']:.2f} to {summary['p95']:.2f} €")
+
+
+def bench_resolution(names):
+    """
+    Compares coarse-resolution screening runs with the default time step size in terms of run time and net revenue.
+    Fails if the net revenue of a coarser run deviates by more than config.RESOLUTION_MAX_DEVIATION of the turnover of the run
+    with the default time step size, see kpi.turnover.
+    :param names: the scenario names
+    """
+
+    s = session.Session()
+    failed = list()
+    for name in names:
+        data = s.getData(scenario.Scenario(name))
+        for kind in config.DATA_FILES: # read the data before timing the runs
+            data.get(kind)
+
+        results = dict()
+        for minutes in (15, 30, 60):
+            sc = scenario.Scenario(name).variant(name, t_delta = minutes, fast_forward = True)
+            results[minutes] = s.run(sc)
+
+        reference = results[15]
+        turnover = kpi.turnover(reference.kpis)
+        for minutes, result in results.items():
+            error = result.kpis["net_revenue"] / reference.kpis["net_revenue"] - 1 if reference.kpis["net_revenue"] != 0 else np.nan
+            deviation = abs(result.kpis["net_revenue"] - reference.kpis["net_revenue"]) / turnover if turnover > 0 else 0
+            print(f"{name}, {minutes} min: {result.wall_time:.2f} s (speedup {reference.wall_time / result.wall_time:.2f}), "
+                  f"net revenue {result.kpis['net_revenue']:.2f} € ({100 * error:+.1f} %, {100 * deviation:.1f} % of the turnover), "
+                  f"{result.violations} violations")
+            if(deviation > config.RESOLUTION_MAX_DEVIATION):
+                failed.append(f"{name} at {minutes} min")
+
+    assert len(failed) == 0, f"net revenue deviates by more than {100 * config.RESOLUTION_MAX_DEVIATION:.0f} % of the turnover: {', '.join(failed)}"
+
+
+def bench_results(names):
+    """
+    Fills a temporary results store with thousands of runs of a sweep over the battery size, pv size and minimum offer quantity
+    and measures the time of typical queries. The KPIs and daily aggregates of one run are reused for all entries.
+    :param names: the scenario names, the first one is used
+    """
+
+    result = session.Session().run(names[0])
+    daily = kpi.daily_kpis(result.log)
+    base = scenario.Scenario(names[0])
+    sweep = [base.variant(names[0], battery_charge_max = b, pv_power_stc = pv, min_offer_quantity = q)
+             for b in range(10, 210, 10) for pv in range(5, 130, 5) for q in (0, 20, 40, 60, 80, 100)]
+
+    with tempfile.TemporaryDirectory() as path:
+        with resultstore.ResultStore(f"{path}/results.db") as store:
+            start = time.perf_counter()
+            for sc in sweep:
+                store.add(sc, result.kpis, result.wall_time, daily)
+            store.flush()
+            t_insert = time.perf_counter() - start
+            print(f"{len(sweep)} runs with {len(daily)} days each written in {t_insert:.2f} s ({len(sweep) / t_insert:.0f} runs/s)")
+
+            queries = {
+                "net revenue by battery size for min-offer-quantity 40": lambda: store.select(["net_revenue"], ["battery_charge_max", "pv_power_stc"], min_offer_quantity = 40),
+                "mean net revenue per battery size": lambda: store.query("SELECT r.battery_charge_max, AVG(k.value) FROM runs r JOIN kpis k "
+                                                                         "ON k.run_id = r.id AND k.name = 'net_revenue' GROUP BY r.battery_charge_max"),
+                "daily aggregates of one run": lambda: store.daily(len(sweep) // 2),
+            }
+            for name, query in queries.items():
+                df, t = timed(query)
+                print(f"{name}: {len(df)} rows in {1000 * t:.1f} ms")
+
+
+def bench_pipeline(names):
+    """
+    Compares validating and logging the time steps within the simulation loop against the background log pipeline,
+    both writing the logs to a temporary log store, and checks that the results are identical
+    :param names: the scenario names
+    """
+
+    s = session.Session()
+    with tempfile.TemporaryDirectory() as path:
+        for name in names:
+            for fast_forward in (False, True):
+                times = dict()
+                agents = dict()
+                for log_pipeline in (False, True):
+                    sc = scenario.Scenario(name)
+                    sc.fast_forward = fast_forward
+                    sc.log_pipeline = log_pipeline
+                    ag = agent.Agent(sc, s.getData(sc))
+                    ag.log_store = logstore.LogStore(f"{path}/{name}_{fast_forward}_{log_pipeline}", sc)
+                    agents[log_pipeline], times[log_pipeline] = timed(run_agent, ag)
+
+                assert_same_logs(agents[False], agents[True])
+                steps = sc.number_of_intervals
+                print(f"{name} (fast-forward {fast_forward}): inline {times[False]:.2f} s ({steps / times[False]:.0f} steps/s), "
+                      f"pipeline {times[True]:.2f} s ({steps / times[True]:.0f} steps/s), speedup {times[False] / times[True]:.2f}, results identical")
+
+
+def bench_telemetry(names):
+    """
+    Measures the overhead of the progress telemetry on the simulation loop, with the default interval
+    and with a record at every check of the clock, the human-readable lines are discarded
+    :param names: the scenario names
+    """
+
+    s = session.Session()
+    with tempfile.TemporaryDirectory() as path, open(os.devnull, "w") as devnull:
+        for name in names:
+            times = dict()
+            for label, interval in (("without telemetry", None), ("default interval", config.TELEMETRY_INTERVAL), ("every check", 0)):
+                times[label] = float("inf")
+                for _ in range(3): # best of three, the overhead is smaller than the variation between runs
+                    sc = scenario.Scenario(name)
+                    ag = agent.Agent(sc, s.getData(sc))
+                    if(interval is not None):
+                        ag.telemetry = telemetry.Telemetry(path, interval = interval, stream = devnull)
+                    times[label] = min(times[label], timed(run_agent, ag)[1])
+
+            t_ref = times["without telemetry"]
+            print(f"{name}: " + ", ".join(f"{label} {t:.2f} s ({100 * (t / t_ref - 1):+.1f}%)" for label, t in times.items()))
+
+
+def bench_report(names):
+    """
+    Runs the min-offer-quantity × asset level grid of the scenarios folder with logs written to a temporary folder
+    and measures the time to build the comparative report from the logs and from a results store
+    :param names: ignored, all scenarios of the grid are used
+    """
+
+    grid = sorted(p.stem for p in config.SCENARIO_PATH.glob("scenario_*_*.json") if p.stem != "scenario_test")
+    s = session.Session()
+    with tempfile.TemporaryDirectory() as path:
+        start = time.perf_counter()
+        with resultstore.ResultStore(f"{path}/results.db") as store:
+            for name in grid:
+                sc = scenario.Scenario(name)
+                sc.fast_forward = True
+                store.addResult(s.run(sc, logstore.LogStore(f"{path}/{name}", sc)))
+        print(f"{len(grid)} runs in {time.perf_counter() - start:.1f} s")
+
+        summary, t_logs = timed(report.load_logs, grid, path)
+        print(f"summary of {len(summary)} runs from the logs in {t_logs:.2f} s")
+        with resultstore.ResultStore(f"{path}/results.db") as store:
+            summary_store, t_store = timed(report.load_store, store)
+        print(f"summary of {len(summary_store)} runs from the results store in {t_store:.2f} s")
+
+        columns = ["net_revenue", "self_consumption", "self_sufficiency"]
+        pd.testing.assert_frame_equal(summary.sort_values("name")[columns].reset_index(drop = True),
+                                      summary_store.sort_values("name")[columns].reset_index(drop = True), rtol = 1e-4, check_dtype = False)
+        files, t_report = timed(report.build_report, summary, f"{path}/report")
+        print(f"report with {len(files)} files in {t_report:.2f} s, summaries from logs and results store agree")
+
+
+def bench_forecast_errors(names):
+    """
+    Runs an ensemble of members with pv and load forecast errors in one session and compares it with independent runs
+    with fresh agents, and the distribution of the net revenue with the run under perfect foresight
+    :param names: the scenario names
+    """
+
+    count = 8
+    for name in names:
+        base = scenario.Scenario(name)
+        sc = base.variant(f"{name}_forecast", forecast_error_pv = 0.3, forecast_error_load = 0.2)
+
+        # generation of the error series, one vectorized pass against one pass per member
+        _, t_one = timed(forecasting.generate, sc, count, 0)
+        _, t_each = timed(lambda: [forecasting.generate(sc, 1, seed) for seed in range(count)])
+
+        start = time.perf_counter()
+        fresh = [run_agent(agent.Agent(sc.variant(sc.name, forecast_error_seed = seed))) for seed in range(count)]
+        t_fresh = time.perf_counter() - start
+
+        start = time.perf_counter()
+        s = session.Session()
+        results = s.runEnsemble(sc, count)
+        t_ensemble = time.perf_counter() - start
+
+        perfect = s.run(base)
+        summary = forecasting.summary(results)
+        revenue = summary["net_revenue"]
+        assert np.isclose(net_revenue(fresh[0]), results[0].kpis["net_revenue"], rtol = 1e-9) # same seed, same first member
+        print(f"{name}: errors of {count} members {1000 * t_one:.1f} ms at once, {1000 * t_each:.1f} ms one by one; "
+              f"{count} independent runs {t_fresh:.2f} s, ensemble {t_ensemble:.2f} s (speedup {t_fresh / t_ensemble:.2f})")
+        print(f"  net revenue perfect foresight {perfect.kpis['net_revenue']:.2f} €, with forecast errors mean {revenue['mean']:.2f} €, "
+              f"5-95% range {revenue['p5']:.2f} to {revenue['p95']:.2f} €, violations mean {summary['violations']['mean']:.1f}")
+
+
+def daily_drops(path, days) -> list:
+    """
+    Splits the first days of the data folder into daily drops in the layout of the data folder, with the weather files instead of the pv file
+    :param path: the folder of the drops
+    :param days: the number of days
+    :return: the list of drop folders
+    """
+
+    def hour(stamps): # the measurement times of the weather files, rounded to the full hour like in ingest.read_weather
+        stamps = stamps.str.strip()
+        return pd.to_datetime(stamps.where(stamps.str.contains(":"), stamps + ":00"), format = "%Y%m%d%H:%M").dt.round("h")
+
+    groups = dict()
+    for kind, filename in config.DATA_FILES.items():
+        if(kind != "pv"):
+            df = pd.read_csv(config.DATA_PATH / filename, sep = ";", encoding = "utf-8-sig")
+            groups[filename] = dict(list(df.groupby(pd.to_datetime(df["Time"]).dt.normalize())))
+    for filename in ingest.WEATHER_FILES.values():
+        df = pd.read_csv(config.WHEATHER_PATH / filename, sep = ";", dtype = str)
+        groups[filename] = dict(list(df.groupby(hour(df["MESS_DATUM"]).dt.normalize())))
+
+    drops = list()
+    for date in pd.date_range("2022-01-01", periods = days, freq = "D"):
+        drop = os.path.join(path, date.strftime("%Y-%m-%d"))
+        os.makedirs(drop)
+        for filename, days_of_file in groups.items():
+            days_of_file[date].to_csv(os.path.join(drop, filename), sep = ";", index = False)
+        drops.append(drop)
+    return drops
+
+
+def bench_ingest(names):
+    """
+    Ingests the days of the data folder as daily drops into a data store and compares the time per drop at the start and the end,
+    which is constant for appends in O(new rows), with rebuilding the store from all CSV files.
+    The store must reproduce the load data and the pv data of pv-generation.py.
+    :param names: not used
+    """
+
+    days = 300
+    with tempfile.TemporaryDirectory() as tmp:
+        drops = daily_drops(os.path.join(tmp, "drops"), days)
+        store = datastore.DataStore(os.path.join(tmp, "store"))
+
+        times = list()
+        for drop in drops:
+            _, t = timed(ingest.ingest_drop, store, drop)
+            times.append(t)
+
+        start = time.perf_counter()
+        for kind, filename in config.DATA_FILES.items():
+            df = pd.read_csv(config.DATA_PATH / filename, sep = ";", encoding = "utf-8-sig")
+            store.write(f"rebuilt_{kind}", dt.datetime(2022, 1, 1), config.DATA_STEPS[kind], df[config.DATA_COLUMNS[kind]].to_numpy(dtype = float))
+        t_rebuild = time.perf_counter() - start
+
+        n = store.info("load")["length"]
+        load = pd.read_csv(config.LOAD_RESIDENTIAL_PATH, sep = ";")[config.DATA_COLUMNS["load"]].to_numpy(dtype = float)[:n]
+        pv = pd.read_csv(config.PV_PATH, sep = ";")[config.DATA_COLUMNS["pv"]].to_numpy(dtype = float)[:n]
+        assert np.array_equal(store.read("load"), load)
+        assert np.allclose(store.read("pv"), pv, rtol = 0, atol = 1e-12)
+
+        print(f"{days} daily drops: {1000 * np.mean(times[:20]):.1f} ms per drop for the first 20 days, "
+              f"{1000 * np.mean(times[-20:]):.1f} ms for the last 20 days, {sum(times):.2f} s in total; "
+              f"rebuilding the store from the CSV files {1000 * t_rebuild:.0f} ms; load and pv data reproduced")
+
+
+def bench_kernels(names):
+    """
+    Compares the kernel backends of the agent's inner loops with the list-based reference implementation, checks that the results
+    are identical and measures the time per simulated time step, the time per call of the window kernels and the loading time of a backend
+    :param names: the scenario names
+    """
+
+    backends = [b for b in kernels.BACKENDS if b != "numba" or kernels.NUMBA]
+    for backend in backends[1:]:
+        _, t_load = timed(kernels.load, backend)
+        print(f"loading of the {backend} kernels {1000 * t_load:.0f} ms (first call in this process, including the import and compilation)")
+
+    for name in names:
+        reference = None
+        for backend in backends:
+            sc = scenario.Scenario(name)
+            sc.kernels = backend
+            ag, t = timed(run_agent, agent.Agent(sc))
+            if(reference is None):
+                (reference, t_ref) = (ag, t)
+            else:
+                assert_same_logs(reference, ag)
+
+            # the window kernels at the full lookahead window of the end of the run
+            calls = 2000
+            start = time.perf_counter()
+            for _ in range(calls):
+                ag.getMinSurplus(1)
+                ag.updateForecasts(1, 0, 0, 0, 0, 0)
+            t_call = (time.perf_counter() - start) / calls
+
+            steps = sc.number_of_intervals
+            print(f"{name} {backend}: {t:.2f} s, {1e6 * t / steps:.1f} µs per time step (speedup {t_ref / t:.2f}), "
+                  f"getMinSurplus + updateForecasts over {ag.valid_f - 1} steps {1e6 * t_call:.1f} µs per call")
+
+
+def bench_workqueue(names):
+    """
+    Runs the same sweep points through a work queue in a temporary folder with an increasing number of local worker processes
+    and measures the throughput, including the start of the workers and the reading of the data in every worker
+    :param names: the scenario names, the points are variants of the first one with different battery and pv sizes
+    """
+
+    # overhead of the queue per point without the runs: submit, claim, heartbeat and complete
+    points = 500
+    sc = scenario.Scenario(names[0])
+    daily = pd.DataFrame({"date": ["2022-01-01"], "net_revenue": [0.0]})
+    with tempfile.TemporaryDirectory() as path:
+        queue = workqueue.WorkQueue(path)
+        start = time.perf_counter()
+        for i in range(points):
+            queue.submit(sc.variant(f"point {i}"))
+        t_submit = time.perf_counter() - start
+        start = time.perf_counter()
+        while (point := queue.claim("bench")) is not None:
+            queue.heartbeat(point)
+            queue.complete(point, "bench", {"net_revenue": 0.0}, 0.0, daily, "bench")
+        t_claim = time.perf_counter() - start
+    print(f"queue overhead per point: submit {1000 * t_submit / points:.2f} ms, claim + heartbeat + complete {1000 * t_claim / points:.2f} ms "
+          f"({points} points)")
+
+    sizes = ([5, 10, 15, 20], [10, 20, 30, 40, 50, 60])
+    print(f"{os.cpu_count()} CPUs, {len(sizes[0]) * len(sizes[1])} points")
+    reference = None
+    for count in (1, 2, 4, 8):
+        with tempfile.TemporaryDirectory() as path:
+            queue = workqueue.WorkQueue(path)
+            workqueue.submit_grid(queue, names[0], *sizes)
+            start = time.perf_counter()
+            workers = workqueue.start_workers(path, count)
+            for w in workers:
+                w.wait()
+            t = time.perf_counter() - start
+
+            results = {r["id"]: r["kpis"] for r in queue.results()}
+            assert queue.status()["results"] == len(results) and queue.status()["failed"] == 0
+            if(reference is None):
+                reference = results
+            assert results == reference # the same KPIs whichever worker ran a point
+            print(f"{count} workers: {t:.2f} s, {len(results) / t:.1f} points/s")
+
+
+def bench_snapshots(names):
+    """
+    Runs a scenario after a shorter version of it (horizon extension) and after the scenario itself with a change of the grid price
+    near its end (what-if run), continuing from the snapshots of the earlier run in a temporary cache. Checks that the results are
+    identical to a run from the start and measures the time of both and the overhead of storing the snapshots.
+    :param names: the scenario names
+    """
+
+    def same(a, b):
+        pd.testing.assert_frame_equal(a.log, b.log, check_exact = True)
+        pd.testing.assert_frame_equal(a.actions, b.actions, check_exact = True)
+        pd.testing.assert_frame_equal(a.violation_log, b.violation_log, check_exact = True)
+
+    for name in names:
+        sc = scenario.Scenario(name)
+        days = (sc.t_end - sc.t_start).days
+        middle = sc.t_start + dt.timedelta(days = days // 2)
+        late = dt.datetime.combine((sc.t_start + dt.timedelta(days = days - days // 4)).date(), dt.time())
+        short = sc.variant(name, t_end = middle.strftime("%Y-%m-%d %H:%M"))
+        what_if = sc.variant(name, changes = [{"from": late.strftime("%Y-%m-%d %H:%M"),
+                                               "grid-price-residential": 1.5 * sc.grid_price_residential}])
+
+        s = session.Session()
+        s.run(short) # reads the data
+        (_, t_plain) = timed(s.run, short)
+        for (earlier, target, label) in [(short, sc, "horizon extension"), (sc, what_if, "what-if change")]:
+            full = s.run(target)
+            with tempfile.TemporaryDirectory() as path:
+                cached = session.Session(snapshot_cache = snapshots.SnapshotCache(path))
+                cached.run(short.variant(name, pv_power_stc = sc.pv_power_stc + 1)) # reads the data, without a common beginning
+                (_, t_recorded) = timed(cached.run, earlier)
+                (resumed, t_resumed) = timed(cached.run, target)
+            same(full, resumed)
+            print(f"{name} {label}: from the start {full.wall_time:.2f} s, from a snapshot {t_resumed:.2f} s "
+                  f"({resumed.reused_steps}/{target.number_of_intervals} time steps reused), results identical")
+            if(earlier is short):
+                print(f"{name} storing the snapshots: {t_plain:.2f} s without, {t_recorded:.2f} s with ({100 * (t_recorded / t_plain - 1):.0f}%)")
+
+
+def bench_startup(names):
+    """
+    Measures the time from starting the interpreter to the end of short command line calls, best of five,
+    and the import time of the modules behind them
+    :param names: the scenario names, the first one is used for the runs
+    """
+
+    calls = {
+        "python -c pass": [sys.executable, "-c", "pass"],
+        "import pandas": [sys.executable, "-c", "import pandas"],
+        "import session (simulation)": [sys.executable, "-c", "import session"],
+        "import postprocessing (plots)": [sys.executable, "-c", "import postprocessing"],
+        "cli.py --help": [sys.executable, "cli.py", "--help"],
+        f"cli.py run {names[0]} --no-plots --logs none": [sys.executable, "cli.py", "run", names[0], "--no-plots", "--logs", "none", "--quiet"],
+        f"cli.py run {names[0]} --logs none (plots into files)": [sys.executable, "cli.py", "run", names[0], "--logs", "none", "--quiet",
+                                                                 "--plot-output", tempfile.gettempdir()],
+    }
+    for label, command in calls.items():
+        best = float("inf")
+        for _ in range(5):
+            start = time.perf_counter()
+            subprocess.run(command, cwd = config.ROOT_PATH, check = True, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - start)
+        print(f"{label}: {best:.3f} s")
+
+
+BENCHMARKS = {
+    "fast-forward": bench_fast_forward,
+    "optimizer": bench_optimizer,
+    "order-book": bench_order_book,
+    "scaling": bench_scaling,
+    "session": bench_session,
+    "settlement": bench_settlement,
+    "resolution": bench_resolution,
+    "results": bench_results,
+    "pipeline": bench_pipeline,
+    "telemetry": bench_telemetry,
+    "report": bench_report,
+    "forecast-errors": bench_forecast_errors,
+    "ingest": bench_ingest,
+    "kernels": bench_kernels,
+    "workqueue": bench_workqueue,
+    "snapshots": bench_snapshots,
+    "startup": bench_startup,
+}
+
+if __name__ == "__main__":
+    if(len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS):
+        print(f"usage: python benchmark.py <benchmark> [<scenario> ...], available benchmarks: {', '.join(BENCHMARKS)}")
+        sys.exit(1)
+
+    names = sys.argv[2:] if len(sys.argv) > 2 else ["scenario_test"]
+    BENCHMARKS[sys.argv[1]](names)
@@ -0,0 +1,367 @@
+import config
+
+import sys
+import json
+import contextlib
+import argparse
+
+# This file contains the command line interface of the program with the subcommands run, batch, sweep, plot, pv-generate and ingest.
+# Every subcommand imports only the modules it needs when it is called, so that e.g. "run --no-plots" never loads matplotlib
+# and "--help" answers without loading pandas. Results are written to stdout in the chosen output format,
+# progress and other messages to stderr, which --quiet suppresses.
+#
+#   python cli.py run scenario_test --no-plots
+#   python cli.py batch scenario_0_low scenario_0_middle --output-format csv --results output/results.db
+#   python cli.py run scenario_40_middle --no-plots --snapshots
+#   python cli.py sweep scenario_40_middle --battery 10 20 30 --pv 20 40 60
+#   python cli.py plot scenario_test --output output/plots
+#   python cli.py pv-generate --no-plots
+#   python cli.py ingest data/store incoming/2023-01-01 incoming/2023-01-02
+
+OUTPUT_FORMATS = ["text", "json", "csv"]
+SUMMARY_KPIS = ["net_revenue", "revenue_DA", "revenue_IA", "revenue_IC", "revenue_grid", "costs_grid", "violations"]
+LOG_FORMATS = ["parquet", "npz", "none"]
+
+def message(args, text) -> None:
+    """
+    Prints a message to stderr unless --quiet is given
+    """
+
+    if(not args.quiet):
+        print(text, file = sys.stderr)
+
+
+def print_results(rows, fmt) -> None:
+    """
+    Prints the summaries of runs to stdout
+    :param rows: a list of dictionaries with the name of the scenario ("scenario"), KPIs and the wall time ("wall_time")
+    :param fmt: the output format, one of OUTPUT_FORMATS
+    """
+
+    if(fmt == "json"): # one JSON object per line
+        for row in rows:
+            print(json.dumps(row))
+    elif(fmt == "csv"):
+        import csv
+        writer = csv.DictWriter(sys.stdout, fieldnames = list(rows[0]), delimiter = ";")
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            print(f"{row['scenario']}: net revenue {row['net_revenue']:.2f} € (DA {row['revenue_DA']:.2f}, IA {row['revenue_IA']:.2f}, "
+                  f"IC {row['revenue_IC']:.2f}, grid {row['revenue_grid']:.2f}, grid costs {row['costs_grid']:.2f}), "
+                  f"{row['violations']:.0f} violations, {row['wall_time']:.2f} s")
+
+
+def result_row(result) -> dict:
+    """
+    :return: the summary of a session.Result for print_results
+    """
+
+    row = {"scenario": result.scenario.name}
+    for name in SUMMARY_KPIS:
+        row[name] = result.kpis[name]
+    row["wall_time"] = result.wall_time
+    return row
+
+
+def load_scenario(args, name):
+    """
+    :return: the scenario with the given name and the simulation options of the command line
+    """
+
+    import scenario
+    sc = scenario.Scenario(name)
+    if(args.fast_forward): sc.fast_forward = True
+    if(args.log_pipeline): sc.log_pipeline = True
+    if(args.kernels is not None): sc.kernels = args.kernels
+    return sc
+
+
+def create_telemetry(args):
+    """
+    :return: the telemetry.Telemetry of the command line options, None if it would not report anywhere
+    """
+
+    if(args.quiet and args.telemetry is None):
+        return None
+    import telemetry
+    return telemetry.Telemetry(args.telemetry, args.telemetry_format, stream = None if args.quiet else sys.stderr)
+
+
+def create_session(args):
+    """
+    :return: the session.Session of the command line options, which continues the runs from stored snapshots with --snapshots
+    """
+
+    import session
+    if(args.snapshots is None):
+        return session.Session()
+    import snapshots
+    return session.Session(snapshot_cache = snapshots.SnapshotCache(args.snapshots))
+
+
+def create_log_store(args, sc):
+    """
+    :return: the logstore.LogStore of a run in the output folder, None if no logs are written
+    """
+
+    if(args.logs == "none"):
+        return None
+    import logstore
+    return logstore.LogStore(config.OUTPUT_PATH / sc.name, sc, args.logs)
+
+
+def plot_run(log_pd, action_log, sc, output = None) -> list:
+    """
+    Draws the charts of a run, in windows or into files
+    :param log_pd: the slot log of the run
+    :param action_log: the action log of the run
+    :param sc: the scenario of the run
+    :param output: a folder for the charts as PNG files, None to show them in windows
+    :return: the list of written files
+    """
+
+    import matplotlib
+    if(output is not None):
+        matplotlib.use("Agg") # no display needed, plt.show does nothing
+    import matplotlib.pyplot as plt
+    import postprocessing as post
+    from pathlib import Path
+
+    charts = {"bar_chart": lambda: post.bar_chart(log_pd, sc),
+              "demand_line": lambda: post.demand_line1(log_pd, sc),
+              "price_line": lambda: post.price_line1(log_pd, sc),
+              "actions": lambda: post.fancy_chart(action_log.copy(), sc)}
+
+    files = list()
+    for name, chart in charts.items():
+        with contextlib.redirect_stdout(sys.stderr): # some charts print their values, which must not mix with the results
+            chart()
+        if(output is not None):
+            Path(output).mkdir(parents = True, exist_ok = True)
+            path = Path(output) / f"{sc.name}_{name}.png"
+            plt.gcf().savefig(path, dpi = 150)
+            files.append(path)
+        plt.close("all")
+    return files
+
+
+def command_run(args) -> None:
+    """
+    Runs a scenario, writes its logs to the output folder and prints its summary
+    """
+
+    sc = load_scenario(args, args.scenario)
+    message(args, f"Running scenario specified in {args.scenario}...")
+    result = create_session(args).run(sc, create_log_store(args, sc), create_telemetry(args))
+    print_results([result_row(result)], args.output_format)
+
+    if(result.violations > 0):
+        result.violation_log.to_csv(config.OUTPUT_PATH / "violation_log.csv", sep="\t")
+        message(args, f"{result.violations} constraint violations, see {config.OUTPUT_PATH / 'violation_log.csv'}")
+    if(not args.no_plots):
+        plot_run(result.log, result.actions, sc, args.plot_output)
+
+
+def command_batch(args) -> None:
+    """
+    Runs several scenarios in one session and prints their summaries, optionally writing them to a results store
+    """
+
+    store = None
+    if(args.results is not None):
+        import resultstore
+        store = resultstore.ResultStore(args.results)
+
+    s = create_session(args)
+    tel = create_telemetry(args)
+    rows = list()
+    for i, name in enumerate(args.scenarios):
+        sc = load_scenario(args, name)
+        message(args, f"[{i + 1}/{len(args.scenarios)}] {name}")
+        result = s.run(sc, create_log_store(args, sc), tel)
+        rows.append(result_row(result))
+        if(store is not None):
+            store.addResult(result)
+        if(args.output_format == "json"): # results are streamed, so that they are available while the batch runs
+            print_results(rows[-1:], args.output_format)
+            sys.stdout.flush()
+
+    if(store is not None):
+        store.close()
+    if(args.output_format != "json"):
+        print_results(rows, args.output_format)
+
+
+def command_sweep(args) -> None:
+    """
+    Searches for the battery and pv size with the highest net revenue, see sizing.py
+    """
+
+    import sizing
+
+    store = None
+    if(args.results is not None):
+        import resultstore
+        store = resultstore.ResultStore(args.results)
+
+    results = sizing.search(args.scenario, args.battery, args.pv, args.load, eta = args.eta, workers = args.workers,
+                            store = store, tel = create_telemetry(args))
+    if(store is not None):
+        store.close()
+
+    rows = list()
+    for (values, kpis) in results:
+        row = {"scenario": args.scenario, "battery_charge_max": values["battery-charge-max"], "pv_power_stc": values["pv-power-stc"],
+               "load_multiplier": values["load-multiplier"]}
+        for name in SUMMARY_KPIS:
+            row[name] = kpis[name]
+        rows.append(row)
+
+    if(args.output_format == "text"):
+        for row in rows:
+            print(f"battery {row['battery_charge_max']} kWh, pv {row['pv_power_stc']} kW, load multiplier {row['load_multiplier']}: "
+                  f"net revenue {row['net_revenue']:.2f} €, violations {row['violations']:.0f}")
+    else:
+        print_results(rows, args.output_format)
+
+
+def command_plot(args) -> None:
+    """
+    Draws the charts of a run from its logs in the output folder
+    """
+
+    import scenario
+    import logstore
+
+    sc = scenario.Scenario(args.scenario)
+    log_pd = logstore.load_log(config.OUTPUT_PATH / sc.name / "log")
+    action_log = logstore.load_log(config.OUTPUT_PATH / sc.name / "actions")
+    action_log["Market"] = action_log["Market"].astype(str)
+    for path in plot_run(log_pd, action_log, sc, args.output):
+        print(path)
+
+
+def command_pv_generate(args) -> None:
+    """
+    Computes the quarter-hourly pv data from the weather data, see pv-generation.py
+    """
+
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("pv_generation", config.ROOT_PATH / "pv-generation.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    message(args, f"Computing the pv data from {config.WHEATHER_PATH}...")
+    module.computePVData(plot = not args.no_plots)
+    print(config.PV_PATH)
+
+
+def command_ingest(args) -> None:
+    """
+    Validates daily data drops and appends them to a data store, see ingest.py.
+    Stops at the first invalid drop, the drops before it stay ingested.
+    """
+
+    import ingest
+    import datastore
+
+    store = datastore.DataStore(args.store)
+    rows = list()
+    for drop in args.drops:
+        try:
+            added = ingest.ingest_drop(store, drop)
+        except ValueError as e:
+            message(args, f"{drop}: {e}")
+            sys.exit(1)
+        message(args, f"{drop}: " + ", ".join(f"{name} +{n}" for name, n in added.items()))
+        rows.append(dict({"drop": str(drop)}, **added))
+
+    if(args.output_format == "json"):
+        for row in rows:
+            print(json.dumps(row))
+    elif(args.output_format == "csv" and len(rows) > 0):
+        import csv
+        writer = csv.DictWriter(sys.stdout, fieldnames = list(dict.fromkeys(k for row in rows for k in row)), delimiter = ";", restval = 0)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parser() -> argparse.ArgumentParser:
+    """
+    :return: the parser of the command line with its subcommands
+    """
+
+    p = argparse.ArgumentParser(description = "simulation of a prosumer agent trading on the electricity markets")
+    commands = p.add_subparsers(dest = "command", required = True)
+
+    common = argparse.ArgumentParser(add_help = False)
+    common.add_argument("--quiet", action = "store_true", help = "no progress or other messages on stderr")
+    common.add_argument("--output-format", choices = OUTPUT_FORMATS, default = "text", help = "format of the results on stdout")
+
+    simulation = argparse.ArgumentParser(add_help = False)
+    simulation.add_argument("--fast-forward", action = "store_true", help = "advance through stretches without events at once")
+    simulation.add_argument("--log-pipeline", action = "store_true", help = "validate and log the time steps in a background thread")
+    simulation.add_argument("--kernels", choices = ["auto", "python", "numpy", "numba"],
+                            help = "backend of the agent's inner loops, auto uses numba if installed")
+    simulation.add_argument("--snapshots", nargs = "?", const = config.SNAPSHOT_PATH,
+                            help = "continue from snapshots of earlier runs with the same beginning and store new ones, in output/snapshots if no folder is given")
+    simulation.add_argument("--logs", choices = LOG_FORMATS, help = "format of the logs in the output folder, or none")
+    simulation.add_argument("--telemetry", nargs = "?", const = config.TELEMETRY_PATH,
+                            help = "folder for machine-readable progress records, output/telemetry if no folder is given")
+    simulation.add_argument("--telemetry-format", choices = ["jsonl", "prometheus"], default = "jsonl", help = "format of the progress records")
+
+    run = commands.add_parser("run", parents = [common, simulation], help = "run a scenario")
+    run.add_argument("scenario", nargs = "?", default = "scenario_test", help = "name of the scenario in the scenarios folder")
+    run.add_argument("--no-plots", action = "store_true", help = "do not draw any charts")
+    run.add_argument("--plot-output", help = "folder for the charts as PNG files instead of windows")
+    run.set_defaults(function = command_run)
+
+    batch = commands.add_parser("batch", parents = [common, simulation], help = "run several scenarios in one session")
+    batch.add_argument("scenarios", nargs = "+", help = "names of the scenarios in the scenarios folder")
+    batch.add_argument("--results", help = "results store to which the runs are written")
+    batch.set_defaults(function = command_batch)
+
+    sweep = commands.add_parser("sweep", parents = [common], help = "search for the best battery and pv size")
+    sweep.add_argument("scenario", help = "name of the base scenario in the scenarios folder")
+    sweep.add_argument("--battery", type = float, nargs = "+", required = True, help = "candidate maximum battery charges [kWh]")
+    sweep.add_argument("--pv", type = float, nargs = "+", required = True, help = "candidate pv powers under STC [kW]")
+    sweep.add_argument("--load", type = float, nargs = "+", help = "candidate load multipliers")
+    sweep.add_argument("--eta", type = int, default = 3, help = "reduction factor per rung")
+    sweep.add_argument("--workers", type = int, help = "number of worker processes")
+    sweep.add_argument("--results", help = "results store to which all evaluations are written")
+    sweep.add_argument("--telemetry", nargs = "?", const = config.TELEMETRY_PATH,
+                       help = "folder for the progress records of the search and its workers, output/telemetry if no folder is given")
+    sweep.add_argument("--telemetry-format", choices = ["jsonl", "prometheus"], default = "jsonl", help = "format of the progress records")
+    sweep.set_defaults(function = command_sweep)
+
+    plot = commands.add_parser("plot", help = "draw the charts of a run from its logs in the output folder")
+    plot.add_argument("scenario", help = "name of the scenario")
+    plot.add_argument("--output", help = "folder for the charts as PNG files instead of windows")
+    plot.set_defaults(function = command_plot)
+
+    pv = commands.add_parser("pv-generate", parents = [common], help = "compute the pv data from the weather data")
+    pv.add_argument("--no-plots", action = "store_true", help = "do not save a plot of the pv data")
+    pv.set_defaults(function = command_pv_generate)
+
+    ingest = commands.add_parser("ingest", parents = [common], help = "validate daily data drops and append them to a data store")
+    ingest.add_argument("store", help = "the data store, created if it does not exist")
+    ingest.add_argument("drops", nargs = "+", help = "drop folders in the layout of the data folder, ingested in the given order")
+    ingest.set_defaults(function = command_ingest)
+
+    return p
+
+
+def main(argv = None) -> None:
+    """
+    Runs the command line interface
+    :param argv: the arguments, sys.argv[1:] if None
+    """
+
+    args = parser().parse_args(argv)
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main()
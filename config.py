@@ -6,7 +6,38 @@ import datetime as dt
 
 # --- GLOBAL VARIABLES ---
 
-T_DELTA = dt.timedelta(minutes=15) # simulation timestep size
+T_DELTA = dt.timedelta(minutes=15) # default simulation timestep size, see the scenario key "t-delta"
+RESOLUTION_MAX_DEVIATION = 0.25 # maximum deviation of the net revenue of coarser time steps from the default ones, relative to the turnover [1]
+FORECAST_HORIZON = dt.timedelta(days=2) # time the agent looks ahead
+
+# the offers for the next day are planned at a gate closure for one day, starting this long after the gate closure
+# (rounded up to whole time steps)
+INTRADAY_AUCTION_OFFSET = dt.timedelta(hours=8, minutes=15)
+DAY_AHEAD_OFFSET = dt.timedelta(hours=12, minutes=15)
+
+FAST_FORWARD_MIN_STEPS = 4 # minimum length of a stretch of time steps for the agent to advance through it at once
+
+OPTIMIZER_LEVELS = 101 # default number of discrete battery states for the dynamic programming optimizer
+
+ORDER_BOOK_ORDERS = 500 # number of synthetic orders per side and delivery time step in the intraday continuous order book
+ORDER_BOOK_DEPTH = 1000 # total synthetic quantity per side and delivery time step in the intraday continuous order book [kWh]
+ORDER_BOOK_MIN_SPREAD = 0.005 # minimum price dispersion of the synthetic orders [€/kWh]
+
+PROFILE_BATCH = 64 # number of households generated at once by the synthetic load profile generator
+PROFILE_SHIFT_STD = 2 # standard deviation of the daily time shift of synthetic load profiles [time steps]
+PROFILE_LEVEL_SIGMA = 0.3 # log-normal sigma of the consumption level of a synthetic household [1]
+PROFILE_DAY_SIGMA = 0.15 # log-normal sigma of the daily consumption factor of a synthetic household [1]
+
+FORECAST_ERROR_CORRELATION = 0.8 # default correlation of the pv and load forecast errors of time steps one hour apart
+FORECAST_ERROR_BLOCK = 256 # number of time steps of the forecast error series generated at once
+
+# pv model of pv-generation.py and ingest.py
+PV_NOCT = 47 # nominal operating cell temperature [°C]
+PV_LAMBDA = 0.00048 # temperature coefficient of the pv power [1/°C]
+PV_T_STC = 25 # cell temperature under STC [°C]
+PV_G_STC = 1000 # radiation under STC [W/m^2]
+
+SIZING_SLICE_DAYS = 7 # length of the time slices on which candidates are evaluated in the sizing search
 
 # --- PATHS ---
 
@@ -30,4 +61,56 @@ INTRADAY_CONTINUOUS_PATH = DATA_PATH / "intraday_quarterly_continuous_2022_price
 
 # household data paths
 PV_PATH = DATA_PATH / "pv_generation.csv"
-LOAD_RESIDENTIAL_PATH = DATA_PATH / "load_data.csv"
+LOAD_RESIDENTIAL_PATH = DATA_PATH / "Load_Data.csv"
+
+# data series and the file names under which they are stored in a data folder
+DATA_FILES = {
+    "DA": DAY_AHEAD_PATH.name,
+    "IA": INTRADAY_AUCTION_PATH.name,
+    "IC": INTRADAY_CONTINUOUS_PATH.name,
+    "load": LOAD_RESIDENTIAL_PATH.name,
+    "pv": PV_PATH.name,
+}
+
+# time step sizes of the data series in the data folder
+DATA_STEPS = {
+    "DA": dt.timedelta(hours=1),
+    "IA": dt.timedelta(minutes=15),
+    "IC": dt.timedelta(minutes=15),
+    "load": dt.timedelta(minutes=15),
+    "pv": dt.timedelta(minutes=15),
+}
+
+# value columns of the data series
+DATA_COLUMNS = {
+    "DA": "Price",
+    "IA": "Price",
+    "IC": "Price",
+    "load": "Sum [kWh]",
+    "pv": "pv",
+}
+
+# time zone of the local times of the price data, which have days of 23 and 25 hours at the daylight saving time changes
+DATA_TIMEZONE = "Europe/Berlin"
+INGEST_MAX_GAP = 4 # maximum number of consecutive missing values of a daily data drop that are interpolated
+PV_NODES = "pv_nodes" # series of the hourly pv values in a data store, from which the pv series is derived
+
+# --- OUTPUT ---
+
+LOG_CHUNK_SIZE = 96 * 7 # number of simulated time steps per chunk when writing logs during a run
+PIPELINE_BLOCK_SIZE = 96 # number of time steps handed over to the background log pipeline at once
+PIPELINE_BLOCKS = 64 # maximum number of blocks waiting for the background log pipeline
+
+RESULTS_PATH = OUTPUT_PATH / "results.db" # default results store of sweeps and batches
+RESULT_BATCH_SIZE = 50 # number of runs written to the results store within one transaction
+
+TELEMETRY_PATH = OUTPUT_PATH / "telemetry" # default folder of the machine-readable progress records
+TELEMETRY_INTERVAL = 10 # minimum time between two progress records [s]
+TELEMETRY_CHECK_STEPS = 96 # number of simulated time steps between two checks of the clock
+
+WORKQUEUE_LEASE = 60 # time after the last heartbeat of a worker after which its claim is put back into the work queue [s]
+WORKQUEUE_MAX_ATTEMPTS = 3 # number of expired leases of a sweep point after which it is given up
+WORKQUEUE_POLL = 1 # time between two looks of a worker into an empty work queue [s]
+
+SNAPSHOT_PATH = OUTPUT_PATH / "snapshots" # default folder of the cache of simulation state snapshots
+SNAPSHOT_CACHE_BYTES = 2**30 # maximum size of the snapshot cache, the least recently used snapshots are deleted first [byte]
@@ -0,0 +1,135 @@
+import json
+import os
+from pathlib import Path
+import datetime as dt
+import numpy as np
+
+# This file contains a binary store for time series on a regular time grid.
+# Every series is a raw little-endian float64 file with one row per time step (and optionally several columns),
+# described by an entry in the index file of the store. Rows can be appended in O(new rows),
+# and reading a time range maps only the requested part of the file into memory.
+
+INDEX = "index.json"
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+class DataStore():
+    """
+    A directory of time series with a common index file
+    """
+
+    def __init__(self, path) -> None:
+        """
+        :param path: the directory of the store, created if it does not exist
+        """
+
+        self.path = Path(path)
+        self.path.mkdir(parents = True, exist_ok = True)
+
+        self.index = dict()
+        if((self.path / INDEX).exists()):
+            with open(self.path / INDEX) as f:
+                self.index = json.load(f)
+
+    def __contains__(self, name) -> bool:
+        return name in self.index
+
+    def saveIndex(self) -> None:
+        """
+        Atomically replaces the index file
+        """
+
+        tmp = self.path / (INDEX + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.index, f, indent = 4)
+        os.replace(tmp, self.path / INDEX)
+
+    def info(self, name) -> dict:
+        """
+        :return: the start time, step, length and number of columns of a series
+        """
+
+        entry = self.index[name]
+        return {
+            "start": dt.datetime.strptime(entry["start"], TIME_FORMAT),
+            "step": dt.timedelta(minutes = entry["step"]),
+            "length": entry["length"],
+            "columns": entry["columns"],
+        }
+
+    def end(self, name) -> dt.datetime:
+        """
+        :return: the time of the first time step after the end of a series
+        """
+
+        info = self.info(name)
+        return info["start"] + info["step"] * info["length"]
+
+    def write(self, name, start, step, values) -> None:
+        """
+        Writes a series, replacing an existing one with the same name
+        :param name: the name of the series
+        :param start: the time of the first row
+        :param step: the time step between the rows
+        :param values: a one-dimensional array or a two-dimensional array with one row per time step
+        """
+
+        values = np.ascontiguousarray(values, dtype = "<f8")
+        with open(self.path / (name + ".bin"), "wb") as f:
+            f.write(values.tobytes())
+
+        self.index[name] = {
+            "start": start.strftime(TIME_FORMAT),
+            "step": step.total_seconds() / 60,
+            "length": len(values),
+            "columns": 1 if values.ndim == 1 else values.shape[1],
+        }
+        self.saveIndex()
+
+    def append(self, name, values, overwrite = 0) -> None:
+        """
+        Appends rows to the end of a series
+        :param name: the name of the series
+        :param values: the new rows
+        :param overwrite: the number of rows at the end of the series that are replaced by the first new rows
+        """
+
+        entry = self.index[name]
+        values = np.ascontiguousarray(values, dtype = "<f8")
+        row_size = 8 * entry["columns"]
+
+        with open(self.path / (name + ".bin"), "r+b") as f:
+            f.seek((entry["length"] - overwrite) * row_size)
+            f.write(values.tobytes())
+            f.truncate()
+
+        entry["length"] += len(values) - overwrite
+        self.saveIndex()
+
+    def read(self, name, t_start = None, t_end = None) -> np.ndarray:
+        """
+        Reads the rows of a series in a time range without loading the rest of the series
+        :param name: the name of the series
+        :param t_start: the time of the first row to read, the start of the series if None
+        :param t_end: the time of the last row to read (inclusive), the end of the series if None
+        :return: a read-only memory-mapped array of the rows
+        """
+
+        info = self.info(name)
+        first = 0 if t_start is None else max((t_start - info["start"]) // info["step"], 0)
+        last = info["length"] if t_end is None else min((t_end - info["start"]) // info["step"] + 1, info["length"])
+        if(last <= first or info["length"] == 0):
+            return np.zeros((0,) if info["columns"] == 1 else (0, info["columns"]))
+
+        shape = (info["length"],) if info["columns"] == 1 else (info["length"], info["columns"])
+        data = np.memmap(self.path / (name + ".bin"), dtype = "<f8", mode = "r", shape = shape)
+        return data[first:last]
+
+    def times(self, name, t_start = None, t_end = None) -> np.ndarray:
+        """
+        :return: the times of the rows returned by read with the same arguments, as datetime64 array
+        """
+
+        info = self.info(name)
+        first = 0 if t_start is None else max((t_start - info["start"]) // info["step"], 0)
+        last = info["length"] if t_end is None else min((t_end - info["start"]) // info["step"] + 1, info["length"])
+        return np.datetime64(info["start"], "m") + np.arange(first, max(last, first)) * np.timedelta64(info["step"])
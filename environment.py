@@ -1,41 +1,205 @@
 import config
 from scenario import Scenario
+import orderbook
+import loadprofiles
+import datastore
 
 import pandas as pd
 import datetime as dt
+import numpy as np
+
+def read_series(sc : Scenario, kind) -> pd.DataFrame:
+    """
+    Reads a complete data series from the data folder or the data store of the scenario
+    :param sc: the scenario
+    :param kind: the name of the series, one of the keys of config.DATA_FILES
+    :return: a DataFrame with the columns "Time" and config.DATA_COLUMNS[kind]
+    """
+
+    if(sc.data_store is not None):
+        store = datastore.DataStore(sc.data_store)
+        return pd.DataFrame({"Time": store.times(kind), config.DATA_COLUMNS[kind]: store.read(kind)})
+
+    return pd.read_csv(sc.data_path / config.DATA_FILES[kind], sep=";")
+
+
+def series_step(sc : Scenario, kind) -> dt.timedelta:
+    """
+    :return: the time step size of a data series in the data folder or the data store of the scenario
+    """
+
+    if(sc.data_store is not None):
+        return datastore.DataStore(sc.data_store).info(kind)["step"]
+    return config.DATA_STEPS[kind]
+
+
+def resample(values, step, t_delta, energy) -> np.ndarray:
+    """
+    Resamples a series on a regular time grid to another time step size.
+    Energy quantities per time step are summed up or split evenly, so that the total energy is preserved,
+    prices are averaged over time or repeated.
+    :param values: the values of the series
+    :param step: the time step size of the series
+    :param t_delta: the new time step size
+    :param energy: True for energy quantities per time step, False for prices
+    :return: the resampled values, an incomplete last time step is dropped
+    """
+
+    values = np.asarray(values, dtype = float)
+    if(t_delta == step):
+        return values
+
+    if(step % t_delta == dt.timedelta(0)): # finer time steps
+        k = step // t_delta
+        values = np.repeat(values, k)
+        return values / k if energy else values
+
+    if(t_delta % step == dt.timedelta(0)): # coarser time steps
+        k = t_delta // step
+        blocks = values[:len(values) // k * k].reshape(-1, k)
+        return blocks.sum(axis = 1) if energy else blocks.mean(axis = 1)
+
+    # other ratios: integrate the series, assumed constant within each time step, over the new time steps
+    ratio = t_delta / step
+    integral = np.concatenate(([0], np.cumsum(values)))
+    bounds = np.arange(int(len(values) / ratio) + 1) * ratio
+    result = np.diff(np.interp(bounds, np.arange(len(values) + 1), integral))
+    return result if energy else result / ratio
+
+
+def data_source(sc : Scenario) -> tuple:
+    """
+    :return: the data source of a scenario, runs with the same source can share a DataSet
+    """
+
+    return (str(sc.data_path), None if sc.data_store is None else str(sc.data_store))
+
+
+class DataSet():
+    """
+    The price, load and pv series of one data source, read once and shared by all runs on it.
+    The series are read on first use, and every run gets a view of the part it needs.
+    """
+
+    def __init__(self, sc : Scenario) -> None:
+        """
+        :param sc: a scenario whose data source (data folder or data store) is used
+        """
+
+        self.scenario = sc
+        self.series = dict()
+        self.steps = dict() # time step sizes of the series
+        self.aggregated_loads = dict() # aggregated synthetic household loads per (number of households, seed)
+
+    def get(self, kind) -> pd.DataFrame:
+        """
+        :param kind: the name of the series, one of the keys of config.DATA_FILES
+        :return: the complete series as a DataFrame with the columns "Time" (as datetime) and config.DATA_COLUMNS[kind]
+        """
+
+        if(kind not in self.series):
+            df = read_series(self.scenario, kind)
+            df["Time"] = pd.to_datetime(df["Time"])
+            self.series[kind] = df
+            self.steps[kind] = series_step(self.scenario, kind)
+        return self.series[kind]
+
+    def getLoad(self, households, seed) -> np.ndarray:
+        """
+        :return: the complete load series, aggregated from distinct synthetic households if households > 0
+        """
+
+        base = self.get("load")[config.DATA_COLUMNS["load"]].to_numpy(dtype = float)
+        if(households == 0):
+            return base
+
+        if((households, seed) not in self.aggregated_loads):
+            self.aggregated_loads[(households, seed)] = loadprofiles.aggregate_load(base, self.get("load")["Time"].to_numpy(), households, seed)
+        return self.aggregated_loads[(households, seed)]
+
+    def view(self, sc : Scenario, kind, values = None) -> pd.DataFrame:
+        """
+        Gives the part of a series needed by a run, from the start of the scenario up to the forecast horizon of the agent after its end,
+        resampled to the time step size of the scenario
+        :param sc: the scenario of the run
+        :param kind: the name of the series
+        :param values: optional values replacing the values of the series
+        :return: a DataFrame with the columns "Time" and config.DATA_COLUMNS[kind], indexed from 0
+        """
+
+        df = self.get(kind)
+        step = self.steps[kind]
+        steps = sc.number_of_intervals + sc.forecast_steps
+        rows = np.flatnonzero(df["Time"].to_numpy() >= np.datetime64(sc.t_start))
+        rows = rows[:-(-steps * sc.t_delta // step)]
+
+        column = config.DATA_COLUMNS[kind]
+        values = (df[column].to_numpy() if values is None else values)[rows]
+        values = resample(values, step, sc.t_delta, kind in ("load", "pv"))[:steps]
+        return pd.DataFrame({
+            "Time": np.datetime64(sc.t_start) + np.arange(len(values)) * np.timedelta64(sc.t_delta),
+            column: values,
+        })
+
 
 class Market():
     """
     Contains the market model, including market prices at different times, and handles offers placed by the agent
     """
 
-    def __init__(self, sc : Scenario) -> None:
+    def __init__(self, sc : Scenario, data = None) -> None:
+        """
+        :param sc: the scenario
+        :param data: an optional DataSet with the price data, read from the data source of the scenario if None
+        """
+
         self.scenario = sc
 
         self.time_index = 0
         self.current_time = self.scenario.t_start
 
-        # read in price data
-        self.prices_DA = pd.read_csv(config.DAY_AHEAD_PATH, sep=";")
-        self.prices_IA = pd.read_csv(config.INTRADAY_AUCTION_PATH, sep=";")
-        self.prices_IC = pd.read_csv(config.INTRADAY_CONTINUOUS_PATH, sep=";")
+        # price data of the relevant sequence from start to end from config
+        if(data is None): data = DataSet(sc)
+        self.prices_DA = data.view(sc, "DA")
+        self.prices_IA = data.view(sc, "IA")
+        self.prices_IC = data.view(sc, "IC")
 
-        # slice DataFrame to the relevant sequence from start to end from config
-        self.prices_DA = self.prices_DA.loc[self.prices_DA["Time"] >= self.scenario.t_start_str]
-        self.prices_DA.reset_index(drop=True, inplace=True)
+        # transform prices to [€/kWh]
+        self.prices_DA["Price"] = self.prices_DA["Price"] / 1000
+        self.prices_IA["Price"] = self.prices_IA["Price"] / 1000
+        self.prices_IC["Price"] = self.prices_IC["Price"] / 1000
 
-        self.prices_IA = self.prices_IA.loc[self.prices_IA["Time"] >= self.scenario.t_start_str]
-        self.prices_IA.reset_index(drop=True, inplace=True)
+        # price arrays for fast access per time step
+        self.prices = dict()
+        self.prices["DA"] = self.prices_DA["Price"].to_numpy()
+        self.prices["IA"] = self.prices_IA["Price"].to_numpy()
+        self.prices["IC"] = self.prices_IC["Price"].to_numpy()
 
-        self.prices_IC = self.prices_IC.loc[self.prices_IC["Time"] >= self.scenario.t_start_str]
-        self.prices_IC.reset_index(drop=True, inplace=True)
+        # optional order book model of the intraday continuous market
+        self.order_books = None
+        self.fills = dict() # fills of the offers per contract, in the order of placement
+        if(self.scenario.ic_order_book):
+            self.order_books = orderbook.IntradayOrderBooks(self.prices_IC["Price"].to_numpy(dtype = float), self.scenario.ic_order_book_seed,
+                                                            window = self.scenario.steps_per_day)
 
-        # transform prices to [€/kWh]
-        for i in range(len(self.prices_DA)):
-            self.prices_DA.at[i, "Price"] = self.prices_DA["Price"][i] / 1000
-        for i in range(len(self.prices_IA)):
-            self.prices_IA.at[i, "Price"] = self.prices_IA["Price"][i] / 1000
-            self.prices_IC.at[i, "Price"] = self.prices_IC["Price"][i] / 1000
+    def getState(self) -> dict:
+        """
+        :return: a snapshot of the state of the market between two time steps, i.e. without the price data
+        """
+
+        return {"time_index": self.time_index, "current_time": self.current_time, "fills": dict(self.fills),
+                "books": None if self.order_books is None else dict(self.order_books.books)}
+
+    def setState(self, state) -> None:
+        """
+        Restores a snapshot of the state of the market, see getState
+        """
+
+        self.time_index = state["time_index"]
+        self.current_time = state["current_time"]
+        self.fills = dict(state["fills"])
+        if(self.order_books is not None):
+            self.order_books.books = dict(state["books"])
 
     def getMarketPrices(self) -> dict:
         """
@@ -45,11 +209,28 @@ class Market():
         """
         
         result = dict()
-        result["DA"] = self.prices_DA["Price"][self.time_index // 4]
-        result["IA"] = self.prices_IA["Price"][self.time_index]
-        result["IC"] = self.prices_IC["Price"][self.time_index]
+        result["DA"] = self.prices["DA"][self.time_index]
+        result["IA"] = self.prices["IA"][self.time_index]
+        result["IC"] = self.prices["IC"][self.time_index]
         self.time_index += 1
-        self.current_time = self.current_time + config.T_DELTA
+        self.current_time = self.current_time + self.scenario.t_delta
+        return result
+
+    def getMarketPriceBlock(self, n) -> dict:
+        """
+        Gives the market prices of the next n time steps at once, equivalent to n calls of getMarketPrices
+        :param n: the number of time steps
+        :return: a dictionary with the markets as keys and NumPy arrays of the respective market prices as values
+        """
+
+        indices = self.time_index + np.arange(n)
+
+        result = dict()
+        result["DA"] = self.prices["DA"][indices]
+        result["IA"] = self.prices["IA"][indices]
+        result["IC"] = self.prices["IC"][indices]
+        self.time_index += n
+        self.current_time = self.current_time + self.scenario.t_delta * n
         return result
 
     def place_offer(self, offer) -> bool:
@@ -61,9 +242,9 @@ class Market():
 
         res = True
         market, del_time, quantity, _ = offer
-        compare_time = self.current_time - config.T_DELTA # to correct for the prices that have already been observed in the current time period
+        compare_time = self.current_time - self.scenario.t_delta # to correct for the prices that have already been observed in the current time period
 
-        if(quantity < self.scenario.min_offer_quantity):
+        if(quantity < self.scenario.min_offer_quantity - 0.000001): # the agent's quantities may be rounded below the minimum
             res = False
         
         # check gate closure time
@@ -85,45 +266,93 @@ class Market():
             if(del_time <= compare_time):
                 res = False
 
+        # match the offer against the order book, it is executed only as far as there are matching bids
+        if(market == "IC" and self.order_books is not None):
+            fills = list()
+            if(res):
+                k = (del_time - self.scenario.t_start) // self.scenario.t_delta
+                fills = self.order_books.submit(k, "sell", offer[3], quantity, "agent")
+            self.fills.setdefault(offer, list()).append(fills)
+
         return res
 
+    def settle(self, contract, price) -> tuple:
+        """
+        Settles a contract at its delivery time
+        :param contract: the contract to settle
+        :param price: the current market price of the contract's market
+        :return: the revenue, the executed quantity and the average execution price as a tuple.
+        Without an order book, contracts are executed completely at the market price.
+        """
+
+        (market, del_time, quantity, _) = contract
+        if(market != "IC" or self.order_books is None):
+            return (price * quantity, quantity, price)
+
+        fills = self.fills[contract].pop(0)
+        if(len(self.fills[contract]) == 0):
+            del self.fills[contract]
+        self.order_books.release((del_time - self.scenario.t_start) // self.scenario.t_delta)
+
+        executed = sum(f.quantity for f in fills)
+        revenue = sum(f.price * f.quantity for f in fills)
+        return (revenue, executed, revenue / executed if executed > 0 else price)
+
 
 class Household():
     """
     Models the state of the household of the agent, including the battery and the pv system
     """
 
-    def __init__(self, sc : Scenario) -> None:
+    def __init__(self, sc : Scenario, data = None) -> None:
+        """
+        :param sc: the scenario
+        :param data: an optional DataSet with the load and pv data, read from the data source of the scenario if None
+        """
+
         self.scenario = sc
 
         self.time_index = 0
 
-        # read in load data
-        self.load = pd.read_csv(config.LOAD_RESIDENTIAL_PATH, sep=";")
+        # load data of the relevant sequence, the aggregated load of distinct synthetic households instead of the base profile if configured
+        if(data is None): data = DataSet(sc)
+        self.load = data.view(sc, "load", data.getLoad(self.scenario.households, self.scenario.household_seed))
         self.load.rename(columns={"Sum [kWh]": "Load"}, inplace=True)
-        self.load = self.load.loc[self.load["Time"] >= self.scenario.t_start_str]
-        self.load.reset_index(drop=True, inplace=True)
 
         # scale load data
-        for i in range(len(self.load)):
-            self.load.at[i, "Load"] = self.load["Load"][i] * self.scenario.load_multiplier
+        self.load["Load"] = self.load["Load"] * self.scenario.load_multiplier
 
-        # read in PV data
-        self.pv = pd.read_csv(config.PV_PATH, sep=";")
+        # PV data of the relevant sequence
+        self.pv = data.view(sc, "pv")
         self.pv.rename(columns={"pv": "Amount"}, inplace=True)
-        self.pv = self.pv.loc[self.pv["Time"] >= self.scenario.t_start_str]
-        self.pv.reset_index(drop=True, inplace=True)
 
         # scale PV data
-        for i in range(len(self.pv)):
-            self.pv.at[i, "Amount"] = self.pv["Amount"][i] * self.scenario.pv_power_stc
-        
+        self.pv["Amount"] = self.pv["Amount"] * self.scenario.pv_power_stc
+
+        # arrays for fast access per time step
+        self.load_values = self.load["Load"].to_numpy()
+        self.pv_values = self.pv["Amount"].to_numpy()
+
+    def getState(self) -> dict:
+        """
+        :return: a snapshot of the state of the household between two time steps, i.e. without the load and pv data
+        """
+
+        return {"time_index": self.time_index}
+
+    def setState(self, state) -> None:
+        """
+        Restores a snapshot of the state of the household, see getState
+        """
+
+        self.time_index = state["time_index"]
+
     def getPV(self) -> float:
         """
         :return: the PV generation data known to the agent at the current time
         """
 
-        result = self.pv["Amount"][self.time_index]
+        result = self.pv_values[self.time_index]
         self.time_index += 1
 
         return result
@@ -133,5 +362,5 @@ class Household():
         :return: current base load
         """
         
-        result = self.load["Load"][self.time_index]
+        result = self.load_values[self.time_index]
         return result
@@ -0,0 +1,191 @@
+from scenario import Scenario
+import settlement
+import config
+
+import datetime as dt
+import numpy as np
+
+# This file contains a forecast error model for the pv and load data known to the agent.
+# Without it, the agent knows the realized pv generation and load of its whole lookahead window (perfect foresight).
+# With it, the forecast of a time step at a lead time of h time steps is the realized value times (1 + s(h) * z), where
+#   - s(h) = sigma * sqrt(h * t_delta / 1 day) is the standard deviation of the relative error, growing with the lead time,
+#   - z is a standard normal AR(1) series over the time steps, i.e. the errors of neighboring time steps are correlated.
+# The forecasts of the whole window are revised in every time step, so that they converge to the realized values at delivery.
+# The difference between the realized and the planned energy balance of a time step is settled through the grid.
+# The error series of all members of an ensemble are generated in one vectorized pass, see generate.
+
+def enabled(sc : Scenario) -> bool:
+    """
+    :return: whether the scenario uses forecast errors
+    """
+
+    return sc.forecast_error_pv > 0 or sc.forecast_error_load > 0
+
+
+def ar1_series(rng, count, n, phi) -> np.ndarray:
+    """
+    Generates standard normal AR(1) series z[t] = phi * z[t-1] + sqrt(1 - phi^2) * e[t] for all members at once.
+    The recursion is computed in blocks through a lower triangular matrix of the powers of phi.
+    The blocks of every member are multiplied in one matrix product of their own, so that a member gets the same series
+    in ensembles of any size, the product of several members at once differs in the last bits.
+    :param rng: the random number generator
+    :param count: the number of series
+    :param n: the length of the series
+    :param phi: the correlation of neighboring values
+    :return: an array of shape (count, n)
+    """
+
+    noise = rng.standard_normal((count, n))
+    if(n == 0):
+        return np.empty((count, n))
+
+    length = min(config.FORECAST_ERROR_BLOCK, n)
+    lags = np.arange(length)[:, np.newaxis] - np.arange(length)[np.newaxis, :]
+    powers = np.where(lags >= 0, phi ** np.maximum(lags, 0), 0.0) # powers[j, i] = phi^(j - i) for i <= j
+    decay = phi ** np.arange(1, length + 1) # influence of the last value of the previous block
+
+    # the innovations within the blocks, the last block padded with zeros
+    blocks = -(-n // length)
+    padded = np.zeros((count, blocks * length))
+    padded[:, :n] = noise
+    innovation = np.sqrt(1 - phi**2)
+
+    # stationary start z[0] = e[0], through the first innovation or, if phi = 1, as the value before the first block
+    previous = np.zeros(count)
+    if(innovation > 0):
+        padded[:, 0] /= innovation
+    else:
+        previous = noise[:, 0].copy()
+    inner = np.stack([innovation * padded[k].reshape(blocks, length) @ powers.T for k in range(count)])
+
+    z = np.empty((count, blocks * length))
+    for b in range(blocks):
+        z[:, b * length:(b + 1) * length] = inner[:, b] + previous[:, np.newaxis] * decay[np.newaxis, :]
+        previous = z[:, (b + 1) * length - 1]
+    return z[:, :n]
+
+
+def generate(sc : Scenario, count, seed) -> list:
+    """
+    Generates the forecast errors of the members of an ensemble in one vectorized pass.
+    The first member has the forecast errors of a single run with the same seed.
+    :param sc: the scenario
+    :param count: the number of members
+    :param seed: the seed of the ensemble
+    :return: a list with one ForecastErrors per member
+    """
+
+    n = sc.number_of_intervals + sc.forecast_steps + 1 # all time steps that enter the lookahead window
+    phi = sc.forecast_error_correlation ** (sc.t_delta / dt.timedelta(hours = 1)) # correlation of neighboring time steps
+    (pv_rng, load_rng) = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(2)]
+    z_pv = ar1_series(pv_rng, count, n, phi)
+    z_load = ar1_series(load_rng, count, n, phi)
+    return [ForecastErrors(sc, z_pv[k], z_load[k]) for k in range(count)]
+
+
+def summary(results, percentiles = (5, 25, 50, 75, 95)) -> dict:
+    """
+    Summarizes the KPIs of the members of an ensemble
+    :param results: a list of session.Result
+    :param percentiles: the percentiles to compute
+    :return: a dictionary with the distributions of "net_revenue", the revenues per market and "violations",
+    see settlement.distribution
+    """
+
+    names = ["net_revenue", "revenue_DA", "revenue_IA", "revenue_IC", "revenue_grid", "costs_grid", "violations"]
+    return {name: settlement.distribution([r.kpis[name] for r in results], percentiles) for name in names}
+
+
+class ForecastErrors():
+    """
+    The forecast errors of the pv and load data of one run, and the realized values of the time steps loaded so far
+    """
+
+    def __init__(self, sc : Scenario, z_pv, z_load) -> None:
+        """
+        :param sc: the scenario
+        :param z_pv: the standard normal error series of the pv generation, one value per time step
+        :param z_load: the standard normal error series of the load, one value per time step
+        """
+
+        self.scenario = sc
+        self.z_pv = z_pv
+        self.z_load = z_load
+
+        # standard deviation of the relative error per lead time
+        leads = np.sqrt(np.arange(sc.forecast_steps + 1) / sc.steps_per_day)
+        self.scale_pv = sc.forecast_error_pv * leads
+        self.scale_load = sc.forecast_error_load * leads
+
+        # realized values and current forecasts of the time steps that entered the lookahead window
+        self.pv = np.zeros(len(z_pv))
+        self.load = np.zeros(len(z_load))
+        self.pv_forecast = np.zeros(len(z_pv))
+        self.load_forecast = np.zeros(len(z_load))
+        self.loaded = 0
+
+    def forecast(self, lead, load, pv) -> tuple:
+        """
+        Stores the realized values of the next time step entering the lookahead window and gives their forecasts
+        :param lead: the lead time of the time step
+        :param load: the realized load
+        :param pv: the realized pv generation
+        :return: the forecasts of the load and the pv generation
+        """
+
+        t = self.loaded
+        self.load[t] = load
+        self.pv[t] = pv
+        self.load_forecast[t] = load * max(1 + self.scale_load[lead] * self.z_load[t], 0)
+        self.pv_forecast[t] = pv * max(1 + self.scale_pv[lead] * self.z_pv[t], 0)
+        self.loaded += 1
+        return (float(self.load_forecast[t]), float(self.pv_forecast[t]))
+
+    def revise(self, ag, index) -> None:
+        """
+        Revises the forecasts of the lookahead window of an agent at the start of the current time step.
+        The current time step gets its realized values, and the deviation from its planned energy balance is settled through the grid.
+        :param ag: the agent
+        :param index: the index of the current time step
+        """
+
+        V = ag.valid_f
+        window = slice(index, index + V)
+        pv = self.pv[window] * np.maximum(1 + self.scale_pv[:V] * self.z_pv[window], 0)
+        load = self.load[window] * np.maximum(1 + self.scale_load[:V] * self.z_load[window], 0)
+        delta = (pv - load) - (self.pv_forecast[window] - self.load_forecast[window])
+        self.pv_forecast[window] = pv
+        self.load_forecast[window] = load
+
+        # the deviation of the current time step from its planned energy balance is settled through the grid
+        r = ag.index_f
+        if(delta[0] < 0):
+            ag.grid_demand[r] -= float(delta[0])
+        else:
+            ag.grid_supply[r] += float(delta[0])
+
+        # the aggregated surplus of the later time steps changes by the cumulated revisions
+        shift = np.cumsum(delta)
+        shift -= delta[0]
+
+        # write the window back to the ring buffers of the agent, in at most two contiguous segments
+        first = min(V, ag.length_forecast - r)
+        for (ring, part) in ((slice(r, r + first), slice(0, first)), (slice(0, V - first), slice(first, V))):
+            ag.pv_forecast[ring] = pv[part].tolist()
+            ag.load_forecast[ring] = load[part].tolist()
+            ag.surplus_agg[ring] = (np.array(ag.surplus_agg[ring], dtype = float) + shift[part]).tolist()
+
+    def settle(self, ag) -> None:
+        """
+        Nets the battery and grid flows of the current time step of an agent after its decisions.
+        Decisions taken on different forecasts can plan opposite flows for the same time step, only their difference is realized.
+        :param ag: the agent
+        """
+
+        r = ag.index_f
+        net = ag.charge[r] - ag.discharge[r]
+        ag.charge[r] = max(net, 0)
+        ag.discharge[r] = max(-net, 0)
+        net = ag.grid_demand[r] - ag.grid_supply[r]
+        ag.grid_demand[r] = max(net, 0)
+        ag.grid_supply[r] = max(-net, 0)
@@ -0,0 +1,327 @@
+import config
+import datastore
+import environment as env
+
+import sys
+import argparse
+import datetime as dt
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# This file contains the incremental ingest of daily data drops into a binary data store (see datastore.py).
+# A drop is a folder in the layout of the data folder with one day of any of the series: the price files (DA, IA, IC),
+# the load file and either the pv file or the weather files (temperature and radiation), from which the pv series is derived.
+# Every file of a drop is validated (columns, one calendar day, time continuity, 96 quarter-hours or 24 hours,
+# 92/100 or 23/25 rows on the days of the daylight saving time changes) before anything is written,
+# and the series are appended to the store in O(new rows), so that runs never re-parse the whole history.
+# The store holds the series in the form the simulation reads them:
+#   - all series are brought to the regular wall-clock time grid of the simulation, the missing hour of the change
+#     to daylight saving time is interpolated (prices) or empty (energy), the repeated hour of the change back is averaged (prices)
+#     or summed up (energy),
+#   - new series are created with the default simulation time step, e.g. the hourly day-ahead prices are expanded to quarter-hours,
+#   - the pv series is derived from the hourly pv values (config.PV_NODES) like in pv-generation.py, where the last hour of a day
+#     depends on the first value of the next day and is recomputed when that day is ingested.
+#
+#   python ingest.py <store> incoming/2023-01-01 incoming/2023-01-02 ...
+
+DAY = dt.timedelta(days = 1)
+HOUR = dt.timedelta(hours = 1)
+ENERGY = ("load", "pv") # series of energy quantities per time step, all others are prices
+WEATHER_FILES = {"temperature": config.TEMPERATURE_PATH.name, "radiation": config.RADIATION_PATH.name}
+
+def local_times(date, step) -> pd.DatetimeIndex:
+    """
+    :return: the wall-clock times of a calendar day in config.DATA_TIMEZONE at the given time step,
+    without the missing hour of the change to daylight saving time and with the repeated hour of the change back
+    """
+
+    start = pd.Timestamp(date).tz_localize(config.DATA_TIMEZONE)
+    end = (pd.Timestamp(date) + DAY).tz_localize(config.DATA_TIMEZONE)
+    return pd.date_range(start, end, freq = step, inclusive = "left").tz_localize(None)
+
+
+def fill_gaps(values, name) -> np.ndarray:
+    """
+    Interpolates short runs of missing values
+    :param values: the values of a day
+    :param name: the name of the data for error messages
+    :return: the values without missing values
+    """
+
+    missing = np.isnan(values)
+    if(not missing.any()):
+        return values
+    if(missing.all()):
+        raise ValueError(f"{name}: no values")
+
+    # lengths of the runs of missing values
+    edges = np.diff(np.concatenate(([0], missing.astype(np.int8), [0])))
+    (starts, ends) = (np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+    longest = (ends - starts).max()
+    if(longest > config.INGEST_MAX_GAP):
+        raise ValueError(f"{name}: {longest} consecutive missing values from row {starts[np.argmax(ends - starts)]}, "
+                         f"at most {config.INGEST_MAX_GAP} are interpolated")
+
+    rows = np.arange(len(values))
+    return np.interp(rows, rows[~missing], values[~missing])
+
+
+def read_day(path, kind) -> tuple:
+    """
+    Reads and validates one day of a series in the format of the data folder
+    :param path: the file
+    :param kind: the name of the series, one of the keys of config.DATA_FILES
+    :return: the date and the values of the day on the regular wall-clock time grid with the time step config.DATA_STEPS[kind]
+    """
+
+    column = config.DATA_COLUMNS[kind]
+    step = config.DATA_STEPS[kind]
+    df = pd.read_csv(path, sep = ";", encoding = "utf-8-sig") # the price files start with a byte order mark
+
+    missing = [c for c in ("Time", column) if c not in df.columns]
+    if(len(missing) > 0):
+        raise ValueError(f"{path}: missing columns {', '.join(missing)}")
+
+    times = pd.to_datetime(df["Time"], errors = "coerce")
+    values = pd.to_numeric(df[column], errors = "coerce")
+    if(times.isna().any()):
+        raise ValueError(f"{path}: invalid time in row {np.flatnonzero(times.isna())[0]}")
+    if((values.isna() & df[column].notna()).any()):
+        raise ValueError(f"{path}: invalid value in row {np.flatnonzero(values.isna() & df[column].notna())[0]}")
+    if(len(times) == 0):
+        raise ValueError(f"{path}: no rows")
+
+    # the exports end with an empty row at midnight of the next day
+    date = times.iloc[0].normalize()
+    if(len(times) > 1 and times.iloc[-1] == date + DAY and np.isnan(values.iloc[-1])):
+        (times, values) = (times.iloc[:-1], values.iloc[:-1])
+    times = pd.DatetimeIndex(times)
+    values = values.to_numpy(dtype = float)
+
+    if((times.normalize() != date).any()):
+        raise ValueError(f"{path}: the rows cover more than one day, {times[0]} to {times[-1]}")
+    if(((times - date) % step != dt.timedelta(0)).any()):
+        raise ValueError(f"{path}: times not aligned with the time step of {step}")
+
+    grid = pd.date_range(date, periods = DAY // step, freq = step)
+    if(len(times) == len(grid) and (times == grid).all()): # already on the wall-clock time grid
+        return (date.date(), fill_gaps(values, path))
+
+    local = local_times(date, step)
+    if(len(times) != len(local) or not (times == local).all()):
+        expected = f"{len(grid)}" if len(local) == len(grid) else f"{len(grid)} or {len(local)} on this daylight saving time change"
+        if(len(times) != len(grid) and len(times) != len(local)):
+            gaps = grid.difference(times)
+            detail = f", first missing time {gaps[0]}" if len(gaps) > 0 else ""
+            raise ValueError(f"{path}: {len(times)} rows, expected {expected}{detail}")
+        reference = local if len(times) == len(local) else grid
+        row = np.flatnonzero(times != reference)[0]
+        raise ValueError(f"{path}: time {times[row]} in row {row}, expected {reference[row]}")
+
+    # bring the day of a daylight saving time change to the wall-clock time grid
+    slots = np.asarray((times - date) // step, dtype = np.int64)
+    sums = np.bincount(slots, weights = np.nan_to_num(values), minlength = len(grid))
+    if(kind in ENERGY): # the missing hour has no energy, the energy of the repeated hour is summed up
+        unknown = np.bincount(slots, weights = np.isnan(values), minlength = len(grid)) > 0
+        values = np.where(unknown, np.nan, sums)
+    else: # the missing hour is interpolated, the prices of the repeated hour are averaged
+        known = np.bincount(slots, weights = ~np.isnan(values), minlength = len(grid))
+        values = np.where(known > 0, sums / np.maximum(known, 1), np.nan)
+    return (date.date(), fill_gaps(values, path))
+
+
+def read_weather(path) -> tuple:
+    """
+    Reads and validates one day of hourly weather data in the format of config.TEMPERATURE_PATH and config.RADIATION_PATH
+    :param path: the drop folder with the temperature and radiation files
+    :return: the date and the hourly pv values of the day, see pv_nodes
+    """
+
+    frames = dict()
+    for name, filename in WEATHER_FILES.items():
+        df = pd.read_csv(Path(path) / filename, sep = ";", skipinitialspace = True)
+        column = "TT_TU" if name == "temperature" else "FG_LBERG"
+        missing = [c for c in ("MESS_DATUM", column) if c not in df.columns]
+        if(len(missing) > 0):
+            raise ValueError(f"{Path(path) / filename}: missing columns {', '.join(missing)}")
+
+        # the radiation is measured some minutes before or after the full hour ("2022010100:16"), to which it is attributed
+        stamps = df["MESS_DATUM"].astype(str).str.strip()
+        stamps = stamps.where(stamps.str.contains(":"), stamps + ":00") # the temperature is given for the full hour ("2022010100")
+        times = pd.to_datetime(stamps, format = "%Y%m%d%H:%M", errors = "coerce").dt.round(HOUR)
+        values = pd.to_numeric(df[column], errors = "coerce").to_numpy(dtype = float)
+        if(times.isna().any() or np.isnan(values).any()):
+            raise ValueError(f"{Path(path) / filename}: invalid time or value")
+        frames[name] = (pd.DatetimeIndex(times), values)
+
+    (times, temperature) = frames["temperature"]
+    (times_r, radiation) = frames["radiation"]
+    date = times[0].normalize()
+    grid = pd.date_range(date, periods = 24, freq = HOUR)
+    for (name, t) in (("temperature", times), ("radiation", times_r)):
+        if(len(t) != 24 or not (t == grid).all()):
+            raise ValueError(f"{Path(path) / WEATHER_FILES[name]}: expected the 24 hours of {date.date()}, got {len(t)} rows from {t[0]} to {t[-1]}")
+
+    return (date.date(), pv_nodes(temperature, radiation * 2.777778)) # conversion from J/cm^2 to W/m^2
+
+
+def pv_nodes(temperature, radiation) -> np.ndarray:
+    """
+    Computes the hourly pv values of pv-generation.py, which are multiplied with the STC power to obtain the pv generation in kWh
+    :param temperature: the air temperature [°C]
+    :param radiation: the radiation [W/m^2]
+    :return: the pv values
+    """
+
+    t1 = temperature + (config.PV_NOCT - 20) * (radiation / 800) # temperature of the solar panel
+    nodes = radiation * (1 - config.PV_LAMBDA * (t1 - config.PV_T_STC)) / config.PV_G_STC
+    return np.where(nodes < 0, 0.0, nodes)
+
+
+def pv_quarter_hours(nodes, previous, following) -> np.ndarray:
+    """
+    Interpolates hourly pv values to quarter-hours like pv-generation.py
+    :param nodes: the hourly pv values
+    :param previous: the value of the hour before the first one, the first value if unknown
+    :param following: the value of the hour after the last one, 0 if unknown
+    :return: four values per hour
+    """
+
+    full = np.concatenate(([previous], nodes, [following]))
+    gradients = np.diff(full) # gradients[i] = full[i + 1] - full[i]
+    following = full[2:]
+    quarters = np.empty((len(nodes), 4))
+    quarters[:, 0] = nodes
+    quarters[:, 1] = nodes + gradients[:-1] / 4
+    quarters[:, 2] = following - gradients[1:] / 2
+    quarters[:, 3] = following - gradients[1:] / 4
+    quarters[:, 1:] = np.where(quarters[:, 1:] < 0, 0.0, quarters[:, 1:])
+    return quarters.ravel()
+
+
+def position(store, name, date) -> str:
+    """
+    :return: "new" if the store has no series with the name, "append" if the date directly follows its end
+    and "ingested" if the date is already covered
+    """
+
+    if(name not in store):
+        return "new"
+    end = store.end(name)
+    start = dt.datetime.combine(date, dt.time())
+    if(start == end):
+        return "append"
+    if(start < end):
+        return "ingested"
+    raise ValueError(f"{name}: the data from {end} to {start} is missing in the store")
+
+
+def read_drop(path) -> dict:
+    """
+    Reads and validates all files of a drop
+    :param path: the drop folder
+    :return: a dictionary with the names of the series as keys and the date and values of the day as values,
+    the pv values derived from weather files under config.PV_NODES
+    """
+
+    path = Path(path)
+    days = dict()
+    for kind, filename in config.DATA_FILES.items():
+        if((path / filename).exists()):
+            days[kind] = read_day(path / filename, kind)
+
+    weather = [(path / filename).exists() for filename in WEATHER_FILES.values()]
+    if(any(weather)):
+        if(not all(weather)):
+            raise ValueError(f"{path}: the weather data needs both {' and '.join(WEATHER_FILES.values())}")
+        if("pv" in days):
+            raise ValueError(f"{path}: both pv data and weather data")
+        days[config.PV_NODES] = read_weather(path)
+
+    if(len(days) == 0):
+        raise ValueError(f"{path}: no data files")
+    return days
+
+
+def ingest_drop(store, path) -> dict:
+    """
+    Validates a drop and appends its days to the store. Nothing is written if any file of the drop is invalid,
+    and days that are already in the store are skipped, so that a drop can be ingested again after a failure.
+    :param store: the datastore.DataStore
+    :param path: the drop folder
+    :return: a dictionary with the number of new rows per series
+    """
+
+    days = read_drop(path)
+
+    # check the continuity of all series before writing anything
+    positions = {name: position(store, name, date) for name, (date, _) in days.items()}
+    if(config.PV_NODES in days and positions[config.PV_NODES] != "ingested"):
+        pv_position = position(store, "pv", days[config.PV_NODES][0])
+        if(pv_position != positions[config.PV_NODES]):
+            raise ValueError(f"{path}: the pv series and the hourly pv values {config.PV_NODES} of the store end at different times")
+        if(pv_position == "append" and store.info("pv")["step"] != HOUR / 4):
+            raise ValueError(f"{path}: the pv series of the store has a time step of {store.info('pv')['step']}, deriving it needs quarter-hours")
+
+    rows = dict()
+    for name, (date, values) in days.items():
+        if(positions[name] == "ingested"):
+            rows[name] = 0
+            if(name == config.PV_NODES):
+                rows["pv"] = 0
+            continue
+        if(name == config.PV_NODES):
+            rows["pv"] = append_pv(store, date, values, positions[name])
+            rows[name] = len(values)
+            continue
+
+        step = config.T_DELTA if positions[name] == "new" else store.info(name)["step"]
+        values = env.resample(values, config.DATA_STEPS[name], step, name in ENERGY)
+        if(positions[name] == "new"):
+            store.write(name, dt.datetime.combine(date, dt.time()), step, values)
+        else:
+            store.append(name, values)
+        rows[name] = len(values)
+    return rows
+
+
+def append_pv(store, date, nodes, pos) -> int:
+    """
+    Appends the hourly pv values of a day and the quarter-hourly pv series derived from them.
+    The last hour of the previous day is recomputed with the first value of the new day.
+    :param store: the datastore.DataStore
+    :param date: the date of the day
+    :param nodes: the hourly pv values of the day
+    :param pos: the position of the day in the store, see position
+    :return: the number of new rows of the pv series
+    """
+
+    start = dt.datetime.combine(date, dt.time())
+    if(pos == "new"):
+        store.write(config.PV_NODES, start, HOUR, nodes)
+        store.write("pv", start, HOUR / 4, pv_quarter_hours(nodes, nodes[0], 0.0))
+        return 4 * len(nodes)
+
+    last = np.array(store.read(config.PV_NODES)[-2:]) # the last hour of the previous day and the hour before it
+    previous = last[0] if len(last) == 2 else last[-1]
+    values = np.concatenate((pv_quarter_hours(last[-1:], previous, nodes[0]), pv_quarter_hours(nodes, last[-1], 0.0)))
+
+    store.append(config.PV_NODES, nodes)
+    store.append("pv", values, overwrite = 4)
+    return 4 * len(nodes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "validates daily data drops and appends them to a binary data store")
+    parser.add_argument("store", help = "the data store, created if it does not exist")
+    parser.add_argument("drops", nargs = "+", help = "drop folders in the layout of the data folder, ingested in the given order")
+    args = parser.parse_args()
+
+    store = datastore.DataStore(args.store)
+    for drop in args.drops:
+        try:
+            rows = ingest_drop(store, drop)
+        except ValueError as e:
+            sys.exit(f"{drop}: {e}")
+        print(f"{drop}: " + ", ".join(f"{name} +{n}" for name, n in rows.items()))
@@ -0,0 +1,206 @@
+import importlib.util
+import numpy as np
+
+# This file contains the numeric kernels of the agent's inner functions, which run for every planned time step:
+# the minimum of the aggregated surplus and the battery forecast over the rest of the forecast window (Agent.getMinSurplus),
+# the update of the battery and surplus forecasts after an action (Agent.updateForecasts), the energy of the contracts
+# for a time step (Agent.plan_decision) and the search for the contracts to settle (Agent.settleContracts).
+# The kernels work on array-based agent state: the forecast ring buffers as float arrays and the open contracts as a ContractBook.
+# There are two backends with identical results, selected per run with the scenario key "kernels":
+#   - "numba": the loops below compiled with Numba, used by "auto" if Numba is installed,
+#   - "numpy": vectorized NumPy versions of the loops, used by "auto" otherwise.
+# "python" keeps the list-based reference implementation of the agent.
+# Numba is only imported when its backend is loaded, as importing it takes a noticeable part of a short run.
+
+BACKENDS = ["python", "numpy", "numba"]
+NUMBA = importlib.util.find_spec("numba") is not None
+
+def resolve(name) -> str:
+    """
+    :param name: one of BACKENDS or "auto"
+    :return: the backend to use, "auto" is "numba" if Numba is installed and "numpy" otherwise
+    """
+
+    if(name == "auto"):
+        return "numba" if NUMBA else "numpy"
+    if(name not in BACKENDS):
+        raise ValueError(f"unknown kernel backend {name}, available backends: auto, {', '.join(BACKENDS)}")
+    if(name == "numba" and not NUMBA):
+        raise ImportError("the numba kernel backend requires numba")
+    return name
+
+
+# --- loops, compiled by the numba backend ---
+
+def min_surplus_loop(surplus_agg, battery, first, stop, length) -> tuple:
+    """
+    :return: the minimum of the aggregated surplus and of the battery forecast over the forecast steps first to stop - 1,
+    given as positions in the ring buffers of the given length, or the values at first if the range is empty
+    """
+
+    minimum = surplus_agg[first % length]
+    battery_min = battery[first % length]
+    for i in range(first, stop):
+        index = i % length
+        if(surplus_agg[index] < minimum):
+            minimum = surplus_agg[index]
+        if(battery[index] < battery_min):
+            battery_min = battery[index]
+    return (minimum, battery_min)
+
+
+def update_loop(surplus_agg, battery, first, stop, length, battery_delta, surplus_delta) -> None:
+    """
+    Adds the change of the battery state and of the aggregated surplus to the forecast steps first to stop - 1 of the ring buffers
+    """
+
+    for i in range(first, stop):
+        index = i % length
+        battery[index] += battery_delta
+        surplus_agg[index] += surplus_delta
+
+
+def contract_surplus_loop(surplus, steps, quantities, count, step) -> float:
+    """
+    :return: the surplus minus the quantities of the contracts for delivery at the given time step, subtracted in the order of the contracts
+    """
+
+    for i in range(count):
+        if(steps[i] == step):
+            surplus -= quantities[i]
+    return surplus
+
+
+def due_contracts_loop(steps, count, step) -> np.ndarray:
+    """
+    :return: the positions of the contracts for delivery up to the given time step, in the order of the contracts
+    """
+
+    due = np.empty(count, dtype = np.int64)
+    n = 0
+    for i in range(count):
+        if(steps[i] <= step):
+            due[n] = i
+            n += 1
+    return due[:n]
+
+
+# --- vectorized versions of the loops for the numpy backend ---
+
+def ring_slices(first, stop, length) -> tuple:
+    """
+    :return: the forecast steps first to stop - 1 as at most two slices of the ring buffers of the given length
+    """
+
+    start = first % length
+    end = start + (stop - first)
+    if(end <= length):
+        return (slice(start, end),)
+    return (slice(start, length), slice(0, end - length))
+
+
+def min_surplus_numpy(surplus_agg, battery, first, stop, length) -> tuple:
+    if(stop <= first):
+        return (surplus_agg[first % length], battery[first % length])
+    parts = ring_slices(first, stop, length)
+    return (min(surplus_agg[s].min() for s in parts), min(battery[s].min() for s in parts))
+
+
+def update_numpy(surplus_agg, battery, first, stop, length, battery_delta, surplus_delta) -> None:
+    if(stop <= first):
+        return
+    for s in ring_slices(first, stop, length):
+        battery[s] += battery_delta
+        surplus_agg[s] += surplus_delta
+
+
+def contract_surplus_numpy(surplus, steps, quantities, count, step) -> float:
+    for q in quantities[:count][steps[:count] == step]: # usually a single contract, subtracted in order like the loop
+        surplus -= q
+    return surplus
+
+
+def due_contracts_numpy(steps, count, step) -> np.ndarray:
+    return np.flatnonzero(steps[:count] <= step)
+
+
+class Kernels():
+    """
+    The kernels of one backend
+    """
+
+    def __init__(self, backend) -> None:
+        """
+        :param backend: "numpy" or "numba"
+        """
+
+        self.backend = backend
+        if(backend == "numba"):
+            import numba
+            jit = numba.njit(cache = True)
+            self.min_surplus = jit(min_surplus_loop)
+            self.update = jit(update_loop)
+            self.contract_surplus = jit(contract_surplus_loop)
+            self.due_contracts = jit(due_contracts_loop)
+
+            # compile for the argument types of the agent now (or load them from the cache) instead of within the first time steps
+            values = np.zeros(2)
+            steps = np.zeros(2, dtype = np.int64)
+            self.min_surplus(values, values, 0, 2, 2)
+            self.update(values, values, 0, 2, 2, 0.0, 0.0)
+            self.contract_surplus(0.0, steps, values, 2, 0)
+            self.due_contracts(steps, 2, 0)
+        else:
+            self.min_surplus = min_surplus_numpy
+            self.update = update_numpy
+            self.contract_surplus = contract_surplus_numpy
+            self.due_contracts = due_contracts_numpy
+
+
+loaded = dict() # Kernels per backend, compiled once per process
+
+def load(name):
+    """
+    :param name: one of BACKENDS or "auto"
+    :return: the Kernels of the backend, None for the list-based reference implementation
+    """
+
+    backend = resolve(name)
+    if(backend == "python"):
+        return None
+    if(backend not in loaded):
+        loaded[backend] = Kernels(backend)
+    return loaded[backend]
+
+
+class ContractBook():
+    """
+    The delivery time steps and quantities of the open contracts of an agent as arrays, in the order of the contracts
+    """
+
+    def __init__(self, capacity = 256) -> None:
+        self.steps = np.zeros(capacity, dtype = np.int64)
+        self.quantities = np.zeros(capacity)
+        self.count = 0
+
+    def append(self, step, quantity) -> None:
+        if(self.count == len(self.steps)):
+            self.steps = np.concatenate((self.steps, np.zeros_like(self.steps)))
+            self.quantities = np.concatenate((self.quantities, np.zeros_like(self.quantities)))
+        self.steps[self.count] = step
+        self.quantities[self.count] = quantity
+        self.count += 1
+
+    def remove(self, positions) -> None:
+        """
+        Removes the contracts at the given positions, keeping the order of the others
+        """
+
+        if(len(positions) == 0):
+            return
+        keep = np.ones(self.count, dtype = bool)
+        keep[positions] = False
+        n = int(keep.sum())
+        self.steps[:n] = self.steps[:self.count][keep]
+        self.quantities[:n] = self.quantities[:self.count][keep]
+        self.count = n
@@ -0,0 +1,76 @@
+import pandas as pd
+
+# This file contains the computation of key performance indicators (KPIs) of a simulation run
+
+MARKETS = ["DA", "IA", "IC"]
+
+def compute_kpis(log_pd, action_log, violations = 0) -> dict:
+    """
+    Computes the KPIs of a simulation run from its logs
+    :param log_pd: the slot log of the run
+    :param action_log: the action log of the run
+    :param violations: the number of constraint violations of the run
+    :return: a dictionary with the KPI names as keys and the values as floats
+    """
+
+    kpis = dict()
+    if(len(log_pd) == 0):
+        last = pd.Series(0.0, index = ["offer_DA", "offer_IA", "offer_IC", "grid_feedin", "costs"])
+    else:
+        last = log_pd.iloc[-1]
+
+    for m in MARKETS:
+        kpis[f"revenue_{m}"] = float(last[f"offer_{m}"])
+        market_actions = action_log[action_log["Market"] == m]
+        kpis[f"offers_{m}"] = float(len(market_actions))
+        kpis[f"quantity_{m}"] = float(market_actions["Quantity"].sum())
+
+    kpis["revenue_grid"] = float(last["grid_feedin"])
+    kpis["costs_grid"] = float(last["costs"])
+    kpis["net_revenue"] = kpis["revenue_DA"] + kpis["revenue_IA"] + kpis["revenue_IC"] + kpis["revenue_grid"] - kpis["costs_grid"]
+
+    kpis["pv"] = float(log_pd["pv"].sum())
+    kpis["load"] = float(log_pd["load"].sum())
+    kpis["steps"] = float(len(log_pd))
+    kpis["violations"] = float(violations)
+    return kpis
+
+
+def turnover(kpis) -> float:
+    """
+    :param kpis: the KPIs of a run, see compute_kpis
+    :return: the sum of the absolute revenues and costs of the run, the scale for differences of net revenue,
+    which is itself often a small difference of large revenues and costs
+    """
+
+    return sum(abs(kpis[name]) for name in ["revenue_DA", "revenue_IA", "revenue_IC", "revenue_grid", "costs_grid"])
+
+
+def daily_kpis(log_pd) -> pd.DataFrame:
+    """
+    Aggregates the slot log of a simulation run per day
+    :param log_pd: the slot log of the run
+    :return: a DataFrame with one row per day, with the column "date" (as "YYYY-MM-DD"), the revenues per market
+    ("revenue_DA", ...), "revenue_grid", "costs_grid" and "net_revenue" of the day, and the energy sums "pv", "load",
+    "grid_demand" and "grid_supply" of the day
+    """
+
+    dates = pd.to_datetime(log_pd["Time"]).dt.strftime("%Y-%m-%d")
+    days = log_pd.groupby(dates.to_numpy(), sort = True)
+
+    # the revenues and costs are cumulated in the log, so the value of a day is the difference of the last values of consecutive days
+    cumulated = days[["offer_DA", "offer_IA", "offer_IC", "grid_feedin", "costs"]].last()
+    daily = cumulated.diff()
+    daily.iloc[:1] = cumulated.iloc[:1]
+
+    result = pd.DataFrame({"date": cumulated.index})
+    for m in MARKETS:
+        result[f"revenue_{m}"] = daily[f"offer_{m}"].to_numpy()
+    result["revenue_grid"] = daily["grid_feedin"].to_numpy()
+    result["costs_grid"] = daily["costs"].to_numpy()
+    result["net_revenue"] = result["revenue_DA"] + result["revenue_IA"] + result["revenue_IC"] + result["revenue_grid"] - result["costs_grid"]
+
+    sums = days[["pv", "load", "grid_demand", "grid_supply"]].sum()
+    for col in sums.columns:
+        result[col] = sums[col].to_numpy()
+    return result
@@ -0,0 +1,92 @@
+import config
+
+import pandas as pd
+import numpy as np
+
+# This file contains a generator for distinct synthetic household load profiles derived from the base load profile.
+# Every household is built from whole days of the base profile, resampled among the days of the same type
+# (month and weekday/weekend), shifted in time and scaled by a household level and a daily factor.
+# The households are generated in batches that are vectorized over the households of the batch,
+# and every batch has its own seed, so the profile of a household only depends on the seed and its number.
+
+def read_base_profile() -> tuple:
+    """
+    :return: the base load profile and its times as a tuple of arrays
+    """
+
+    df = pd.read_csv(config.LOAD_RESIDENTIAL_PATH, sep=";")
+    return (df[config.DATA_COLUMNS["load"]].to_numpy(dtype = float), pd.to_datetime(df["Time"]).to_numpy())
+
+
+def generate_batch(base, times, n, rng) -> np.ndarray:
+    """
+    Generates the load profiles of one batch of households
+    :param base: the base load profile, starting at midnight
+    :param times: the times of the base load profile
+    :param n: the number of households
+    :param rng: the random number generator of the batch
+    :return: an array with one row per household
+    """
+
+    steps_per_day = int(np.timedelta64(1, "D") // (times[1] - times[0]))
+    days = len(base) // steps_per_day
+    length = days * steps_per_day
+    base_days = base[:length].reshape(days, steps_per_day)
+
+    # resample every day among the days of the same type
+    dates = pd.DatetimeIndex(times[:length:steps_per_day])
+    day_type = dates.month.to_numpy() * 2 + (dates.dayofweek.to_numpy() >= 5)
+    source = np.empty((n, days), dtype = np.int64)
+    for t in np.unique(day_type):
+        members = np.flatnonzero(day_type == t)
+        source[:, members] = members[rng.integers(len(members), size = (n, len(members)))]
+    profiles = base_days[source].reshape(n, length)
+
+    # shift every day of every household in time
+    shifts = np.rint(rng.normal(0, config.PROFILE_SHIFT_STD, size = (n, days))).astype(np.int64)
+    index = np.clip(np.arange(length)[np.newaxis, :] - np.repeat(shifts, steps_per_day, axis = 1), 0, length - 1)
+    profiles = np.take_along_axis(profiles, index, axis = 1)
+
+    # scale with a household level and a daily factor, both log-normal with mean 1
+    level = rng.lognormal(- config.PROFILE_LEVEL_SIGMA**2 / 2, config.PROFILE_LEVEL_SIGMA, size = (n, 1))
+    daily = rng.lognormal(- config.PROFILE_DAY_SIGMA**2 / 2, config.PROFILE_DAY_SIGMA, size = (n, days))
+    profiles *= level * np.repeat(daily, steps_per_day, axis = 1)
+
+    # time steps after the last whole day keep the base profile
+    rest = np.broadcast_to(base[length:] * level, (n, len(base) - length))
+    return np.concatenate([profiles, rest], axis = 1)
+
+
+def batches(n, seed):
+    """
+    Yields the sizes and random number generators of the batches of n households
+    """
+
+    for b, first in enumerate(range(0, n, config.PROFILE_BATCH)):
+        yield (min(config.PROFILE_BATCH, n - first), np.random.default_rng((seed, b)))
+
+
+def generate_profiles(base, times, n, seed = 0) -> np.ndarray:
+    """
+    Generates n distinct household load profiles
+    :param base: the base load profile, starting at midnight
+    :param times: the times of the base load profile
+    :param n: the number of households
+    :param seed: the seed of the generator
+    :return: an array with one row per household
+    """
+
+    return np.concatenate([generate_batch(base, times, size, rng) for (size, rng) in batches(n, seed)])
+
+
+def aggregate_load(base, times, n, seed = 0) -> np.ndarray:
+    """
+    Generates the total load of n distinct households without keeping all profiles in memory
+    :return: the aggregated load profile, identical to the sum of the rows of generate_profiles
+    """
+
+    total = np.zeros(len(base))
+    for (size, rng) in batches(n, seed):
+        total += generate_batch(base, times, size, rng).sum(axis = 0)
+    return total
+
@@ -0,0 +1,244 @@
+import config
+
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+import numpy as np
+
+try: # parquet output is used if pyarrow is available, compressed NPZ chunks otherwise
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# The simulation logs are stored as a directory per log, containing compressed column chunks and a manifest.
+# Every chunk is written completely before it is registered in the manifest, so a log is readable at any time.
+# Timestamps are replaced by the integer slot index relative to the simulation start.
+
+# column types of the different logs, "category" columns are stored as integer codes
+SCHEMAS = {
+    "log": {
+        "slot": "int32",
+        "offer_DA": "float64", # cumulated values are kept in double precision
+        "offer_IA": "float64",
+        "offer_IC": "float64",
+        "grid_feedin": "float64",
+        "costs": "float64",
+        "battery_charge": "float32",
+        "pv": "float32",
+        "load": "float32",
+        "balance": "float32",
+        "grid_demand": "float32",
+        "grid_supply": "float32", # including the energy of market offers that were not executed
+    },
+    "actions": {
+        "slot": "int32",
+        "Market": "category",
+        "Price": "float32",
+        "Quantity": "float32",
+    },
+    "violations": {
+        "slot": "int32",
+        "Text": "str",
+    },
+}
+
+CATEGORIES = {
+    "Market": ["DA", "IA", "IC"],
+}
+
+MANIFEST = "manifest.json"
+
+def default_format() -> str:
+    """
+    :return: the preferred storage format that is available in the current environment
+    """
+
+    return "npz" if pa is None else "parquet"
+
+
+class LogWriter():
+    """
+    Appends chunks of one simulation log to a columnar log directory
+    """
+
+    def __init__(self, path, kind, t_start, t_delta = config.T_DELTA, fmt = None) -> None:
+        """
+        :param path: the directory the log is written to, existing chunks in it are discarded
+        :param kind: the kind of log, one of the keys of SCHEMAS
+        :param t_start: the simulation start time corresponding to slot 0
+        :param t_delta: the simulation time step
+        :param fmt: the storage format ("parquet" or "npz"), defaults to the best available one
+        """
+
+        self.path = Path(path)
+        self.kind = kind
+        self.schema = SCHEMAS[kind]
+        self.t_start = t_start
+        self.t_delta = t_delta
+        self.fmt = default_format() if fmt is None else fmt
+
+        if(self.fmt == "parquet" and pa is None):
+            raise ImportError("writing parquet logs requires pyarrow")
+        if(self.fmt not in ("parquet", "npz")):
+            raise ValueError(f"unknown log format: {self.fmt}")
+
+        self.path.mkdir(parents = True, exist_ok = True)
+        for f in self.path.glob("chunk-*"):
+            f.unlink()
+
+        self.chunks = list()
+        self.rows = 0
+        self.writeManifest()
+
+    def append(self, df) -> None:
+        """
+        Converts a chunk of log rows to the typed columns of the schema and writes it to disk
+        :param df: a DataFrame with the columns of the in-memory log, including the "Time" column
+        """
+
+        if(len(df) == 0):
+            return
+
+        columns = self.encode(df)
+        name = f"chunk-{len(self.chunks):05d}.{self.fmt}"
+        tmp = self.path / (name + ".tmp")
+
+        if(self.fmt == "parquet"):
+            arrays = list()
+            for col, dtype in self.schema.items():
+                if(dtype == "category"):
+                    arrays.append(pa.DictionaryArray.from_arrays(columns[col], CATEGORIES[col]))
+                else:
+                    arrays.append(pa.array(columns[col]))
+            pq.write_table(pa.Table.from_arrays(arrays, names = list(self.schema)), tmp, compression = "zstd")
+        else:
+            with open(tmp, "wb") as f:
+                np.savez_compressed(f, **columns)
+
+        os.replace(tmp, self.path / name)
+        self.chunks.append(name)
+        self.rows += len(df)
+        self.writeManifest()
+
+    def encode(self, df) -> dict:
+        """
+        :param df: a DataFrame with the columns of the in-memory log
+        :return: a dictionary mapping the schema columns to typed NumPy arrays
+        """
+
+        times = pd.to_datetime(df["Time"]).to_numpy(dtype = "datetime64[us]")
+        offset = times - np.datetime64(self.t_start, "us")
+
+        columns = dict()
+        for col, dtype in self.schema.items():
+            if(col == "slot"):
+                columns[col] = (offset // np.timedelta64(self.t_delta)).astype(np.int32)
+            elif(dtype == "category"):
+                columns[col] = pd.Categorical(df[col], categories = CATEGORIES[col]).codes.astype(np.int8)
+            elif(dtype == "str"):
+                columns[col] = np.array(df[col], dtype = str)
+            else:
+                columns[col] = df[col].to_numpy(dtype = dtype)
+        return columns
+
+    def writeManifest(self) -> None:
+        """
+        Atomically replaces the manifest of the log directory
+        """
+
+        manifest = {
+            "kind": self.kind,
+            "format": self.fmt,
+            "t_start": self.t_start.strftime("%Y-%m-%d %H:%M"),
+            "t_delta": self.t_delta.total_seconds(),
+            "rows": self.rows,
+            "chunks": self.chunks,
+        }
+
+        tmp = self.path / (MANIFEST + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent = 4)
+        os.replace(tmp, self.path / MANIFEST)
+
+
+class LogStore():
+    """
+    Bundles the writers for the slot log, the action log and the violation log of one simulation run
+    """
+
+    def __init__(self, path, sc, fmt = None) -> None:
+        """
+        :param path: the output directory of the run
+        :param sc: the simulated scenario
+        :param fmt: the storage format, see LogWriter
+        """
+
+        self.path = Path(path)
+        self.writers = dict()
+        for kind in SCHEMAS:
+            self.writers[kind] = LogWriter(self.path / kind, kind, sc.t_start, sc.t_delta, fmt)
+
+    def append(self, kind, df) -> None:
+        """
+        Appends a chunk of rows to the log of the given kind
+        """
+
+        self.writers[kind].append(df)
+
+
+def load_log(path, columns = None, with_time = True) -> pd.DataFrame:
+    """
+    Loads a log written by LogWriter, reading only the requested columns
+    :param path: the log directory
+    :param columns: the columns to read, all columns if None
+    :param with_time: if True, a "Time" column is reconstructed from the slot index
+    :return: a DataFrame with the requested columns
+    """
+
+    path = Path(path)
+    with open(path / MANIFEST) as f:
+        manifest = json.load(f)
+
+    schema = SCHEMAS[manifest["kind"]]
+    if(columns is None):
+        columns = list(schema)
+    read_columns = list(columns)
+    if(with_time and "slot" not in read_columns):
+        read_columns.append("slot")
+
+    parts = {col: list() for col in read_columns}
+    for name in manifest["chunks"]:
+        if(manifest["format"] == "parquet"):
+            if(pa is None):
+                raise ImportError("reading parquet logs requires pyarrow")
+            table = pq.ParquetFile(path / name).read(columns = read_columns) # less overhead per chunk than pq.read_table
+            for col in read_columns:
+                chunk = table.column(col)
+                if(schema[col] == "category"):
+                    chunk = chunk.combine_chunks().indices
+                parts[col].append(chunk.to_numpy(zero_copy_only = False))
+        else:
+            with np.load(path / name) as npz: # members of an NPZ file are decompressed individually
+                for col in read_columns:
+                    parts[col].append(npz[col])
+
+    data = dict()
+    for col in read_columns:
+        if(len(parts[col]) > 0):
+            values = np.concatenate(parts[col])
+        else:
+            values = np.array([], dtype = {"category": np.int8, "str": str}.get(schema[col], schema[col]))
+        if(schema[col] == "category"):
+            values = pd.Categorical.from_codes(values.astype(np.int8), categories = CATEGORIES[col])
+        data[col] = values
+
+    df = pd.DataFrame(data)
+    if(with_time):
+        t_start = pd.Timestamp(manifest["t_start"])
+        df["Time"] = t_start + pd.to_timedelta(df["slot"].astype(np.int64) * manifest["t_delta"], unit = "s")
+        if("slot" not in columns):
+            df.drop(columns = ["slot"], inplace = True)
+    return df
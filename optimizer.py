@@ -0,0 +1,245 @@
+import agent
+from scenario import Scenario
+import config
+
+import datetime as dt
+import numpy as np
+
+MARKETS = ["DA", "IA", "IC"]
+
+def closure_steps(sc : Scenario, n, closure) -> np.ndarray:
+    """
+    :param sc: the scenario
+    :param n: the number of time steps
+    :param closure: a gate closure time of day
+    :return: the indices of the time steps at which the given gate closure time is reached
+    """
+
+    start = dt.timedelta(hours = sc.t_start.hour, minutes = sc.t_start.minute) // sc.t_delta
+    step_of_day = (start + np.arange(n)) % sc.steps_per_day
+    return np.flatnonzero(step_of_day == dt.timedelta(hours = closure.hour, minutes = closure.minute) / sc.t_delta)
+
+
+def market_availability(sc : Scenario, n) -> dict:
+    """
+    Determines for every time step whether an offer for it can be placed on the different markets,
+    given the gate closure times at which the agent plans the next day
+    :param sc: the scenario
+    :param n: the number of time steps
+    :return: a dictionary with the markets as keys and boolean arrays as values
+    """
+
+    dates = np.array([(sc.t_start + sc.t_delta * k).date() for k in range(n)], dtype = "datetime64[D]")
+    steps_per_day = sc.steps_per_day
+
+    available = dict()
+    available["IC"] = np.ones(n, dtype = bool)
+    available["IC"][0] = False # no offer is possible for the first time step
+
+    # the IA and DA offers for a time step are placed at the gate closure of the previous day, see Agent.greedy
+    for market, closure, first in (("IA", sc.intraday_auction_closure, sc.intraday_auction_offset), ("DA", sc.day_ahead_closure, sc.day_ahead_offset)):
+        available[market] = np.zeros(n, dtype = bool)
+        for c in closure_steps(sc, n, closure):
+            k = np.arange(c + first, min(c + first + steps_per_day, n))
+            available[market][k[dates[k] > dates[c]]] = True
+    return available
+
+
+def optimize_schedule(pv, load, prices, available, min_offer_quantity, battery_min, battery_max, battery_start,
+                      grid_price_residential, grid_price_feedin, levels = config.OPTIMIZER_LEVELS, segments = None) -> dict:
+    """
+    Computes a revenue-maximizing schedule for the battery and the market offers through dynamic programming
+    over a discretized battery state. The schedule starts after time step 0, whose battery state is battery_start.
+    In every time step, the energy surplus after charging/discharging is either sold completely on the best available market
+    (if it satisfies the minimum offer quantity), fed into the grid, or, if negative, bought from the grid.
+    :param pv: the pv generation per time step
+    :param load: the load per time step
+    :param prices: a dictionary with the realized price arrays per market
+    :param available: a dictionary with boolean arrays per market stating whether an offer can be placed for a time step
+    :param min_offer_quantity: the minimum market offer quantity
+    :param battery_min: the minimum battery charge
+    :param battery_max: the maximum battery charge
+    :param battery_start: the battery charge after time step 0
+    :param grid_price_residential: the grid price for buying energy
+    :param grid_price_feedin: the grid price for feeding in energy
+    :param levels: the number of discrete battery states
+    :param segments: optional array of time step indices at which the horizon is cut, i.e. the optimization
+    for the time steps before such an index does not take the time steps from it on into account
+    :return: a dictionary with the arrays "battery" (battery state after the time step), "surplus" (energy sold or fed in,
+    negative if bought), "market" (index into MARKETS, -1 for the grid) and "price" (price of the sold energy)
+    and the expected total revenue "revenue"
+    """
+
+    n = len(pv)
+    state = np.linspace(battery_min, battery_max, levels)
+    delta = state[np.newaxis, :] - state[:, np.newaxis] # battery change from state b (rows) to state b' (columns)
+
+    # best market price available per time step
+    market_prices = np.stack([np.where(available[m], prices[m], -np.inf) for m in MARKETS])
+    best_market = np.argmax(market_prices, axis = 0)
+    best_price = market_prices[best_market, np.arange(n)]
+    net = np.asarray(pv, dtype = float) - np.asarray(load, dtype = float)
+
+    cut = np.zeros(n + 1, dtype = bool)
+    if(segments is not None):
+        segments = np.asarray(segments)
+        cut[segments[segments <= n]] = True
+
+    def reward(k, surplus):
+        """
+        :return: the revenue of time step k for the given energy surplus (array) and whether the market is used
+        """
+
+        sell = (surplus >= min_offer_quantity) & (best_price[k] > grid_price_feedin)
+        value = np.where(surplus < 0, surplus * grid_price_residential,
+                         np.where(sell, surplus * best_price[k], surplus * grid_price_feedin))
+        return value, sell
+
+    # backward pass: value[b] is the optimal revenue from time step k on, given the battery state b before k
+    value = np.zeros(levels)
+    policy = np.zeros((n, levels), dtype = np.int32)
+    for k in range(n - 1, 1, -1):
+        if(cut[k + 1]):
+            value = np.zeros(levels)
+        q = reward(k, net[k] - delta)[0] + value[np.newaxis, :]
+        policy[k] = np.argmax(q, axis = 1)
+        value = q[np.arange(levels), policy[k]]
+
+    # forward pass, starting from the exact battery state after time step 0
+    schedule = {
+        "battery": np.full(n, battery_start, dtype = float),
+        "surplus": np.zeros(n),
+        "market": np.full(n, -1, dtype = np.int8),
+        "price": np.zeros(n),
+    }
+    if(n < 2):
+        schedule["revenue"] = 0.0
+        return schedule
+
+    if(cut[2]):
+        value = np.zeros(levels)
+    first, sell = reward(1, net[1] - (state - battery_start))
+    b = int(np.argmax(first + value))
+
+    revenue = 0.0
+    for k in range(1, n):
+        if(k > 1):
+            b = policy[k][b]
+        surplus = net[k] - (state[b] - schedule["battery"][k - 1])
+        r, sell = reward(k, np.array(surplus))
+        revenue += float(r)
+
+        schedule["battery"][k] = state[b]
+        schedule["surplus"][k] = surplus
+        if(sell):
+            schedule["market"][k] = best_market[k]
+            schedule["price"][k] = best_price[k]
+
+    schedule["revenue"] = revenue
+    return schedule
+
+
+class OptimizerAgent(agent.Agent):
+    """
+    Agent that follows a schedule computed by optimize_schedule with perfect foresight of pv, load and prices
+    instead of the greedy heuristic, as a reference for how far the greedy agent is from the optimum.
+    Offers, battery actions and the logging go through the same validation as for the greedy agent.
+    """
+
+    def __init__(self, sc : Scenario, levels = None, rolling = None, data = None) -> None:
+        """
+        :param sc: the scenario
+        :param levels: the number of discrete battery states, defaults to the scenario setting
+        :param rolling: if True, the horizon is rolled at each day-ahead gate closure, defaults to the scenario setting
+        :param data: an optional environment.DataSet shared between runs
+        """
+
+        super().__init__(sc, data)
+        self.levels = sc.optimizer_levels if levels is None else levels
+        self.rolling = sc.optimizer_rolling if rolling is None else rolling
+        self.schedule = None
+
+    def optimize(self) -> dict:
+        """
+        Computes the schedule from the current battery state, which must be the state after the first time step
+        """
+
+        sc = self.scenario
+        n = sc.number_of_intervals
+        pv = self.household.pv["Amount"].to_numpy(dtype = float)[:n]
+        load = self.household.load["Load"].to_numpy(dtype = float)[:n]
+
+        index = np.arange(n)
+        prices = dict()
+        prices["DA"] = self.market.prices_DA["Price"].to_numpy(dtype = float)[index]
+        prices["IA"] = self.market.prices_IA["Price"].to_numpy(dtype = float)[index]
+        prices["IC"] = self.market.prices_IC["Price"].to_numpy(dtype = float)[index]
+
+        self.available = market_availability(sc, n)
+
+        segments = None
+        if(self.rolling):
+            # each day planned at a day-ahead gate closure is optimized without looking beyond it
+            segments = closure_steps(sc, n, sc.day_ahead_closure) + sc.day_ahead_offset
+
+        (_, _, battery, _, _, _, _) = self.getForecasts(0)
+        return optimize_schedule(pv, load, prices, self.available, sc.min_offer_quantity,
+                                 sc.battery_charge_min, sc.battery_charge_max, battery,
+                                 sc.grid_price_residential, sc.grid_price_feedin, self.levels, segments)
+
+    def greedy(self) -> None:
+        """
+        Places the scheduled offers at the gate closure times and executes the scheduled battery action for the next time step
+        """
+
+        if(self.schedule is None):
+            self.schedule = self.optimize()
+
+        sc = self.scenario
+        index = (self.time - sc.t_start) // sc.t_delta
+
+        # offers for the next day
+        if(self.time.time() == sc.intraday_auction_closure):
+            self.placeScheduledOffers(index, range(sc.intraday_auction_offset, sc.intraday_auction_offset + sc.steps_per_day), "IA")
+        if(self.time.time() == sc.day_ahead_closure):
+            self.placeScheduledOffers(index, range(sc.day_ahead_offset, sc.day_ahead_offset + sc.steps_per_day), "DA")
+
+        # offer on the intraday continuous market and battery action for the next time step
+        self.placeScheduledOffers(index, [1], "IC")
+        if(index + 1 < self.scenario.number_of_intervals):
+            self.executeScheduledAction(index + 1)
+
+    def placeScheduledOffers(self, index, ahead_times, market) -> None:
+        """
+        Places the scheduled offers of the given market for the given time steps ahead
+        """
+
+        code = MARKETS.index(market)
+        for t in ahead_times:
+            k = index + t
+            if(k >= self.scenario.number_of_intervals or self.schedule["market"][k] != code):
+                continue
+            self.placeOffer(market, self.time + self.scenario.t_delta * t, self.schedule["surplus"][k], self.schedule["price"][k])
+
+    def executeScheduledAction(self, k) -> None:
+        """
+        Charges or discharges the battery for the next time step k as scheduled, the remaining energy is exchanged with the grid
+        """
+
+        (load, pv, battery, _, _, _, _) = self.getForecasts(1)
+        delivered = self.schedule["surplus"][k] if self.schedule["market"][k] >= 0 else 0
+
+        # keep the battery within its limits despite rounding
+        delta = self.schedule["battery"][k] - battery
+        while(battery + delta > self.scenario.battery_charge_max):
+            delta = np.nextafter(delta, -np.inf)
+        while(battery + delta < self.scenario.battery_charge_min):
+            delta = np.nextafter(delta, np.inf)
+
+        charge = max(delta, 0)
+        discharge = max(-delta, 0)
+        residual = pv - load - charge + discharge - delivered
+        grid_demand = max(-residual, 0)
+        grid_supply = max(residual, 0)
+
+        self.updateForecasts(1, charge, discharge, grid_demand, grid_supply, delivered)
@@ -0,0 +1,152 @@
+import config
+
+import heapq
+from collections import namedtuple
+import numpy as np
+
+# This file contains a limit order book for the intraday continuous market with price-time priority.
+# Resting orders are kept in one heap per side, ordered by price and then by arrival,
+# so inserting an order and matching against the best order take O(log n) for n resting orders.
+
+Fill = namedtuple("Fill", ["buyer", "seller", "price", "quantity"]) # one (partial) execution of an order
+
+class OrderBook():
+    """
+    Limit order book of one delivery time step
+    """
+
+    def __init__(self) -> None:
+        # heap entries are lists [sort key, arrival number, remaining quantity, price, owner],
+        # the sort key is the negative price for bids so that the highest bid is on top
+        self.bids = list()
+        self.asks = list()
+        self.next_arrival = 0 # arrival number of the next order
+
+    def add(self, side, price, quantity, owner) -> None:
+        """
+        Adds a resting order to the book without matching it
+        :param side: "buy" or "sell"
+        :param price: the limit price
+        :param quantity: the order quantity
+        :param owner: the owner of the order
+        """
+
+        if(side == "buy"):
+            heapq.heappush(self.bids, [-price, self.next_arrival, quantity, price, owner])
+        else:
+            heapq.heappush(self.asks, [price, self.next_arrival, quantity, price, owner])
+        self.next_arrival += 1
+
+    def addMany(self, side, prices, quantities, owner) -> None:
+        """
+        Adds many resting orders of one owner at once, e.g. to provide liquidity
+        """
+
+        book = self.bids if side == "buy" else self.asks
+        sign = -1 if side == "buy" else 1
+        for arrival, (price, quantity) in enumerate(zip(prices, quantities), self.next_arrival):
+            book.append([sign * price, arrival, quantity, price, owner])
+        self.next_arrival += len(prices)
+        heapq.heapify(book)
+
+    def submit(self, side, price, quantity, owner, rest = False) -> list:
+        """
+        Matches a limit order against the resting orders of the other side, best price first and earliest arrival first at equal prices.
+        The trades are executed at the prices of the resting orders.
+        :param side: "buy" or "sell"
+        :param price: the limit price
+        :param quantity: the order quantity
+        :param owner: the owner of the order
+        :param rest: if True, the unfilled quantity is added to the book, otherwise it is cancelled
+        :return: a list of the fills of the order
+        """
+
+        fills = list()
+        book = self.asks if side == "buy" else self.bids
+
+        while(quantity > 0 and len(book) > 0):
+            best = book[0]
+            if((side == "buy" and best[3] > price) or (side == "sell" and best[3] < price)):
+                break # no more matching orders
+
+            traded = min(quantity, best[2])
+            if(side == "buy"): fills.append(Fill(owner, best[4], best[3], traded))
+            else: fills.append(Fill(best[4], owner, best[3], traded))
+
+            quantity -= traded
+            best[2] -= traded
+            if(best[2] <= 0):
+                heapq.heappop(book)
+
+        if(rest and quantity > 0):
+            self.add(side, price, quantity, owner)
+        return fills
+
+    def depth(self, side) -> float:
+        """
+        :return: the total resting quantity of the given side
+        """
+
+        return sum(order[2] for order in (self.bids if side == "buy" else self.asks))
+
+
+class IntradayOrderBooks():
+    """
+    Order books of all delivery time steps of the intraday continuous market.
+    The books are filled lazily with synthetic liquidity derived from the historical price series:
+    the orders are scattered around the realized price of the time step, with a spread proportional to the price volatility of the surrounding day.
+    """
+
+    def __init__(self, prices, seed = 0, orders = config.ORDER_BOOK_ORDERS, depth = config.ORDER_BOOK_DEPTH, window = 96) -> None:
+        """
+        :param prices: the realized intraday continuous prices per time step [€/kWh]
+        :param seed: the seed of the synthetic liquidity
+        :param orders: the number of synthetic orders per side and time step
+        :param depth: the total synthetic quantity per side and time step [kWh]
+        :param window: the number of time steps of a day
+        """
+
+        self.prices = np.asarray(prices, dtype = float)
+        self.seed = seed
+        self.orders = orders
+        self.depth = depth
+        self.books = dict()
+
+        # price volatility per time step as the standard deviation over a centered window of one day
+        padded = np.pad(self.prices, window // 2, mode = "edge")
+        windows = np.lib.stride_tricks.sliding_window_view(padded, window)[:len(self.prices)]
+        self.volatility = np.maximum(windows.std(axis = 1), config.ORDER_BOOK_MIN_SPREAD)
+
+    def get(self, k) -> OrderBook:
+        """
+        :param k: the index of the delivery time step
+        :return: the order book of the delivery time step, created with synthetic liquidity on first access
+        """
+
+        if(k not in self.books):
+            book = OrderBook()
+            rng = np.random.default_rng((self.seed, k))
+            price = self.prices[k]
+            sigma = self.volatility[k]
+
+            # the best orders are close to the realized price, the depth thins out further away
+            offsets = rng.exponential(sigma, size = (2, self.orders)) + 0.05 * sigma
+            quantities = rng.dirichlet(np.ones(self.orders), size = 2) * self.depth
+            book.addMany("buy", price - offsets[0], quantities[0], "market")
+            book.addMany("sell", price + offsets[1], quantities[1], "market")
+            self.books[k] = book
+        return self.books[k]
+
+    def submit(self, k, side, price, quantity, owner, rest = False) -> list:
+        """
+        Submits a limit order for delivery time step k, see OrderBook.submit
+        """
+
+        return self.get(k).submit(side, price, quantity, owner, rest)
+
+    def release(self, k) -> None:
+        """
+        Frees the order book of a delivery time step that is no longer tradable
+        """
+
+        self.books.pop(k, None)
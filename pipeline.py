@@ -0,0 +1,170 @@
+import agent
+import config
+from scenario import Scenario
+
+import queue
+import threading
+import pandas as pd
+import numpy as np
+
+# This file contains a background pipeline for the validation and logging of a simulation run.
+# The simulation loop only pushes a compact record per time step, which is collected into blocks
+# that are handed over to a worker thread through a bounded queue. The worker validates the time steps,
+# formats the violations, builds the log rows and writes them to the log store in chunks while the run progresses,
+# so that the log on disk is usable up to the last written chunk even if the run is interrupted.
+# If the queue is full, the simulation waits for the worker, which bounds the memory of the pending records.
+
+# fields of a time step record
+RECORD_FIELDS = ["index", "time", "charge", "discharge", "grid_demand", "grid_supply", "battery", "pv", "load", "delivered", "unexecuted",
+                 "gains_DA", "gains_IA", "gains_IC", "gains_grid", "costs", "actions", "violations"]
+
+class LogPipeline():
+    """
+    Validates and logs the time steps of a simulation run in a background thread
+    """
+
+    def __init__(self, sc : Scenario, log_store = None, block_size = config.PIPELINE_BLOCK_SIZE, blocks = config.PIPELINE_BLOCKS,
+                 chunk_size = config.LOG_CHUNK_SIZE) -> None:
+        """
+        :param sc: the scenario of the run
+        :param log_store: an optional logstore.LogStore to which the logs are written while the run progresses
+        :param block_size: the number of time step records handed over to the worker at once
+        :param blocks: the maximum number of blocks waiting for the worker
+        :param chunk_size: the number of time steps per chunk written to the log store
+        """
+
+        self.scenario = sc
+        self.log_store = log_store
+        self.block_size = block_size
+        self.chunk_size = chunk_size
+
+        self.block = list()
+        self.queue = queue.Queue(maxsize = blocks)
+        self.error = None
+
+        # logs built by the worker, the slot log as one DataFrame per block
+        self.log_chunks = list()
+        self.pending = 0 # number of time steps not yet written to the log store
+        self.action_rows = list()
+        self.violation_rows = list()
+        self.violations = 0
+        self.flushed = {"log": 0, "actions": 0, "violations": 0}
+
+        self.thread = threading.Thread(target = self.work, name = f"log pipeline {sc.name}", daemon = True)
+        self.thread.start()
+
+    def push(self, record) -> None:
+        """
+        Adds the record of a time step, see RECORD_FIELDS, with the action and violation log rows created by the agent in it
+        """
+
+        self.block.append(record)
+        if(len(self.block) >= self.block_size):
+            self.handOver()
+
+    def handOver(self) -> None:
+        """
+        Hands the current block over to the worker, waiting if the queue is full
+        """
+
+        if(self.error is not None):
+            raise self.error
+        if(len(self.block) > 0):
+            self.queue.put(self.block)
+            self.block = list()
+
+    def work(self) -> None:
+        """
+        Processes the blocks of records until the pipeline is closed
+        """
+
+        try:
+            while(True):
+                block = self.queue.get()
+                if(block is None):
+                    break
+                self.process(block)
+                if(self.log_store is not None and self.pending >= self.chunk_size):
+                    self.flush()
+        except Exception as e:
+            self.error = e
+            while(self.queue.get() is not None): # keep the simulation from blocking on a full queue
+                pass
+
+    def process(self, block) -> None:
+        """
+        Validates a block of time step records and builds the chunk of the slot log for them.
+        The constraints are checked for the whole block at once, the violations are only formatted for the invalid time steps.
+        """
+
+        sc = self.scenario
+        values = np.array([record[2:16] for record in block], dtype = float)
+        (charge, discharge, grid_demand, grid_supply, battery, pv, load, delivered) = values[:, :8].T
+
+        balance = pv + discharge - charge + grid_demand - grid_supply - delivered - load
+        invalid = (charge < 0) | (discharge < 0) | (grid_demand < 0) | (grid_supply < 0) | \
+            (battery < sc.battery_charge_min) | (battery > sc.battery_charge_max) | \
+            ((grid_demand > 0.000001) & (grid_supply > 0.000001)) | \
+            ((charge > 0.000001) & (discharge > 0.000001)) | \
+            ~np.isclose(balance, 0, atol = 0.000001)
+
+        rows = list()
+        for j, record in enumerate(block):
+            (index, time, charge_j, discharge_j, grid_demand_j, grid_supply_j, battery_j, pv_j, load_j, delivered_j, unexecuted,
+             gains_DA, gains_IA, gains_IC, gains_grid, costs, actions, violations) = record
+            self.action_rows.extend(actions)
+            self.violation_rows.extend(violations)
+            if(invalid[j]):
+                (_, found) = agent.check_step(sc, index, time, charge_j, discharge_j, grid_demand_j, grid_supply_j, load_j, pv_j, battery_j, delivered_j)
+                self.violation_rows.extend(found)
+                self.violations += len(found)
+            rows.append([gains_DA, gains_IA, gains_IC, gains_grid, costs, battery_j, pv_j, load_j, balance[j],
+                         grid_demand_j, grid_supply_j + unexecuted, time])
+
+        self.log_chunks.append(pd.DataFrame(rows, columns=agent.LOG_COLUMNS))
+        self.pending += len(rows)
+
+    def flush(self) -> None:
+        """
+        Writes the logs created since the last flush to the log store
+        """
+
+        chunks = self.log_chunks[self.flushed["log"]:]
+        if(len(chunks) > 0):
+            self.log_store.append("log", pd.concat(chunks, ignore_index = True))
+        self.flushed["log"] = len(self.log_chunks)
+        self.pending = 0
+
+        rows = {"actions": (self.action_rows, agent.ACTION_COLUMNS),
+                "violations": (self.violation_rows, agent.VIOLATION_COLUMNS)}
+
+        for kind, (buffer, columns) in rows.items():
+            chunk = pd.DataFrame(buffer[self.flushed[kind]:], columns=columns)
+            self.log_store.append(kind, chunk)
+            self.flushed[kind] = len(buffer)
+
+    def close(self) -> None:
+        """
+        Processes the remaining records, writes the rest of the logs and stops the worker.
+        Also called if the run is interrupted, so that the records pushed so far are written.
+        """
+
+        if(self.error is None and len(self.block) > 0):
+            self.queue.put(self.block)
+            self.block = list()
+        self.queue.put(None)
+        self.thread.join()
+
+        if(self.error is not None):
+            raise self.error
+        if(self.log_store is not None):
+            self.flush()
+
+    def getLog(self) -> pd.DataFrame:
+        """
+        :return: the slot log of all processed time steps
+        """
+
+        if(len(self.log_chunks) == 0):
+            return pd.DataFrame(columns=agent.LOG_COLUMNS)
+        return pd.concat(self.log_chunks, ignore_index = True)
@@ -3,11 +3,11 @@ import config
 import pandas as pd
 import datetime as dt
 import numpy as np
-import matplotlib.pyplot as plt
 
-def computePVData():
+def computePVData(plot = True):
     """
     Computes quarter-hourly pv data based on hourly wheather data
+    :param plot: whether to save a plot of the hourly and interpolated pv data to the output folder
     """
 
     # read and preprocess radiation data
@@ -38,10 +38,10 @@ def computePVData():
     hours = len(df_t)
     
     # constants for pv computation
-    NOCT = 47       # C     NOCT (nominal operating cell temperature)
-    LAMB  = 0.00048 # C^-1  Temperature coefficient (war 0.004 in BA)
-    T2    = 25      # C     Temperature at STC
-    G     = 1000    # W/m^2 Radiation at STC
+    NOCT = config.PV_NOCT       # C     NOCT (nominal operating cell temperature)
+    LAMB = config.PV_LAMBDA     # C^-1  Temperature coefficient (war 0.004 in BA)
+    T2 = config.PV_T_STC        # C     Temperature at STC
+    G = config.PV_G_STC         # W/m^2 Radiation at STC
 
     # compute hourly pv data
     nodes = np.zeros(shape = hours+1, dtype = float) # interpolation nodes, boundary condition is implicit here
@@ -86,6 +86,10 @@ def computePVData():
     print(f"absolute error: {np.abs(pv_after - pv_before)}")
     print(f"relative error: {100 * np.abs(1 - pv_after / pv_before)} %")
 
+    if(not plot):
+        return
+
+    import matplotlib.pyplot as plt # only loaded if a plot is wanted
     plt.figure(figsize = (20, 10))
     plt.plot(df_pv["pv"], marker = "o", markersize = 4)
     x_values = [4*i for i in range(len(nodes))]
@@ -0,0 +1,230 @@
+import scenario
+import logstore
+import resultstore
+import kpi
+import config
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from matplotlib.figure import Figure
+
+# This file contains a comparative report over many simulation runs, e.g. the min-offer-quantity × asset level grid of the scenarios folder.
+# The runs are loaded either from their stored logs (only the needed columns are read) or from a results store (only the needed KPIs),
+# summarized with one row per run and aggregated with grouped pivot tables.
+# The figures are drawn on matplotlib Figure objects without pyplot, so that no window is opened and no display is needed.
+#
+#   python report.py scenario_0_low scenario_0_middle ... --output output/report
+#   python report.py --store output/results.db
+
+# columns of the slot log needed for the summary, the revenues and costs are cumulated in the log
+LOG_COLUMNS = ["offer_DA", "offer_IA", "offer_IC", "grid_feedin", "costs", "pv", "load", "grid_demand", "grid_supply"]
+CUMULATED = {"offer_DA": "revenue_DA", "offer_IA": "revenue_IA", "offer_IC": "revenue_IC", "grid_feedin": "revenue_grid", "costs": "costs_grid"}
+ENERGY = ["pv", "load", "grid_demand", "grid_supply"]
+
+# scenario settings of the summary, with the keys of the scenario files
+SETTINGS = {"min_offer_quantity": "min-offer-quantity", "battery_charge_max": "battery-charge-max",
+            "pv_power_stc": "pv-power-stc", "load_multiplier": "load-multiplier"}
+
+REVENUES = ["revenue_DA", "revenue_IA", "revenue_IC", "revenue_grid"]
+MARKET_NAMES = {"revenue_DA": "Day Ahead", "revenue_IA": "Intraday Auction", "revenue_IC": "Intraday Continuous", "revenue_grid": "Grid"}
+COLORS = {"revenue_DA": "steelblue", "revenue_IA": "teal", "revenue_IC": "purple", "revenue_grid": "slategray"}
+
+def asset_level(battery, pv, load) -> str:
+    """
+    :return: the label of the asset level given by the battery size, the pv size and the load multiplier
+    """
+
+    return f"{battery:g} kWh, {pv:g} kWp, load x{load:g}"
+
+
+def add_ratios(summary) -> pd.DataFrame:
+    """
+    Adds the asset level, the net revenue, the self-consumption (share of the pv generation that is neither fed into the grid
+    nor sold on a market) and the self-sufficiency (share of the load that is not bought from the grid) to a run summary
+    """
+
+    summary["asset_level"] = [asset_level(b, pv, load) for b, pv, load in
+                              zip(summary["battery_charge_max"], summary["pv_power_stc"], summary["load_multiplier"])]
+    summary["net_revenue"] = summary[REVENUES].sum(axis = 1) - summary["costs_grid"]
+
+    exported = summary["grid_supply"] + summary[[f"quantity_{m}" for m in kpi.MARKETS]].sum(axis = 1)
+    summary["self_consumption"] = (1 - exported / summary["pv"].where(summary["pv"] > 0)).clip(lower = 0)
+    summary["self_sufficiency"] = 1 - summary["grid_demand"] / summary["load"].where(summary["load"] > 0)
+    return summary
+
+
+def load_logs(names, path = config.OUTPUT_PATH) -> pd.DataFrame:
+    """
+    Summarizes runs from their logs written by a logstore.LogStore, reading only the needed columns
+    :param names: the scenario names, the logs are expected in <path>/<name>/
+    :param path: the output folder
+    :return: a DataFrame with one row per run, with the name, the settings SETTINGS, the revenues and costs, the energy sums,
+    the executed quantity per market ("quantity_DA", ...) and the ratios of add_ratios
+    """
+
+    # the logs are read in parallel threads, the decompression of the chunks releases the GIL
+    with ThreadPoolExecutor() as pool:
+        logs = list(pool.map(lambda name: logstore.load_log(Path(path) / name / "log", LOG_COLUMNS, with_time = False), names))
+        actions = list(pool.map(lambda name: logstore.load_log(Path(path) / name / "actions", ["Market", "Quantity"], with_time = False), names))
+
+    # one grouped pass over the rows of all runs
+    log = pd.concat(logs, ignore_index = True).astype(np.float64) # the logs are stored as float32
+    log["run"] = np.repeat(np.arange(len(names)), [len(df) for df in logs])
+    runs = log.groupby("run", sort = True)
+    summary = runs[list(CUMULATED)].last().rename(columns = CUMULATED)
+    summary[ENERGY] = runs[ENERGY].sum()
+
+    action = pd.concat(actions, ignore_index = True)
+    action["run"] = np.repeat(np.arange(len(names)), [len(df) for df in actions])
+    quantities = action.pivot_table(index = "run", columns = "Market", values = "Quantity", aggfunc = "sum", observed = False)
+    for m in kpi.MARKETS:
+        summary[f"quantity_{m}"] = quantities[m] if m in quantities else 0.0
+    summary = summary.reindex(np.arange(len(names))).fillna(0.0)
+
+    summary.insert(0, "name", list(names))
+    for col, key in SETTINGS.items():
+        summary[col] = [scenario.Scenario(name).values[key] for name in names]
+    return add_ratios(summary.reset_index(drop = True))
+
+
+def load_store(store, **filters) -> pd.DataFrame:
+    """
+    Summarizes runs from a results store, reading only the needed KPIs and daily aggregates
+    :param store: a resultstore.ResultStore
+    :param filters: required values of scenario settings, see ResultStore.select
+    :return: a DataFrame with one row per run with the same columns as load_logs
+    """
+
+    kpis = REVENUES + ["costs_grid", "pv", "load"] + [f"quantity_{m}" for m in kpi.MARKETS]
+    summary = store.select(kpis, ["name"] + list(SETTINGS), **filters)
+    flows = store.query("SELECT run_id AS id, SUM(grid_demand) AS grid_demand, SUM(grid_supply) AS grid_supply FROM daily GROUP BY run_id")
+    summary = summary.merge(flows, on = "id", how = "left").fillna({"grid_demand": 0.0, "grid_supply": 0.0})
+    return add_ratios(summary.drop(columns = ["id"]))
+
+
+def grouped(summary, value, index = "min_offer_quantity", columns = "asset_level", aggfunc = "mean") -> pd.DataFrame:
+    """
+    :return: a pivot table of a value of the run summary, e.g. the net revenue by min offer quantity and asset level
+    """
+
+    table = summary.pivot_table(index = index, columns = columns, values = value, aggfunc = aggfunc)
+    if(columns == "asset_level"): # order the asset levels by size instead of alphabetically
+        order = summary.sort_values(["battery_charge_max", "pv_power_stc", "load_multiplier"])["asset_level"].unique()
+        table = table[[level for level in order if level in table.columns]]
+    return table
+
+
+def heatmap(table, title, label, fmt = "{:.0f}") -> Figure:
+    """
+    Draws a pivot table as an annotated heatmap
+    :param table: the pivot table, see grouped
+    :param title: the title of the figure
+    :param label: the label of the color bar
+    :param fmt: the format of the annotations
+    :return: the figure
+    """
+
+    fig = Figure(figsize = (2 + 1.8 * len(table.columns), 1.5 + 0.5 * len(table.index)), layout = "constrained")
+    ax = fig.subplots()
+    image = ax.imshow(table.to_numpy(dtype = float), cmap = "viridis", aspect = "auto")
+    fig.colorbar(image, ax = ax, label = label)
+
+    ax.set_xticks(np.arange(len(table.columns)), [str(c) for c in table.columns], fontsize = 8)
+    ax.set_yticks(np.arange(len(table.index)), [f"{i:g}" if isinstance(i, (int, float)) else str(i) for i in table.index])
+    ax.set_xlabel(table.columns.name.replace("_", " "))
+    ax.set_ylabel(table.index.name.replace("_", " "))
+    ax.set_title(title)
+
+    for (i, j), v in np.ndenumerate(table.to_numpy(dtype = float)):
+        if(not np.isnan(v)):
+            color = "black" if image.norm(v) > 0.6 else "white" # readable on the bright end of the color map
+            ax.text(j, i, fmt.format(v), ha = "center", va = "center", color = color, fontsize = 8)
+    return fig
+
+
+def small_multiples(summary, values = REVENUES, x = "min_offer_quantity", panel = "asset_level", title = "Revenue by market") -> Figure:
+    """
+    Draws one panel per group (e.g. asset level), each with one line per value over x (e.g. the min offer quantity)
+    :param summary: the run summary
+    :param values: the columns to draw
+    :param x: the column of the x axis
+    :param panel: the column that defines the panels
+    :param title: the title of the figure
+    :return: the figure
+    """
+
+    tables = {value: grouped(summary, value, x, panel) for value in values}
+    panels = tables[values[0]].columns
+    fig = Figure(figsize = (4 * len(panels), 3.5), layout = "constrained")
+    axes = np.atleast_1d(fig.subplots(1, len(panels), sharey = True, squeeze = False)[0])
+
+    for ax, level in zip(axes, panels):
+        for value in values:
+            ax.plot(tables[value].index, tables[value][level], marker = "o", label = MARKET_NAMES.get(value, value),
+                    color = COLORS.get(value))
+        ax.set_title(str(level), fontsize = 9)
+        ax.set_xlabel(x.replace("_", " "))
+        ax.grid(alpha = 0.3)
+    axes[0].set_ylabel("€")
+    axes[-1].legend(fontsize = 8)
+    fig.suptitle(title)
+    return fig
+
+
+def build_report(summary, output) -> list:
+    """
+    Writes the run summary, the grouped aggregates and the figures of the comparative report
+    :param summary: the run summary, see load_logs and load_store
+    :param output: the output folder, created if it does not exist
+    :return: the list of written files
+    """
+
+    output = Path(output)
+    output.mkdir(parents = True, exist_ok = True)
+    files = list()
+
+    summary.to_csv(output / "summary.csv", sep = ";", index = False)
+    files.append(output / "summary.csv")
+
+    aggregates = {"net_revenue": grouped(summary, "net_revenue"),
+                  "self_consumption": grouped(summary, "self_consumption"),
+                  "self_sufficiency": grouped(summary, "self_sufficiency")}
+    for m in REVENUES:
+        aggregates[m] = grouped(summary, m)
+    with open(output / "aggregates.csv", "w") as f:
+        for value, table in aggregates.items():
+            f.write(f"# {value}\n")
+            table.to_csv(f, sep = ";")
+    files.append(output / "aggregates.csv")
+
+    figures = {"net_revenue.png": heatmap(aggregates["net_revenue"], "Net revenue", "€"),
+               "self_consumption.png": heatmap(aggregates["self_consumption"], "Self-consumption of the pv generation", "share", "{:.2f}"),
+               "revenue_by_market.png": small_multiples(summary)}
+    for filename, fig in figures.items():
+        fig.savefig(output / filename, dpi = 100)
+        files.append(output / filename)
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "comparative report over many simulation runs")
+    parser.add_argument("names", nargs = "*", help = "scenario names with logs in the output folder, all scenarios with logs if omitted")
+    parser.add_argument("--store", help = "read the runs from a results store instead of the logs")
+    parser.add_argument("--output", default = str(config.OUTPUT_PATH / "report"), help = "output folder of the report")
+    args = parser.parse_args()
+
+    if(args.store is not None):
+        with resultstore.ResultStore(args.store) as store:
+            summary = load_store(store)
+    else:
+        names = args.names
+        if(len(names) == 0):
+            names = sorted(p.parent.parent.name for p in config.OUTPUT_PATH.glob(f"*/log/{logstore.MANIFEST}")
+                           if (config.SCENARIO_PATH / (p.parent.parent.name + ".json")).exists())
+        summary = load_logs(names)
+
+    for path in build_report(summary, args.output):
+        print(path)
@@ -0,0 +1,259 @@
+import config
+import kpi
+from scenario import Scenario
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+from pathlib import Path
+import pandas as pd
+
+# This file contains a local results store for sweeps and batches of simulation runs, built on SQLite.
+# Every run gets one row in the table "runs" with all scenario settings as columns, the hash of its input data and its wall time.
+# Its KPIs are stored in the table "kpis" (one row per KPI) and its daily aggregates in the table "daily" (one row per day).
+# Results are buffered and written in batches, each within one transaction, so that many workers can share a store.
+#
+#   with ResultStore("output/results.db") as store:
+#       store.addResult(session.run("scenario_40_middle"))
+#   store.select(["net_revenue"], ["battery_charge_max"], min_offer_quantity = 40)
+
+# scenario settings stored as columns of the runs table, with their SQL types
+SCENARIO_COLUMNS = {
+    "t_start": "TEXT",
+    "t_end": "TEXT",
+    "t_delta": "REAL", # [min]
+    "day_ahead_closure": "TEXT",
+    "intraday_auction_closure": "TEXT",
+    "min_offer_quantity": "REAL", # as configured, not scaled to the time step size
+    "price_average_coefficient": "REAL",
+    "vola_da": "REAL",
+    "vola_ia": "REAL",
+    "vola_ic": "REAL",
+    "grid_price_residential": "REAL",
+    "grid_price_feedin": "REAL",
+    "battery_charge_min": "REAL",
+    "battery_charge_max": "REAL",
+    "battery_charge_init": "REAL",
+    "pv_power_stc": "REAL",
+    "load_multiplier": "REAL",
+    "fast_forward": "INTEGER",
+    "kernels": "TEXT",
+    "policy": "TEXT",
+    "optimizer_levels": "INTEGER",
+    "optimizer_rolling": "INTEGER",
+    "ic_order_book": "INTEGER",
+    "ic_order_book_seed": "INTEGER",
+    "households": "INTEGER",
+    "household_seed": "INTEGER",
+    "forecast_error_pv": "REAL",
+    "forecast_error_load": "REAL",
+    "forecast_error_correlation": "REAL",
+    "forecast_error_seed": "INTEGER",
+    "changes": "TEXT", # as configured, JSON
+    "data_path": "TEXT",
+    "data_store": "TEXT",
+}
+
+# scenario settings with an index, i.e. the parameters that are typically varied in sweeps
+INDEXED_COLUMNS = ["min_offer_quantity", "battery_charge_max", "pv_power_stc", "load_multiplier", "grid_price_residential",
+                   "grid_price_feedin", "policy", "t_delta", "households", "t_start"]
+
+DAILY_COLUMNS = ["revenue_DA", "revenue_IA", "revenue_IC", "revenue_grid", "costs_grid", "net_revenue", "pv", "load", "grid_demand", "grid_supply"]
+
+data_hashes = dict() # hashes of the data files per (path, size, modification time)
+
+def file_hash(path) -> str:
+    """
+    :return: the SHA-1 hash of a file, cached as long as the file is not modified
+    """
+
+    stat = os.stat(path)
+    key = (str(path), stat.st_size, stat.st_mtime_ns)
+    if(key not in data_hashes):
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        data_hashes[key] = h.hexdigest()
+    return data_hashes[key]
+
+
+def data_hash(sc : Scenario) -> str:
+    """
+    :return: a hash of the input data of a scenario, i.e. of the files of its data folder or data store
+    """
+
+    if(sc.data_store is not None):
+        files = sorted(Path(sc.data_store).glob("*"))
+    else:
+        files = [sc.data_path / config.DATA_FILES[kind] for kind in sorted(config.DATA_FILES)]
+
+    h = hashlib.sha1()
+    for path in files:
+        h.update(path.name.encode())
+        h.update(file_hash(path).encode())
+    return h.hexdigest()
+
+
+def scenario_row(sc : Scenario) -> dict:
+    """
+    :return: the scenario settings as values for the columns SCENARIO_COLUMNS
+    """
+
+    row = dict()
+    for col, sql_type in SCENARIO_COLUMNS.items():
+        value = getattr(sc, col)
+        if(col in ("t_start", "t_end")): value = value.strftime("%Y-%m-%d %H:%M")
+        elif(col in ("day_ahead_closure", "intraday_auction_closure")): value = value.strftime("%H:%M")
+        elif(col == "t_delta"): value = value.total_seconds() / 60
+        elif(col == "min_offer_quantity"): value = sc.values["min-offer-quantity"]
+        elif(col == "changes"): value = json.dumps(sc.values.get("changes", []))
+        elif(value is not None and sql_type == "TEXT"): value = str(value)
+        elif(value is not None and sql_type == "INTEGER"): value = int(value)
+        row[col] = value
+    return row
+
+
+class ResultStore():
+    """
+    SQLite database with the settings, KPIs and daily aggregates of simulation runs
+    """
+
+    def __init__(self, path, batch_size = config.RESULT_BATCH_SIZE) -> None:
+        """
+        :param path: the database file, created if it does not exist
+        :param batch_size: the number of buffered runs after which they are written
+        """
+
+        self.path = Path(path)
+        self.path.parent.mkdir(parents = True, exist_ok = True)
+        self.batch_size = batch_size
+        self.buffer = list()
+
+        # several processes may write to the same store, they wait for each other's transactions
+        self.connection = sqlite3.connect(self.path, timeout = 60)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.createTables()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def createTables(self) -> None:
+        """
+        Creates the tables and indexes if they do not exist yet
+        """
+
+        columns = ", ".join(f"{col} {sql_type}" for col, sql_type in SCENARIO_COLUMNS.items())
+        daily = ", ".join(f"{col} REAL" for col in DAILY_COLUMNS)
+        with self.connection:
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, name TEXT, created REAL, "
+                                    f"wall_time REAL, data_hash TEXT, scenario TEXT, {columns})")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS kpis (run_id INTEGER, name TEXT, value REAL, PRIMARY KEY (run_id, name)) WITHOUT ROWID")
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS daily (run_id INTEGER, date TEXT, {daily}, PRIMARY KEY (run_id, date)) WITHOUT ROWID")
+            # stores created before a scenario setting was added to SCENARIO_COLUMNS get a column for it, empty for the earlier runs
+            existing = set(row[1] for row in self.connection.execute("PRAGMA table_info(runs)"))
+            for col, sql_type in SCENARIO_COLUMNS.items():
+                if(col not in existing):
+                    self.connection.execute(f"ALTER TABLE runs ADD COLUMN {col} {sql_type}")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS runs_name ON runs (name)")
+            for col in INDEXED_COLUMNS:
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS runs_{col} ON runs ({col})")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS kpis_name ON kpis (name, value)")
+
+    def add(self, sc : Scenario, kpis, wall_time = None, daily = None, input_hash = None) -> None:
+        """
+        Adds a run to the store, it is written with the next batch
+        :param sc: the scenario of the run
+        :param kpis: the KPIs of the run as a dictionary, see kpi.compute_kpis
+        :param wall_time: the wall time of the run in seconds
+        :param daily: optional daily aggregates of the run, see kpi.daily_kpis
+        :param input_hash: the hash of the input data of the run, see data_hash, computed from the data of the scenario on this host if None
+        """
+
+        self.buffer.append((sc, kpis, wall_time, daily, input_hash))
+        if(len(self.buffer) >= self.batch_size):
+            self.flush()
+
+    def addResult(self, result) -> None:
+        """
+        Adds a session.Result to the store, including its daily aggregates
+        """
+
+        self.add(result.scenario, result.kpis, result.wall_time, kpi.daily_kpis(result.log))
+
+    def flush(self) -> None:
+        """
+        Writes the buffered runs within one transaction
+        """
+
+        if(len(self.buffer) == 0):
+            return
+
+        columns = ["name", "created", "wall_time", "data_hash", "scenario"] + list(SCENARIO_COLUMNS)
+        insert_run = f"INSERT INTO runs ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        insert_daily = f"INSERT INTO daily VALUES ({', '.join('?' * (len(DAILY_COLUMNS) + 2))})"
+
+        with self.connection: # commits at the end, or rolls back if an error occurs
+            for (sc, kpis, wall_time, daily, input_hash) in self.buffer:
+                row = scenario_row(sc)
+                if(input_hash is None):
+                    input_hash = data_hash(sc)
+                values = [sc.name, time.time(), wall_time, input_hash, json.dumps(sc.values, default = str)] + [row[col] for col in SCENARIO_COLUMNS]
+                run_id = self.connection.execute(insert_run, values).lastrowid
+
+                self.connection.executemany("INSERT INTO kpis VALUES (?, ?, ?)", [(run_id, name, float(value)) for name, value in kpis.items()])
+                if(daily is not None):
+                    rows = daily[["date"] + DAILY_COLUMNS].itertuples(index = False, name = None)
+                    self.connection.executemany(insert_daily, [(run_id,) + tuple(r) for r in rows])
+        self.buffer = list()
+
+    def close(self) -> None:
+        """
+        Writes the remaining buffered runs and closes the database
+        """
+
+        self.flush()
+        self.connection.close()
+
+    def query(self, sql, params = ()) -> pd.DataFrame:
+        """
+        Runs an SQL query on the store
+        :return: the result as a DataFrame
+        """
+
+        self.flush()
+        return pd.read_sql_query(sql, self.connection, params = params)
+
+    def select(self, kpis = ("net_revenue",), columns = (), **filters) -> pd.DataFrame:
+        """
+        Selects KPIs of the runs with the given scenario settings
+        :param kpis: the names of the KPIs
+        :param columns: the scenario settings to include, e.g. ["battery_charge_max"]
+        :param filters: required values of scenario settings, e.g. min_offer_quantity = 40
+        :return: a DataFrame with one row per run, with the columns "id", the requested settings and the KPIs
+        """
+
+        for col in list(columns) + list(filters):
+            if(col not in SCENARIO_COLUMNS and col not in ("name", "data_hash")):
+                raise ValueError(f"unknown scenario setting {col}")
+
+        selected = ["runs.id"] + [f"runs.{col}" for col in columns]
+        selected += [f"(SELECT value FROM kpis WHERE run_id = runs.id AND name = ?) AS \"{name}\"" for name in kpis]
+        sql = f"SELECT {', '.join(selected)} FROM runs"
+        if(len(filters) > 0):
+            sql += " WHERE " + " AND ".join(f"runs.{col} = ?" for col in filters)
+        params = list(kpis) + [int(value) if isinstance(value, bool) else value for value in filters.values()]
+        return self.query(sql, params)
+
+    def daily(self, run_id) -> pd.DataFrame:
+        """
+        :return: the daily aggregates of a run
+        """
+
+        return self.query("SELECT * FROM daily WHERE run_id = ? ORDER BY date", (run_id,))
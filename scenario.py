@@ -3,19 +3,36 @@ import config
 import json
 import datetime as dt
 
+# config values that may change during a run through the key "changes", with the names of the scenario variables
+CHANGEABLE = {
+    "grid-price-residential": "grid_price_residential",
+    "grid-price-feedin": "grid_price_feedin",
+    "battery-charge-min": "battery_charge_min",
+    "battery-charge-max": "battery_charge_max",
+    "min-offer-quantity": "min_offer_quantity",
+    "price-average-coefficient": "price_average_coefficient",
+    "vola_da": "vola_da",
+    "vola_ia": "vola_ia",
+    "vola_ic": "vola_ic",
+}
+
 class Scenario():
 
-    def __init__(self, file):
+    def __init__(self, file, values = None):
         """
         Reads in the scenario config from the specified file and sets the config variables accordingly
         :param file: the file name for the JSON config file
+        :param values: optional dictionary in the format of the JSON config file, used instead of reading the file
         """
 
         self.name = file # name of the scenario [string]
 
         # read in the JSON file
-        full_path = config.SCENARIO_PATH / (self.name + ".json")
-        sc = json.load(open(full_path))
+        if(values is None):
+            full_path = config.SCENARIO_PATH / (self.name + ".json")
+            values = json.load(open(full_path))
+        sc = dict(values)
+        self.values = sc # the config as read in [dict]
 
         # update the config variables
         self.t_start_str = sc["t-start"] # simulation start time [string]
@@ -40,11 +57,86 @@ class Scenario():
         self.pv_power_stc = sc["pv-power-stc"] # quoted pv power under STC (standard test conditions) [kW]
         self.load_multiplier = sc["load-multiplier"] # multiplier for the load data (1 = one household)
 
+        # optional simulation settings
+        self.t_delta = dt.timedelta(minutes = sc.get("t-delta", config.T_DELTA / dt.timedelta(minutes = 1))) # simulation time step size [min]
+        self.fast_forward = sc.get("fast-forward", False) # advance through stretches without events at once [bool]
+        self.log_pipeline = sc.get("log-pipeline", False) # validate and log the time steps in a background thread [bool]
+        self.policy = sc.get("policy", "greedy") # decision policy of the agent, "greedy" or "optimizer" [string]
+        self.optimizer_levels = sc.get("optimizer-levels", config.OPTIMIZER_LEVELS) # number of discrete battery states [1]
+        self.optimizer_rolling = sc.get("optimizer-rolling", False) # roll the optimization horizon at each day-ahead gate closure [bool]
+        self.ic_order_book = sc.get("ic-order-book", False) # match intraday continuous offers against a limit order book [bool]
+        self.ic_order_book_seed = sc.get("ic-order-book-seed", 0) # seed of the synthetic order book liquidity [1]
+        self.households = sc.get("households", 0) # number of distinct synthetic households aggregated into the load, 0 for the base profile [1]
+        self.household_seed = sc.get("household-seed", 0) # seed of the synthetic household load profiles [1]
+        self.forecast_error_pv = sc.get("forecast-error-pv", 0) # standard deviation of the relative pv forecast error one day ahead, 0 for perfect foresight [1]
+        self.forecast_error_load = sc.get("forecast-error-load", 0) # standard deviation of the relative load forecast error one day ahead, 0 for perfect foresight [1]
+        self.forecast_error_correlation = sc.get("forecast-error-correlation", config.FORECAST_ERROR_CORRELATION) # correlation of the forecast errors of time steps one hour apart [1]
+        self.forecast_error_seed = sc.get("forecast-error-seed", 0) # seed of the forecast errors [1]
+        self.kernels = sc.get("kernels", "python") # backend of the agent's inner loops, "python", "numpy", "numba" or "auto" [string]
+        self.data_path = config.ROOT_PATH / sc.get("data-path", config.DATA_PATH) # folder with the price, load and pv data files [path]
+        self.data_store = sc.get("data-store", None) # binary data store with the price, load and pv series, used instead of the data folder [path]
+        if(self.data_store is not None):
+            self.data_store = config.ROOT_PATH / self.data_store
+
         # compute derived scenario variables
         self.t_start = dt.datetime.strptime(self.t_start_str, "%Y-%m-%d %H:%M")
         self.t_end = dt.datetime.strptime(self.t_end_str, "%Y-%m-%d %H:%M")
 
-        self.number_of_intervals = int(((self.t_end - self.t_start).total_seconds() / 60) / 15) + 1
+        self.number_of_intervals = (self.t_end - self.t_start) // self.t_delta + 1
 
         self.day_ahead_closure = dt.datetime.strptime(self.day_ahead_closure_str, "%H:%M").time()
         self.intraday_auction_closure = dt.datetime.strptime(self.intraday_auction_closure_str, "%H:%M").time()
+
+        # time steps per day and the offsets in time steps used by the agent
+        if(dt.timedelta(days = 1) % self.t_delta != dt.timedelta(0)):
+            raise ValueError(f"the time step size {self.t_delta} does not divide a day")
+        for t in (self.t_start.time(), self.day_ahead_closure, self.intraday_auction_closure):
+            if(dt.timedelta(hours = t.hour, minutes = t.minute) % self.t_delta != dt.timedelta(0)):
+                raise ValueError(f"the time {t} is not aligned with the time step size {self.t_delta}")
+        self.steps_per_day = dt.timedelta(days = 1) // self.t_delta
+        if(self.t_delta != config.T_DELTA):
+            # the minimum offer quantity refers to time steps of the default size, an offer for a longer time step stands for several of them
+            self.min_offer_quantity = self.min_offer_quantity * (self.t_delta / config.T_DELTA)
+        self.forecast_steps = config.FORECAST_HORIZON // self.t_delta
+        self.intraday_auction_offset = -(-config.INTRADAY_AUCTION_OFFSET // self.t_delta)
+        self.day_ahead_offset = -(-config.DAY_AHEAD_OFFSET // self.t_delta)
+
+        # changes of config values that take effect at a given time of the run, e.g. a new grid tariff from a given date
+        self.changes = list() # (time, {key: value}) sorted by time [list]
+        for change in sc.get("changes", []): # list of {"from": "<yyyy-mm-dd hh:mm>", <key>: <value>, ...}
+            change = dict(change)
+            t = dt.datetime.strptime(change.pop("from"), "%Y-%m-%d %H:%M")
+            if(not (self.t_start < t <= self.t_end) or (t - self.t_start) % self.t_delta != dt.timedelta(0)):
+                raise ValueError(f"the change from {t} is not a time step after the start of the scenario")
+            for key in change:
+                if(key not in CHANGEABLE):
+                    raise ValueError(f"the config value {key} cannot change during a run, changeable values: {', '.join(CHANGEABLE)}")
+            self.changes.append((t, change))
+        self.changes.sort(key = lambda change: change[0])
+        if(len(self.changes) > 0 and self.policy == "optimizer"):
+            raise ValueError("the optimizer policy does not support changes during a run")
+
+    def apply(self, change) -> None:
+        """
+        Changes config values of the scenario in place, for a change that takes effect during a run
+        :param change: a dictionary with the changed config values, with keys from CHANGEABLE
+        """
+
+        changed = Scenario(self.name, {**self.values, **change, "changes": []}) # derives the variables like the constructor
+        for key in change:
+            setattr(self, CHANGEABLE[key], getattr(changed, CHANGEABLE[key]))
+
+    def variant(self, name, **changes):
+        """
+        Creates a copy of the scenario with some config values changed
+        :param name: the name of the new scenario
+        :param changes: the changed config values, with "_" in place of "-" in the keys (e.g. battery_charge_max = 20)
+        :return: the new scenario
+        """
+
+        values = dict(self.values)
+        for key, value in changes.items():
+            if(key not in values): # most keys of the JSON config use "-" as separator
+                key = key.replace("_", "-")
+            values[key] = value
+        return Scenario(name, values)
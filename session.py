@@ -0,0 +1,143 @@
+import scenario
+import agent
+import optimizer
+import environment as env
+import kpi
+import forecasting
+import snapshots
+
+import time
+
+# This file contains an in-process interface for running many simulations, e.g. from notebooks or scripts.
+# A Session reads the price, load and pv data of every data source only once,
+# and each run gets its own views of the data for its horizon and scaling factors.
+#
+#   session = Session()
+#   result = session.run("scenario_test")
+#   result = session.run(scenario.Scenario("scenario_test").variant("larger", pv_power_stc = 60))
+#   print(result.kpis["net_revenue"])
+#   results = session.runEnsemble(scenario.Scenario("scenario_test").variant("uncertain", forecast_error_pv = 0.3), 20)
+#   print(forecasting.summary(results)["net_revenue"])
+#   session = Session(snapshot_cache = snapshots.SnapshotCache()) # runs continue from the longest stored common prefix
+
+class Result():
+    """
+    The logs and KPIs of a simulation run
+    """
+
+    def __init__(self, sc : scenario.Scenario, ag : agent.Agent, wall_time) -> None:
+        """
+        :param sc: the scenario of the run
+        :param ag: the agent after the run
+        :param wall_time: the wall time of the run in seconds
+        """
+
+        self.scenario = sc
+        self.log = ag.log_pd
+        self.actions = ag.action_log
+        self.violation_log = ag.violation_log
+        self.violations = ag.violations
+        self.kpis = kpi.compute_kpis(ag.log_pd, ag.action_log, ag.violations)
+        self.wall_time = wall_time
+        self.reused_steps = ag.reused_steps # time steps restored from a snapshot instead of simulated
+
+
+class Session():
+    """
+    Runs simulations on data that is read once per data source and shared between the runs
+    """
+
+    def __init__(self, snapshot_cache = None) -> None:
+        """
+        :param snapshot_cache: an optional snapshots.SnapshotCache, the runs then continue from the longest common prefix
+        with earlier runs found in it and store snapshots of their own
+        """
+
+        self.data = dict() # environment.DataSet per data source
+        self.snapshot_cache = snapshot_cache
+
+    def getScenario(self, sc, name = "session") -> scenario.Scenario:
+        """
+        :param sc: a Scenario, the name of a scenario file or a dictionary in the format of the scenario files
+        :param name: the name of the scenario if given as a dictionary
+        :return: the scenario
+        """
+
+        if(isinstance(sc, scenario.Scenario)):
+            return sc
+        if(isinstance(sc, dict)):
+            return scenario.Scenario(name, sc)
+        return scenario.Scenario(sc)
+
+    def getData(self, sc : scenario.Scenario) -> env.DataSet:
+        """
+        :return: the shared data of the data source of the scenario
+        """
+
+        source = env.data_source(sc)
+        if(source not in self.data):
+            self.data[source] = env.DataSet(sc)
+        return self.data[source]
+
+    def createAgent(self, sc) -> agent.Agent:
+        """
+        Creates the agent for a scenario on the shared data, according to the policy of the scenario
+        :param sc: a Scenario, the name of a scenario file or a dictionary in the format of the scenario files
+        """
+
+        sc = self.getScenario(sc)
+        if(sc.policy == "optimizer"): return optimizer.OptimizerAgent(sc, data = self.getData(sc))
+        return agent.Agent(sc, self.getData(sc))
+
+    def run(self, sc, log_store = None, telemetry = None) -> Result:
+        """
+        Runs a simulation without printing or plotting anything
+        :param sc: a Scenario, the name of a scenario file or a dictionary in the format of the scenario files
+        :param log_store: an optional logstore.LogStore to which the logs are written while the run progresses
+        :param telemetry: an optional telemetry.Telemetry that reports the progress of the run
+        :return: the result of the run
+        """
+
+        sc = self.getScenario(sc)
+        start = time.perf_counter()
+        ag = self.createAgent(sc)
+        ag.log_store = log_store
+        ag.telemetry = telemetry
+        state = None
+        if(self.snapshot_cache is not None and snapshots.reusable(sc)):
+            state = self.snapshot_cache.restore(sc)
+            ag.snapshots = self.snapshot_cache.recorder(sc, state)
+        ag.run(state)
+        return Result(sc, ag, time.perf_counter() - start)
+
+    def runMany(self, scenarios) -> list:
+        """
+        Runs several simulations one after the other
+        :param scenarios: an iterable of scenarios in any of the forms accepted by run
+        :return: the list of results
+        """
+
+        return [self.run(sc) for sc in scenarios]
+
+    def runEnsemble(self, sc, count, seed = None) -> list:
+        """
+        Runs an ensemble of simulations of a scenario with forecast errors, one per member.
+        The forecast errors of all members are generated in one pass and the runs share the data of the session.
+        :param sc: a scenario with forecast errors in any of the forms accepted by run
+        :param count: the number of members
+        :param seed: the seed of the ensemble, the seed of the forecast errors of the scenario if None
+        :return: the list of results, summarized by forecasting.summary
+        """
+
+        sc = self.getScenario(sc)
+        if(not forecasting.enabled(sc)):
+            raise ValueError(f"scenario {sc.name} has no forecast errors, see forecast-error-pv and forecast-error-load")
+
+        results = list()
+        for errors in forecasting.generate(sc, count, sc.forecast_error_seed if seed is None else seed):
+            start = time.perf_counter()
+            ag = self.createAgent(sc)
+            ag.forecast_errors = errors
+            ag.run()
+            results.append(Result(sc, ag, time.perf_counter() - start))
+        return results
@@ -0,0 +1,133 @@
+import config
+
+import pandas as pd
+import numpy as np
+
+# This file contains a settlement engine that revalues the trades and grid flows of a finished run
+# against alternative prices and grid tariffs, without running the agent again.
+# The executed market quantities and the grid flows are aggregated per time step once,
+# so that revaluing them for many price scenarios at once is a single matrix-vector product per market.
+# Note that the decisions of the agent are kept fixed, i.e. the revaluation answers what the same trades would have earned.
+
+MARKETS = ["DA", "IA", "IC"]
+
+def realized_prices(market, n) -> dict:
+    """
+    :param market: an environment.Market
+    :param n: the number of time steps
+    :return: the realized prices of the markets per time step of the run as a dictionary of arrays [€/kWh]
+    """
+
+    index = np.arange(n)
+    return {"DA": market.prices["DA"][index], "IA": market.prices["IA"][index], "IC": market.prices["IC"][index]}
+
+
+def perturbed_prices(prices, count, sigma, seed = 0) -> dict:
+    """
+    Creates price scenarios by multiplying the given prices with independent log-normal noise with mean 1
+    :param prices: a dictionary with the price arrays per market
+    :param count: the number of price scenarios
+    :param sigma: the standard deviation of the logarithm of the noise
+    :param seed: the seed of the noise
+    :return: a dictionary with arrays of shape (count, time steps) per market
+    """
+
+    rng = np.random.default_rng(seed)
+    return {m: p[np.newaxis, :] * rng.lognormal(- sigma**2 / 2, sigma, size = (count, len(p))) for m, p in prices.items()}
+
+
+class Settlement():
+    """
+    The executed market quantities and grid flows of a run per time step
+    """
+
+    def __init__(self, log_pd, action_log, t_start = None, t_delta = config.T_DELTA) -> None:
+        """
+        :param log_pd: the slot log of the run
+        :param action_log: the action log of the run
+        :param t_start: the start time of the run, the time of the first row of the slot log if None
+        :param t_delta: the time step size of the run
+        """
+
+        self.n = len(log_pd)
+        if(t_start is None):
+            t_start = pd.Timestamp(log_pd["Time"].iloc[0]) if self.n > 0 else None
+
+        slots = np.zeros(0, dtype = np.int64)
+        if(len(action_log) > 0):
+            slots = ((pd.to_datetime(action_log["Time"]) - t_start) // t_delta).to_numpy(dtype = np.int64)
+        markets = action_log["Market"].to_numpy().astype(str)
+        quantities = action_log["Quantity"].to_numpy(dtype = float)
+        prices = action_log["Price"].to_numpy(dtype = float)
+
+        # executed quantity per market and time step, and the revenue at the logged execution prices
+        self.quantities = dict()
+        self.revenues = dict()
+        for m in MARKETS:
+            is_market = markets == m
+            self.quantities[m] = np.bincount(slots[is_market], weights = quantities[is_market], minlength = self.n)
+            self.revenues[m] = float(np.dot(quantities[is_market], prices[is_market]))
+
+        # grid flows per time step and their logged values
+        self.grid_demand = log_pd["grid_demand"].to_numpy(dtype = float)
+        self.grid_supply = log_pd["grid_supply"].to_numpy(dtype = float)
+        self.costs = float(log_pd["costs"].iloc[-1]) if self.n > 0 else 0.0
+        self.feedin = float(log_pd["grid_feedin"].iloc[-1]) if self.n > 0 else 0.0
+
+    def revalue(self, prices = None, grid_price_residential = None, grid_price_feedin = None) -> dict:
+        """
+        Revalues the run for any number of price scenarios at once.
+        All arguments broadcast against each other, so that e.g. 1000 price scenarios can be combined with one tariff or vice versa.
+        :param prices: optional dictionary with price arrays per market of shape (time steps,) or (scenarios, time steps) [€/kWh],
+        markets that are not given are valued at the logged execution prices
+        :param grid_price_residential: optional grid price for buying energy, a scalar, an array of shape (scenarios,)
+        or (scenarios, time steps), the logged grid costs are used if None [€/kWh]
+        :param grid_price_feedin: optional grid price for feeding in energy, in the same forms as grid_price_residential,
+        the logged feed-in revenue is used if None [€/kWh]
+        :return: a dictionary with the revenues per market ("revenue_DA", ...), "revenue_grid", "costs_grid"
+        and "net_revenue", each an array with one value per scenario
+        """
+
+        if(prices is None): prices = dict()
+        result = dict()
+        for m in MARKETS:
+            if(m in prices):
+                result[f"revenue_{m}"] = np.asarray(prices[m], dtype = float) @ self.quantities[m]
+            else:
+                result[f"revenue_{m}"] = np.array(self.revenues[m])
+
+        result["revenue_grid"] = self.flowValue(self.grid_supply, grid_price_feedin, self.feedin)
+        result["costs_grid"] = self.flowValue(self.grid_demand, grid_price_residential, self.costs)
+
+        shape = np.broadcast_shapes(*(np.shape(v) for v in result.values()))
+        for key in result:
+            result[key] = np.broadcast_to(result[key], shape)
+        result["net_revenue"] = result["revenue_DA"] + result["revenue_IA"] + result["revenue_IC"] + result["revenue_grid"] - result["costs_grid"]
+        return result
+
+    def flowValue(self, flow, price, logged) -> np.ndarray:
+        """
+        :return: the value of a grid flow for a grid price given as in revalue, or the logged value if the price is None
+        """
+
+        if(price is None):
+            return np.array(logged)
+        price = np.asarray(price, dtype = float)
+        if(price.ndim == 2):
+            return price @ flow
+        return price * flow.sum()
+
+
+def distribution(values, percentiles = (5, 25, 50, 75, 95)) -> dict:
+    """
+    Summarizes the distribution of a revalued quantity over the price scenarios
+    :param values: an array with one value per scenario
+    :param percentiles: the percentiles to compute
+    :return: a dictionary with the mean, the standard deviation and the percentiles ("p5", ...)
+    """
+
+    values = np.asarray(values, dtype = float)
+    result = {"mean": float(values.mean()), "std": float(values.std())}
+    for p, v in zip(percentiles, np.percentile(values, percentiles)):
+        result[f"p{p}"] = float(v)
+    return result
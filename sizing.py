@@ -0,0 +1,170 @@
+import scenario
+import session
+import telemetry
+import config
+
+import itertools
+import datetime as dt
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# This file contains a successive-halving search for the battery and pv size that maximizes the net revenue of a scenario.
+# All candidates are first evaluated on a few short time slices spread over the scenario horizon,
+# and only the best fraction of them is promoted to the next rung with eta times as many slices.
+# The remaining candidates are finally evaluated on the full horizon.
+
+worker_session = None # session of the worker process, so that the data is read only once per worker
+worker_telemetry = None # telemetry of the worker process, reports the progress of its long runs
+
+def init_worker(telemetry_path, telemetry_format) -> None:
+    """
+    Sets up the telemetry of a worker process
+    :param telemetry_path: the telemetry folder, or None to only report to stderr
+    :param telemetry_format: the format of the telemetry records, or None for no telemetry
+    """
+
+    global worker_telemetry
+    if(telemetry_format is not None):
+        worker_telemetry = telemetry.Telemetry(telemetry_path, telemetry_format)
+
+
+def slice_scenario(values, t_start, t_end) -> scenario.Scenario:
+    """
+    :param values: the scenario config as a dictionary
+    :param t_start: the start of the time slice
+    :param t_end: the end of the time slice
+    :return: the scenario restricted to the time slice, the changes before it take effect from its start and the ones after it are dropped
+    """
+
+    values = dict(values)
+    changes = list()
+    for change in sorted(values.get("changes", []), key = lambda change: change["from"]):
+        t = dt.datetime.strptime(change["from"], "%Y-%m-%d %H:%M")
+        if(t <= t_start):
+            values.update({key: value for key, value in change.items() if key != "from"})
+        elif(t <= t_end):
+            changes.append(change)
+    if("changes" in values):
+        values["changes"] = changes
+
+    sc = scenario.Scenario("sizing", values).variant("sizing", t_start = t_start.strftime("%Y-%m-%d %H:%M"),
+                                                     t_end = t_end.strftime("%Y-%m-%d %H:%M"))
+    sc.fast_forward = True
+    return sc
+
+
+def evaluate(values, t_start, t_end) -> tuple:
+    """
+    Runs the agent for a scenario config on the given time slice
+    :param values: the scenario config as a dictionary
+    :param t_start: the start of the time slice
+    :param t_end: the end of the time slice
+    :return: the KPIs and the wall time of the run
+    """
+
+    global worker_session
+    if(worker_session is None):
+        worker_session = session.Session()
+    result = worker_session.run(slice_scenario(values, t_start, t_end), telemetry = worker_telemetry)
+    return (result.kpis, result.wall_time)
+
+
+def time_slices(sc, count, days = config.SIZING_SLICE_DAYS) -> list:
+    """
+    Spreads a number of time slices evenly over the horizon of the scenario
+    :param sc: the scenario
+    :param count: the number of time slices
+    :param days: the length of a time slice in days
+    :return: a list of (start, end) tuples
+    """
+
+    length = dt.timedelta(days = days)
+    horizon = sc.t_end - sc.t_start
+    if(count * length >= horizon):
+        return [(sc.t_start, sc.t_end)]
+
+    slices = list()
+    for start in np.linspace(0, (horizon - length) / sc.t_delta, count):
+        t = sc.t_start + sc.t_delta * int(start)
+        slices.append((t, t + length))
+    return slices
+
+
+def wait(futures, name, tel) -> None:
+    """
+    Waits for the given futures and reports the progress
+    :param futures: the futures
+    :param name: the name of the stage in the progress records
+    :param tel: a telemetry.Telemetry, or None
+    """
+
+    if(tel is None):
+        return
+    tel.progress(name, 0, len(futures))
+    for done, _ in enumerate(as_completed(futures), 1):
+        tel.progress(name, done, len(futures))
+
+
+def search(name, battery_sizes, pv_sizes, load_multipliers = None, eta = 3, min_slices = 4, workers = None, store = None,
+           tel = None) -> list:
+    """
+    Searches for the battery and pv sizes with the highest net revenue through successive halving
+    :param name: the name of the base scenario
+    :param battery_sizes: the candidate values for the maximum battery charge
+    :param pv_sizes: the candidate values for the pv power under STC
+    :param load_multipliers: optional candidate values for the load multiplier, the value of the scenario if None
+    :param eta: the factor by which the number of candidates is reduced and the number of time slices is increased per rung
+    :param min_slices: the number of time slices of the first rung
+    :param workers: the number of worker processes, defaults to the number of CPUs
+    :param store: an optional resultstore.ResultStore to which all evaluations are written, one batch per rung
+    :param tel: an optional telemetry.Telemetry that reports the progress of the rungs, the workers report their long runs
+    to the same telemetry folder
+    :return: a list of (config, kpis) tuples for the candidates of the final rung, with their full-horizon KPIs,
+    sorted by decreasing net revenue
+    """
+
+    sc = scenario.Scenario(name)
+    if(load_multipliers is None):
+        load_multipliers = [sc.load_multiplier]
+
+    candidates = list()
+    for battery, pv, load in itertools.product(battery_sizes, pv_sizes, load_multipliers):
+        candidates.append(sc.variant(name, battery_charge_max = battery, pv_power_stc = pv, load_multiplier = load).values)
+
+    initargs = (None, None) if tel is None else (tel.path, tel.fmt)
+    with ProcessPoolExecutor(max_workers = workers, initializer = init_worker, initargs = initargs) as pool:
+        count = min_slices
+        rung = 0
+        while(len(candidates) > eta):
+            slices = time_slices(sc, count)
+            if(len(slices) == 1):
+                break # the slices cover the full horizon, so the remaining candidates are evaluated on it directly
+
+            # evaluate all candidates on all slices in parallel and rank them by their mean net revenue per slice
+            futures = [[pool.submit(evaluate, c, start, end) for (start, end) in slices] for c in candidates]
+            rung += 1
+            wait([f for fs in futures for f in fs], f"{name} rung {rung}: {len(candidates)} candidates on {len(slices)} slices", tel)
+            scores = [np.mean([f.result()[0]["net_revenue"] for f in fs]) for fs in futures]
+            if(store is not None):
+                for c, fs in zip(candidates, futures):
+                    for (start, end), f in zip(slices, fs):
+                        store.add(slice_scenario(c, start, end), *f.result())
+                store.flush()
+            ranking = np.argsort(scores)[::-1]
+
+            keep = max(int(np.ceil(len(candidates) / eta)), 1)
+            candidates = [candidates[i] for i in ranking[:keep]]
+            count *= eta
+
+        # full-horizon evaluation of the remaining candidates
+        futures = [pool.submit(evaluate, c, sc.t_start, sc.t_end) for c in candidates]
+        wait(futures, f"{name} full horizon: {len(candidates)} candidates", tel)
+        results = [(c, f.result()[0]) for c, f in zip(candidates, futures)]
+        if(store is not None):
+            for c, f in zip(candidates, futures):
+                store.add(slice_scenario(c, sc.t_start, sc.t_end), *f.result())
+            store.flush()
+
+    results.sort(key = lambda r: r[1]["net_revenue"], reverse = True)
+    return results
+
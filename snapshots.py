@@ -0,0 +1,236 @@
+from scenario import Scenario
+import resultstore
+import forecasting
+import config
+
+import os
+import json
+import pickle
+import time
+import hashlib
+import datetime as dt
+from pathlib import Path
+import numpy as np
+
+# This file contains an on-disk cache of snapshots of the simulation state, so that runs which are identical up to some point in time
+# continue from there instead of simulating from the start, e.g. the same scenario with a later end (horizon extension),
+# or with changes that only take effect from a given date (see the scenario key "changes").
+# A run stores a snapshot of the state of its agent, market and household at every midnight, together with the log rows of the day before.
+# The key of a snapshot is a hash of everything that determines the time steps before it: the scenario settings except its end,
+# the changes that took effect before it, the input data and the index of the time step. A new run looks up its own keys
+# from the start and continues from the last snapshot of the longest chain found, the results are identical to a full run.
+# The cache is bounded in size, the least recently used snapshots are deleted first.
+#
+#   s = session.Session(snapshot_cache = snapshots.SnapshotCache())
+#   s.run(sc)                                           # stores snapshots
+#   s.run(sc.variant(sc.name, t_end = "2022-12-31 23:45"))     # only simulates the new days
+
+FORMAT = 1 # version of the contents of a snapshot, part of the keys
+
+# scenario variables that do not influence the time steps of a run before a given one, the changes are considered separately
+NOT_IN_PREFIX = ["name", "values", "t_end", "t_end_str", "number_of_intervals", "fast_forward", "log_pipeline", "changes"]
+
+def plain(rows) -> list:
+    """
+    :return: the given log rows with NumPy floats replaced by Python floats of the same value, which are much faster to pickle
+    """
+
+    return [[float(v) if isinstance(v, np.floating) else v for v in row] for row in rows]
+
+
+def reusable(sc : Scenario) -> bool:
+    """
+    :return: whether runs of the scenario can store and continue from snapshots, which is not the case for the optimizer policy
+    (its schedule depends on the whole horizon), for forecast errors (their series depend on the horizon) and for the log pipeline
+    (its log rows are kept in a background thread)
+    """
+
+    return sc.policy == "greedy" and not forecasting.enabled(sc) and not sc.log_pipeline
+
+
+def snapshot_indices(sc : Scenario) -> np.ndarray:
+    """
+    :return: the indices of the time steps of the scenario that start at midnight, before which the snapshots are taken
+    """
+
+    start = dt.timedelta(hours = sc.t_start.hour, minutes = sc.t_start.minute) // sc.t_delta
+    first = (sc.steps_per_day - start) % sc.steps_per_day or sc.steps_per_day
+    return np.arange(first, sc.number_of_intervals, sc.steps_per_day)
+
+
+def prefix_keys(sc : Scenario) -> list:
+    """
+    :return: the keys of the snapshots of a scenario as a list of (index, key) tuples, see snapshot_indices
+    """
+
+    settings = {name: value for name, value in vars(sc).items() if name not in NOT_IN_PREFIX}
+    base = json.dumps([FORMAT, settings, resultstore.data_hash(sc)], sort_keys = True, default = str)
+
+    keys = list()
+    for index in snapshot_indices(sc).tolist():
+        time = sc.t_start + sc.t_delta * index
+        changes = [(t, change) for (t, change) in sc.changes if t < time]
+        text = base + json.dumps([changes, index], sort_keys = True, default = str)
+        keys.append((index, hashlib.sha1(text.encode()).hexdigest()))
+    return keys
+
+
+def used_time(start, position) -> float:
+    """
+    The modification time of a snapshot file is the time of its last use, the least recently used snapshots are deleted first.
+    A snapshot is only useful together with the earlier snapshots of its chain, so the snapshots of a chain that are used
+    or stored by a run get the start of the run as their time of use, minus one millisecond per position in the chain,
+    so that the later ones are deleted first.
+    :param start: the start of the run
+    :param position: the position of the snapshot in its chain
+    :return: the time of use of the snapshot
+    """
+
+    return start - 0.001 * position
+
+
+class SnapshotCache():
+    """
+    A bounded on-disk cache of snapshots of the simulation state, one pickle file per snapshot
+    """
+
+    def __init__(self, path = config.SNAPSHOT_PATH, max_bytes = config.SNAPSHOT_CACHE_BYTES) -> None:
+        """
+        :param path: the folder of the cache, created if it does not exist
+        :param max_bytes: the maximum size of the cache [byte]
+        """
+
+        self.path = Path(path)
+        self.path.mkdir(parents = True, exist_ok = True)
+        self.max_bytes = max_bytes
+        self.size = sum(p.stat().st_size for p in self.path.glob("*.pkl")) # estimated, other processes may share the cache
+
+    def get(self, key, used):
+        """
+        :param key: the key of the snapshot
+        :param used: the time of use of the snapshot, see used_time
+        :return: the snapshot with the given key, or None if it is not in the cache
+        """
+
+        path = self.path / f"{key}.pkl"
+        try:
+            with open(path, "rb") as f:
+                entry = pickle.load(f)
+            os.utime(path, (used, used))
+            return entry
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, key, entry, used) -> None:
+        """
+        Writes a snapshot to the cache and deletes the least recently used snapshots if the cache is too large
+        :param key: the key of the snapshot
+        :param entry: the snapshot
+        :param used: the time of use of the snapshot, see used_time
+        """
+
+        path = self.path / f"{key}.pkl"
+        temporary = self.path / f".{key}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as f:
+            pickle.dump(entry, f, protocol = pickle.HIGHEST_PROTOCOL)
+        self.size += temporary.stat().st_size
+        os.replace(temporary, path) # other processes never see a partially written snapshot
+        os.utime(path, (used, used))
+
+        if(self.size > self.max_bytes):
+            self.evict()
+
+    def contains(self, key) -> bool:
+        return (self.path / f"{key}.pkl").exists()
+
+    def evict(self) -> None:
+        """
+        Deletes the least recently used snapshots until the cache is below 90% of its maximum size
+        """
+
+        files = list()
+        for p in self.path.glob("*.pkl"):
+            try:
+                stat = p.stat()
+                files.append((stat.st_mtime, stat.st_size, p))
+            except FileNotFoundError:
+                continue # deleted by another process
+        files.sort()
+
+        self.size = sum(size for (_, size, _) in files)
+        for (_, size, p) in files:
+            if(self.size <= 0.9 * self.max_bytes):
+                break
+            p.unlink(missing_ok = True)
+            self.size -= size
+
+    def restore(self, sc : Scenario):
+        """
+        Finds the longest chain of snapshots of a scenario from its start
+        :return: the state of the last snapshot of the chain with the log rows of all time steps before it, see agent.Agent.setState,
+        or None if there is no snapshot of the scenario
+        """
+
+        state = None
+        rows = {"log_rows": list(), "action_rows": list(), "violation_rows": list()}
+        start = time.time()
+        for (position, (_, key)) in enumerate(prefix_keys(sc)):
+            entry = self.get(key, used_time(start, position))
+            if(entry is None):
+                break
+            for name in rows:
+                rows[name].extend(entry[name])
+            state = entry["state"]
+        if(state is None):
+            return None
+        return {**state, **rows}
+
+    def recorder(self, sc : Scenario, state = None):
+        """
+        :param sc: the scenario of a run
+        :param state: the state from which the run continues, see restore
+        :return: the Recorder of the snapshots of the run, to be assigned to agent.Agent.snapshots
+        """
+
+        return Recorder(self, sc, state)
+
+
+class Recorder():
+    """
+    Stores the snapshots of a run in a SnapshotCache while the run progresses
+    """
+
+    def __init__(self, cache, sc : Scenario, state = None) -> None:
+        """
+        :param cache: the SnapshotCache
+        :param sc: the scenario of the run
+        :param state: the state from which the run continues, see SnapshotCache.restore
+        """
+
+        start = 0 if state is None else state["index"]
+        self.cache = cache
+        self.keys = [(position, index, key) for (position, (index, key)) in enumerate(prefix_keys(sc)) if index > start]
+        self.indices = np.array([index for (_, index, _) in self.keys], dtype = int) # the time steps before which snapshots are taken
+        self.next = 0 # the next snapshot in keys
+        self.start = time.time()
+        self.next_index = self.keys[0][1] if len(self.keys) > 0 else -1
+
+        # number of log rows already stored in earlier snapshots
+        self.rows = {name: 0 if state is None else len(state[name]) for name in ("log_rows", "action_rows", "violation_rows")}
+
+    def record(self, ag, index) -> None:
+        """
+        Stores the snapshot of an agent before the time step with the given index, with its log rows since the last snapshot
+        """
+
+        (position, _, key) = self.keys[self.next]
+        if(not self.cache.contains(key)):
+            entry = {"state": ag.getState(index)}
+            for name in self.rows:
+                entry[name] = plain(getattr(ag, name)[self.rows[name]:])
+            self.cache.put(key, entry, used_time(self.start, position))
+        for name in self.rows:
+            self.rows[name] = len(getattr(ag, name))
+
+        self.next += 1
+        self.next_index = self.keys[self.next][1] if self.next < len(self.keys) else -1
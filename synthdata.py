@@ -0,0 +1,143 @@
+import config
+import datastore
+
+import argparse
+import datetime as dt
+from pathlib import Path
+import pandas as pd
+import numpy as np
+
+# This file contains a generator for synthetic price, load and pv series of arbitrary length, e.g. for scaling tests.
+# The series are assembled from whole days of the bundled data: every synthetic day is a copy of a source day
+# with a similar day of the year (within SEASON_DAYS, wrapping around the turn of the year) and the same day type (weekday/weekend).
+# All series of a synthetic day are copied from the same source day, so that the correlation between prices, load and pv is kept.
+
+SEASON_DAYS = 15 # maximum distance in days of the year between a synthetic day and its source day
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+STEPS = {kind: dt.timedelta(days = 1) // step for kind, step in config.DATA_STEPS.items()} # time steps per day of the series
+
+def read_daily(path, kind) -> tuple:
+    """
+    Reads a series of the data folder as a matrix with one row per whole day
+    :param path: the data folder
+    :param kind: the name of the series, one of the keys of config.DATA_FILES
+    :return: the matrix and the dates of its rows
+    """
+
+    df = pd.read_csv(Path(path) / config.DATA_FILES[kind], sep=";")
+    series = pd.Series(df[config.DATA_COLUMNS[kind]].to_numpy(dtype = float), index = pd.to_datetime(df["Time"]))
+
+    # bring the series to a regular time grid, closing gaps and dropping repeated times (e.g. from daylight saving time)
+    series = series[~series.index.duplicated()]
+    step = dt.timedelta(days = 1) / STEPS[kind]
+    first = series.index[0].normalize()
+    days = (series.index[-1] + step - first) // dt.timedelta(days = 1)
+    grid = pd.date_range(first, periods = days * STEPS[kind], freq = step)
+    values = series.reindex(grid).interpolate(limit_direction = "both").to_numpy()
+
+    return (values.reshape(days, STEPS[kind]), grid[::STEPS[kind]])
+
+
+def source_days(source_dates, target_dates, rng) -> np.ndarray:
+    """
+    Draws a source day for every target day among the source days of the same season and day type
+    :param source_dates: the dates of the source days
+    :param target_dates: the dates of the synthetic days
+    :param rng: the random number generator
+    :return: the indices of the source days
+    """
+
+    source_doy = source_dates.dayofyear.to_numpy()
+    source_weekend = source_dates.dayofweek.to_numpy() >= 5
+    target_doy = target_dates.dayofyear.to_numpy()
+    target_weekend = target_dates.dayofweek.to_numpy() >= 5
+
+    chosen = np.empty(len(target_dates), dtype = np.int64)
+    for doy in np.unique(target_doy):
+        distance = np.abs(source_doy - doy)
+        distance = np.minimum(distance, 366 - distance)
+        for weekend in (False, True):
+            targets = np.flatnonzero((target_doy == doy) & (target_weekend == weekend))
+            if(len(targets) == 0):
+                continue
+            members = np.flatnonzero((distance <= SEASON_DAYS) & (source_weekend == weekend))
+            if(len(members) == 0):
+                members = np.flatnonzero(distance <= SEASON_DAYS)
+            chosen[targets] = members[rng.integers(len(members), size = len(targets))]
+    return chosen
+
+
+def generate(start, days, seed = 0, path = config.DATA_PATH) -> dict:
+    """
+    Generates synthetic series by bootstrapping the days of the data folder
+    :param start: the date of the first synthetic day
+    :param days: the number of synthetic days
+    :param seed: the seed of the generator
+    :param path: the data folder with the source series
+    :return: a dictionary with the names of the series as keys and one-dimensional arrays as values,
+    starting at midnight of the start date
+    """
+
+    daily = dict()
+    for kind in config.DATA_FILES:
+        daily[kind] = read_daily(path, kind)
+
+    # only days covered by all series can be drawn
+    common = daily["DA"][1]
+    for (_, dates) in daily.values():
+        common = common.intersection(dates)
+
+    target_dates = pd.date_range(pd.Timestamp(start).normalize(), periods = days, freq = "D")
+    chosen = common[source_days(common, target_dates, np.random.default_rng(seed))]
+
+    series = dict()
+    for kind, (values, dates) in daily.items():
+        series[kind] = values[dates.get_indexer(chosen)].ravel()
+    return series
+
+
+def write_csv(path, start, series) -> None:
+    """
+    Writes the series to a folder in the layout of the data folder
+    :param path: the output folder, created if it does not exist
+    :param start: the time of the first time step
+    :param series: the series as returned by generate
+    """
+
+    path = Path(path)
+    path.mkdir(parents = True, exist_ok = True)
+    for kind, values in series.items():
+        times = pd.date_range(start, periods = len(values), freq = dt.timedelta(days = 1) / STEPS[kind]).strftime(TIME_FORMAT)
+        if(kind in ("load", "pv")):
+            df = pd.DataFrame({"Time": times, config.DATA_COLUMNS[kind]: values})
+            df.to_csv(path / config.DATA_FILES[kind], sep=";")
+        else:
+            df = pd.DataFrame({config.DATA_COLUMNS[kind]: values, "Time": times})
+            df.to_csv(path / config.DATA_FILES[kind], sep=";", index = False)
+
+
+def write_store(store, start, series) -> None:
+    """
+    Writes the series to a data store, one series per name
+    :param store: the data store
+    :param start: the time of the first time step
+    :param series: the series as returned by generate
+    """
+
+    for kind, values in series.items():
+        store.write(kind, start, dt.timedelta(days = 1) / STEPS[kind], values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "generates synthetic price, load and pv series by bootstrapping the days of the data folder")
+    parser.add_argument("output", help = "output folder")
+    parser.add_argument("start", help = "date of the first day (YYYY-MM-DD)")
+    parser.add_argument("days", type = int, help = "number of days")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed of the generator")
+    parser.add_argument("--store", action = "store_true", help = "write a binary data store instead of CSV files")
+    args = parser.parse_args()
+
+    start = dt.datetime.strptime(args.start, "%Y-%m-%d")
+    series = generate(start, args.days, args.seed)
+    if(args.store): write_store(datastore.DataStore(args.output), start, series)
+    else: write_csv(args.output, start, series)
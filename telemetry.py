@@ -0,0 +1,206 @@
+import config
+
+import os
+import sys
+import json
+import time
+import datetime as dt
+from pathlib import Path
+
+# This file contains the progress telemetry of long runs and sweeps.
+# A Telemetry is attached to an agent (or passed to a sweep) and emits its state at a throttled interval:
+# one line to stderr and, if a folder is given, one record to a JSON-lines file or a Prometheus textfile in that folder.
+# The simulation loop only compares the step index with the next check index, the clock is read once per
+# config.TELEMETRY_CHECK_STEPS time steps, so that the overhead on the hot path is negligible.
+# Every process writes its own Prometheus textfile, so that the workers of a pool run can be monitored separately.
+#
+#   ag.telemetry = Telemetry("output/telemetry", fmt = "prometheus")
+#   ag.run()
+
+FORMATS = ["jsonl", "prometheus"]
+METRIC_PREFIX = "battery_sim_"
+
+def memory_bytes() -> int:
+    """
+    :return: the resident memory of the process, or its peak if the current value is not available
+    """
+
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource # only available on Unix, imported here so that the module can be imported on every platform
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 # kilobytes on Linux
+
+
+def format_duration(seconds) -> str:
+    """
+    :return: a duration as h:mm:ss, or "?" if unknown
+    """
+
+    if(seconds is None):
+        return "?"
+    return str(dt.timedelta(seconds = int(seconds)))
+
+
+class Telemetry():
+    """
+    Emits the progress of runs and sweeps at a throttled interval
+    """
+
+    def __init__(self, path = None, fmt = "jsonl", interval = config.TELEMETRY_INTERVAL, stream = sys.stderr, worker = None) -> None:
+        """
+        :param path: an optional folder for the machine-readable records, created if it does not exist
+        :param fmt: the format of the records, "jsonl" (appended to telemetry.jsonl, shared by all processes)
+        or "prometheus" (one textfile per process, replaced at every record)
+        :param interval: the minimum time between two records in seconds
+        :param stream: the stream for the human-readable lines, None to disable them
+        :param worker: the name of the process in the records, its process id if None
+        """
+
+        if(fmt not in FORMATS):
+            raise ValueError(f"unknown telemetry format {fmt}, available formats: {', '.join(FORMATS)}")
+
+        self.path = None if path is None else Path(path)
+        self.fmt = fmt
+        self.interval = interval
+        self.stream = stream
+        self.worker = str(os.getpid()) if worker is None else str(worker)
+        if(self.path is not None):
+            self.path.mkdir(parents = True, exist_ok = True)
+
+        self.next_index = 0 # step index at which the simulation loop calls report next
+        self.sweep = None # state of the current sweep, see progress
+
+    def start(self, sc) -> None:
+        """
+        Starts the telemetry of a run
+        :param sc: the scenario of the run
+        """
+
+        self.scenario = sc
+        self.next_index = 0
+        self.emitted = False
+        self.start_time = time.monotonic()
+        self.last_time = self.start_time
+        self.last_index = 0
+
+    def report(self, ag, index) -> None:
+        """
+        Called by the simulation loop when the step index reaches next_index, emits a record if the interval has passed
+        :param ag: the agent
+        :param index: the index of the current time step
+        """
+
+        self.next_index = index + config.TELEMETRY_CHECK_STEPS
+        now = time.monotonic()
+        if(now - self.last_time >= self.interval):
+            self.emit(self.runRecord(ag, index, now, "running"))
+
+    def finish(self, ag, status) -> None:
+        """
+        Ends the telemetry of a run. The final record is only emitted for runs that already emitted progress or failed,
+        so that sweeps of many short runs do not flood the output.
+        :param ag: the agent
+        :param status: "done" or "failed"
+        """
+
+        if(self.emitted or status == "failed"):
+            index = (ag.time - self.scenario.t_start) // self.scenario.t_delta
+            self.emit(self.runRecord(ag, index, time.monotonic(), status))
+
+    def runRecord(self, ag, index, now, status) -> dict:
+        """
+        :return: the record of the current state of a run
+        """
+
+        sc = self.scenario
+        steps = sc.number_of_intervals
+        elapsed = now - self.start_time
+        rate = (index - self.last_index) / (now - self.last_time) if now > self.last_time else 0.0
+        average = index / elapsed if elapsed > 0 else 0.0
+        self.last_time = now
+        self.last_index = index
+        self.emitted = True
+
+        violations = ag.violations
+        if(ag.pipeline is not None): # constraint violations found by the background pipeline so far
+            violations += ag.pipeline.violations
+
+        return {"kind": "run", "worker": self.worker, "name": sc.name, "status": status,
+                "time": dt.datetime.now().isoformat(timespec = "seconds"),
+                "simulated": (sc.t_start + sc.t_delta * index).isoformat(),
+                "step": int(index), "steps": steps, "progress": index / steps,
+                "slots_per_second": rate, "elapsed_seconds": elapsed,
+                "eta_seconds": (steps - index) / average if average > 0 else None,
+                "open_contracts": len(ag.contracts), "violations": violations, "memory_bytes": memory_bytes()}
+
+    def progress(self, name, done, total) -> None:
+        """
+        Reports the progress of a sweep, e.g. the number of finished evaluations, throttled like the runs
+        :param name: the name of the sweep or its current stage
+        :param done: the number of finished items
+        :param total: the total number of items
+        """
+
+        now = time.monotonic()
+        if(self.sweep is None or self.sweep[0] != name):
+            self.sweep = (name, now, now - self.interval) # the first progress of a stage is emitted at once
+        (_, start, last) = self.sweep
+        if(now - last < self.interval and done < total):
+            return
+        self.sweep = (name, start, now)
+
+        elapsed = now - start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.emit({"kind": "sweep", "worker": self.worker, "name": name, "status": "done" if done >= total else "running",
+                   "time": dt.datetime.now().isoformat(timespec = "seconds"),
+                   "done": done, "total": total, "progress": done / total if total > 0 else 1.0,
+                   "items_per_second": rate, "elapsed_seconds": elapsed,
+                   "eta_seconds": (total - done) / rate if rate > 0 else None, "memory_bytes": memory_bytes()})
+
+    def emit(self, record) -> None:
+        """
+        Writes a record to the stream and the telemetry folder
+        """
+
+        if(self.stream is not None):
+            self.stream.write(self.line(record) + "\n")
+            self.stream.flush()
+
+        if(self.path is None):
+            return
+        if(self.fmt == "jsonl"):
+            with open(self.path / "telemetry.jsonl", "a") as f: # single appends of whole lines, shared by all processes
+                f.write(json.dumps(record) + "\n")
+        else:
+            target = self.path / f"worker_{self.worker}.prom"
+            temporary = target.with_suffix(".prom.tmp")
+            temporary.write_text(self.prometheus(record))
+            os.replace(temporary, target) # scrapers never see a partially written file
+
+    def line(self, record) -> str:
+        """
+        :return: the human-readable line of a record
+        """
+
+        memory = record["memory_bytes"] / 2**20
+        if(record["kind"] == "run"):
+            return (f"[{record['worker']}] {record['name']} {record['status']}: {100 * record['progress']:.1f}% at {record['simulated']}, "
+                    f"{record['slots_per_second']:.0f} slots/s, ETA {format_duration(record['eta_seconds'])}, "
+                    f"{record['open_contracts']} open contracts, {record['violations']} violations, {memory:.0f} MB")
+        return (f"[{record['worker']}] {record['name']} {record['status']}: {record['done']}/{record['total']}, "
+                f"{record['items_per_second']:.2f}/s, ETA {format_duration(record['eta_seconds'])}, {memory:.0f} MB")
+
+    def prometheus(self, record) -> str:
+        """
+        :return: a record in the Prometheus text exposition format, with one gauge per numeric field
+        """
+
+        labels = f'kind="{record["kind"]}",worker="{record["worker"]}",name="{record["name"]}"'
+        lines = [f'{METRIC_PREFIX}status{{{labels},status="{record["status"]}"}} 1',
+                 f"{METRIC_PREFIX}updated_timestamp_seconds{{{labels}}} {time.time():.3f}"]
+        for key, value in record.items():
+            if(isinstance(value, (int, float)) and not isinstance(value, bool)):
+                lines.append(f"{METRIC_PREFIX}{key}{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# The tests import the modules of the program from the top level of the repository, run them with
+#   python -m pytest tests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,31 @@
+import agent
+import scenario
+
+import pandas as pd
+import pytest
+
+def run(sc) -> agent.Agent:
+    ag = agent.Agent(sc)
+    ag.run()
+    return ag
+
+
+@pytest.mark.parametrize("settings", [dict(), dict(battery_charge_min = 25, battery_charge_max = 15),
+                                      dict(battery_charge_init = 20, battery_charge_max = 15), dict(ic_order_book = True)])
+def test_fast_forward_is_identical_to_step_by_step(settings):
+    sc = scenario.Scenario("scenario_test").variant("ff", **settings)
+    reference = run(sc.variant("ff", fast_forward = False))
+    ag = run(sc.variant("ff", fast_forward = True))
+    pd.testing.assert_frame_equal(reference.log_pd, ag.log_pd, check_exact = True)
+    pd.testing.assert_frame_equal(reference.action_log, ag.action_log, check_exact = True)
+    pd.testing.assert_frame_equal(reference.violation_log, ag.violation_log, check_exact = True)
+    assert reference.violations == ag.violations
+
+
+def test_violation_texts_format_ints_and_floats_alike():
+    sc = scenario.Scenario("scenario_test")
+    time = sc.t_start
+    (_, rows) = agent.check_step(sc, 3, time, -1, 0, 0, 0, 0, 0, 5, 0)
+    (_, float_rows) = agent.check_step(sc, 3, time, -1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 5.0, 0.0)
+    assert rows == float_rows
+    assert rows[0] == [time, "3: non-negativity charge: -1.0"]
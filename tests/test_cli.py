@@ -0,0 +1,34 @@
+import session
+import scenario
+import config
+
+import sys
+import json
+import subprocess
+import pytest
+
+def run_cli(*arguments, check = "") -> subprocess.CompletedProcess:
+    """
+    Runs the command line interface in a fresh interpreter, so that the imported modules can be inspected afterwards
+    :param arguments: the command line arguments
+    :param check: Python code executed after the command, e.g. assertions on sys.modules
+    """
+
+    code = f"import sys, cli\ntry:\n    cli.main({list(arguments)!r})\nexcept SystemExit:\n    pass\n{check}"
+    return subprocess.run([sys.executable, "-c", code], cwd = config.ROOT_PATH, capture_output = True, text = True, check = True)
+
+
+def test_run_without_plots_does_not_import_matplotlib():
+    process = run_cli("run", "scenario_test", "--no-plots", "--quiet", "--logs", "none", "--output-format", "json",
+                      check = "assert 'matplotlib' not in sys.modules, 'matplotlib imported'")
+    assert process.stderr == ""
+    row = json.loads(process.stdout)
+    result = session.Session().run(scenario.Scenario("scenario_test"))
+    assert row["scenario"] == "scenario_test"
+    assert row["net_revenue"] == pytest.approx(result.kpis["net_revenue"])
+    assert row["violations"] == result.violations
+
+
+def test_help_does_not_import_pandas():
+    process = run_cli("--help", check = "assert 'pandas' not in sys.modules, 'pandas imported'")
+    assert "run" in process.stdout and "sweep" in process.stdout
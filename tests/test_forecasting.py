@@ -0,0 +1,62 @@
+import forecasting
+import session
+import scenario
+import agent
+
+import numpy as np
+import pandas as pd
+import pytest
+
+def same(a, b) -> None:
+    pd.testing.assert_frame_equal(a.log, b.log, check_exact = True)
+    pd.testing.assert_frame_equal(a.actions, b.actions, check_exact = True)
+    pd.testing.assert_frame_equal(a.violation_log, b.violation_log, check_exact = True)
+    assert a.violations == b.violations
+
+
+def test_zero_errors_reproduce_perfect_foresight():
+    sc = scenario.Scenario("scenario_test")
+    reference = agent.Agent(sc)
+    reference.run()
+    ag = agent.Agent(sc)
+    ag.forecast_errors = forecasting.generate(sc, 1, 3)[0] # the forecasts are revised and settled with errors of zero size
+    ag.run()
+    pd.testing.assert_frame_equal(reference.log_pd, ag.log_pd, check_exact = True)
+    pd.testing.assert_frame_equal(reference.action_log, ag.action_log, check_exact = True)
+    assert reference.violations == ag.violations == 0
+
+
+def test_first_ensemble_member_equals_a_single_run_with_the_same_seed():
+    sc = scenario.Scenario("scenario_test").variant("uncertain", forecast_error_pv = 0.3, forecast_error_load = 0.2)
+    s = session.Session()
+    members = s.runEnsemble(sc, 3, seed = 7)
+    same(members[0], s.run(sc.variant("uncertain", forecast_error_seed = 7)))
+    assert members[1].kpis["net_revenue"] != members[0].kpis["net_revenue"]
+
+    summary = forecasting.summary(members)
+    assert summary["net_revenue"]["mean"] == pytest.approx(np.mean([m.kpis["net_revenue"] for m in members]))
+
+    with pytest.raises(ValueError):
+        s.runEnsemble(scenario.Scenario("scenario_test"), 3)
+
+
+@pytest.mark.parametrize("n", [1, 200, 1000])
+def test_members_do_not_depend_on_the_ensemble_size(n):
+    pair = forecasting.ar1_series(np.random.default_rng(3), 2, n, 0.8)
+    for count in (1, 5, 40):
+        np.testing.assert_array_equal(forecasting.ar1_series(np.random.default_rng(3), count, n, 0.8)[:2], pair[:count])
+
+
+def test_error_series_are_standard_normal_and_correlated():
+    z = forecasting.ar1_series(np.random.default_rng(0), 4, 50000, 0.9)
+    assert np.abs(z.mean(axis = 1)).max() < 0.1
+    np.testing.assert_allclose(z.std(axis = 1), 1, atol = 0.05)
+    lag = [np.corrcoef(row[:-1], row[1:])[0, 1] for row in z]
+    np.testing.assert_allclose(lag, 0.9, atol = 0.01)
+
+    # the recursion z[t] = phi * z[t-1] + sqrt(1 - phi^2) * e[t] across the block boundaries
+    rng = np.random.default_rng(1)
+    z = forecasting.ar1_series(rng, 2, 600, 0.5)
+    e = np.random.default_rng(1).standard_normal((2, 600))
+    np.testing.assert_allclose(z[:, 1:], 0.5 * z[:, :-1] + np.sqrt(0.75) * e[:, 1:], atol = 1e-12)
+    np.testing.assert_allclose(z[:, 0], e[:, 0])
@@ -0,0 +1,131 @@
+import ingest
+import datastore
+import config
+
+import datetime as dt
+import numpy as np
+import pandas as pd
+import pytest
+
+QUARTER = dt.timedelta(minutes = 15)
+
+def write_day(path, kind, times, values) -> None:
+    """
+    Writes a file of the data folder format with the given rows
+    """
+
+    pd.DataFrame({"Time": pd.DatetimeIndex(times).strftime("%Y-%m-%d %H:%M:%S"), config.DATA_COLUMNS[kind]: values}).to_csv(path, sep = ";", index = False)
+
+
+def quarter_hours(date, periods = 96) -> pd.DatetimeIndex:
+    return pd.date_range(date, periods = periods, freq = QUARTER)
+
+
+def test_regular_day(tmp_path):
+    values = np.arange(96, dtype = float)
+    write_day(tmp_path / "load.csv", "load", quarter_hours("2022-01-05"), values)
+    (date, read) = ingest.read_day(tmp_path / "load.csv", "load")
+    assert date == dt.date(2022, 1, 5)
+    np.testing.assert_array_equal(read, values)
+
+
+def test_short_gaps_are_interpolated_and_long_gaps_rejected(tmp_path):
+    values = np.arange(96, dtype = float)
+    values[10:12] = np.nan
+    write_day(tmp_path / "load.csv", "load", quarter_hours("2022-01-05"), values)
+    (_, read) = ingest.read_day(tmp_path / "load.csv", "load")
+    np.testing.assert_allclose(read, np.arange(96))
+
+    values[10:10 + config.INGEST_MAX_GAP + 1] = np.nan
+    write_day(tmp_path / "load.csv", "load", quarter_hours("2022-01-05"), values)
+    with pytest.raises(ValueError, match = "consecutive missing values"):
+        ingest.read_day(tmp_path / "load.csv", "load")
+
+
+def test_missing_rows_are_rejected(tmp_path):
+    times = quarter_hours("2022-01-05").delete(40)
+    write_day(tmp_path / "load.csv", "load", times, np.ones(95))
+    with pytest.raises(ValueError, match = "95 rows, expected 96, first missing time 2022-01-05 10:00"):
+        ingest.read_day(tmp_path / "load.csv", "load")
+
+
+def test_days_of_the_daylight_saving_time_changes(tmp_path):
+    # 92 quarter-hours on the change to daylight saving time, the missing hour has no energy
+    spring = ingest.local_times("2022-03-27", QUARTER)
+    assert len(spring) == 92
+    write_day(tmp_path / "load.csv", "load", spring, np.ones(92))
+    (_, read) = ingest.read_day(tmp_path / "load.csv", "load")
+    assert len(read) == 96
+
+    # 100 quarter-hours on the change back, the energy of the repeated hour is summed up
+    autumn = ingest.local_times("2022-10-30", QUARTER)
+    assert len(autumn) == 100
+    write_day(tmp_path / "load.csv", "load", autumn, np.ones(100))
+    (_, read) = ingest.read_day(tmp_path / "load.csv", "load")
+    assert len(read) == 96
+    assert read[8:12].tolist() == [2, 2, 2, 2] # 02:00 to 02:45
+    assert read.sum() == 100
+
+
+@pytest.mark.parametrize("date, periods", [("2022-01-05", 92), ("2022-01-05", 100), ("2022-03-27", 100), ("2022-10-30", 92)])
+def test_daylight_saving_time_row_counts_on_other_days_are_rejected(tmp_path, date, periods):
+    times = ingest.local_times("2022-03-27", QUARTER) if periods == 92 else ingest.local_times("2022-10-30", QUARTER)
+    times = pd.Timestamp(date) + (times - times[0].normalize())
+    write_day(tmp_path / "load.csv", "load", times, np.ones(periods))
+    with pytest.raises(ValueError):
+        ingest.read_day(tmp_path / "load.csv", "load")
+
+
+def test_a_day_split_across_files_is_rejected(tmp_path):
+    # the second half of a day together with the first half of the next one
+    write_day(tmp_path / "load.csv", "load", quarter_hours("2022-01-05 12:00"), np.ones(96))
+    with pytest.raises(ValueError, match = "more than one day"):
+        ingest.read_day(tmp_path / "load.csv", "load")
+
+    # only the first half of a day
+    write_day(tmp_path / "load.csv", "load", quarter_hours("2022-01-05", 48), np.ones(48))
+    with pytest.raises(ValueError, match = "48 rows, expected 96"):
+        ingest.read_day(tmp_path / "load.csv", "load")
+
+
+def write_weather(path, date) -> None:
+    """
+    Writes the temperature and radiation files of a day in the format of the weather folder
+    """
+
+    hours = pd.date_range(date, periods = 24, freq = "h")
+    radiation = np.clip(np.sin(np.pi * (np.arange(24) - 6) / 12), 0, None) * 100
+    pd.DataFrame({"MESS_DATUM": hours.strftime("%Y%m%d%H"), "TT_TU": 10.0}).to_csv(path / ingest.WEATHER_FILES["temperature"], sep = ";", index = False)
+    pd.DataFrame({"MESS_DATUM": hours.strftime("%Y%m%d%H:16"), "FG_LBERG": radiation}).to_csv(path / ingest.WEATHER_FILES["radiation"], sep = ";", index = False)
+
+
+def test_drops_are_appended_and_skipped_when_ingested_again(tmp_path):
+    store = datastore.DataStore(tmp_path / "store")
+    for day, date in enumerate(("2022-01-05", "2022-01-06")):
+        drop = tmp_path / date
+        drop.mkdir()
+        write_day(drop / config.DATA_FILES["load"], "load", quarter_hours(date), np.full(96, day + 1.0))
+        write_weather(drop, date)
+        assert ingest.ingest_drop(store, drop) == {"load": 96, "pv": 96, config.PV_NODES: 24}
+
+    assert ingest.ingest_drop(store, drop) == {"load": 0, config.PV_NODES: 0, "pv": 0}
+    assert store.end("load") == dt.datetime(2022, 1, 7)
+    np.testing.assert_array_equal(store.read("load"), np.repeat([1.0, 2.0], 96))
+    assert len(store.read("pv")) == 192
+
+
+def test_nothing_is_written_if_the_pv_series_cannot_be_derived(tmp_path):
+    store = datastore.DataStore(tmp_path / "store")
+    start = dt.datetime(2022, 1, 5)
+    store.write("load", start, QUARTER, np.ones(96))
+    store.write(config.PV_NODES, start, dt.timedelta(hours = 1), np.ones(24))
+    store.write("pv", start, dt.timedelta(hours = 1), np.ones(24)) # an hourly pv series
+
+    drop = tmp_path / "2022-01-06"
+    drop.mkdir()
+    write_day(drop / config.DATA_FILES["load"], "load", quarter_hours("2022-01-06"), np.ones(96))
+    write_weather(drop, "2022-01-06")
+    with pytest.raises(ValueError, match = "deriving it needs quarter-hours"):
+        ingest.ingest_drop(store, drop)
+    assert store.end("load") == dt.datetime(2022, 1, 6)
+    assert store.end(config.PV_NODES) == dt.datetime(2022, 1, 6)
@@ -0,0 +1,94 @@
+import kernels
+import scenario
+import session
+
+import numpy as np
+import pandas as pd
+import pytest
+
+BACKENDS = ["numpy"] + (["numba"] if kernels.NUMBA else [])
+
+# (first, stop) of the forecast steps in a ring buffer of length 10: within the buffer, across its end,
+# the whole buffer from an offset, a single step and empty ranges
+RANGES = [(2, 7), (7, 13), (4, 14), (3, 4), (5, 5), (6, 3)]
+LENGTH = 10
+
+@pytest.fixture(params = BACKENDS)
+def backend(request):
+    return kernels.load(request.param)
+
+
+def buffers(seed) -> tuple:
+    rng = np.random.default_rng(seed)
+    return (rng.normal(size = LENGTH), rng.uniform(0, 10, size = LENGTH))
+
+
+@pytest.mark.parametrize("first, stop", RANGES)
+def test_min_surplus(backend, first, stop):
+    (surplus_agg, battery) = buffers(first)
+    assert backend.min_surplus(surplus_agg, battery, first, stop, LENGTH) == kernels.min_surplus_loop(surplus_agg, battery, first, stop, LENGTH)
+
+
+@pytest.mark.parametrize("first, stop", RANGES)
+def test_update(backend, first, stop):
+    (surplus_agg, battery) = buffers(first)
+    (expected_surplus, expected_battery) = (surplus_agg.copy(), battery.copy())
+    kernels.update_loop(expected_surplus, expected_battery, first, stop, LENGTH, 0.3, -1.7)
+    backend.update(surplus_agg, battery, first, stop, LENGTH, 0.3, -1.7)
+    np.testing.assert_array_equal(surplus_agg, expected_surplus)
+    np.testing.assert_array_equal(battery, expected_battery)
+
+
+def contracts() -> kernels.ContractBook:
+    book = kernels.ContractBook(capacity = 2)
+    for (step, quantity) in [(5, 1.5), (3, 0.1), (5, 0.2), (7, 2.0), (5, 0.7), (2, 1.1)]:
+        book.append(step, quantity)
+    return book
+
+
+@pytest.mark.parametrize("step", [1, 2, 5, 7])
+def test_contract_surplus(backend, step):
+    book = contracts()
+    expected = kernels.contract_surplus_loop(3.3, book.steps, book.quantities, book.count, step)
+    assert backend.contract_surplus(3.3, book.steps, book.quantities, book.count, step) == expected
+
+
+@pytest.mark.parametrize("step", [1, 3, 5, 7])
+def test_due_contracts(backend, step):
+    book = contracts()
+    expected = kernels.due_contracts_loop(book.steps, book.count, step)
+    np.testing.assert_array_equal(backend.due_contracts(book.steps, book.count, step), expected)
+
+
+def test_contract_book_grows_and_removes_in_order():
+    book = contracts()
+    assert book.count == 6
+    assert len(book.steps) >= 6
+    assert book.steps[:book.count].tolist() == [5, 3, 5, 7, 5, 2]
+
+    book.remove(np.array([0, 4]))
+    assert book.steps[:book.count].tolist() == [3, 5, 7, 2]
+    assert book.quantities[:book.count].tolist() == [0.1, 0.2, 2.0, 1.1]
+    book.remove(np.array([], dtype = np.int64))
+    assert book.count == 4
+
+    book.append(9, 3.0)
+    assert book.steps[:book.count].tolist() == [3, 5, 7, 2, 9]
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError, match = "unknown kernel backend"):
+        kernels.resolve("fortran")
+    assert kernels.load("python") is None
+
+
+@pytest.mark.parametrize("name", BACKENDS)
+@pytest.mark.parametrize("settings", [dict(), dict(ic_order_book = True, min_offer_quantity = 0.5)])
+def test_runs_are_identical_to_the_reference_implementation(name, settings):
+    s = session.Session()
+    sc = scenario.Scenario("scenario_test").variant("kernels", **settings)
+    reference = s.run(sc)
+    result = s.run(sc.variant("kernels", kernels = name))
+    pd.testing.assert_frame_equal(reference.log, result.log, check_exact = True)
+    pd.testing.assert_frame_equal(reference.actions, result.actions, check_exact = True)
+    pd.testing.assert_frame_equal(reference.violation_log, result.violation_log, check_exact = True)
@@ -0,0 +1,36 @@
+import loadprofiles
+import config
+
+import numpy as np
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def base():
+    # eight weeks and a half day of a daily pattern with some noise, starting at midnight
+    times = pd.date_range("2022-01-31", periods = 56 * 96 + 48, freq = "15min").to_numpy()
+    rng = np.random.default_rng(0)
+    load = 0.2 + 0.1 * np.sin(np.arange(len(times)) * 2 * np.pi / 96) ** 2 + rng.uniform(0, 0.05, len(times))
+    return (load, times)
+
+
+@pytest.mark.parametrize("n", [1, 7, 12])
+def test_aggregate_load_is_the_sum_of_the_profiles(base, monkeypatch, n):
+    monkeypatch.setattr(config, "PROFILE_BATCH", 5) # several batches, the last one incomplete
+    (load, times) = base
+    profiles = loadprofiles.generate_profiles(load, times, n, seed = 2)
+    assert profiles.shape == (n, len(load))
+    np.testing.assert_allclose(loadprofiles.aggregate_load(load, times, n, seed = 2), profiles.sum(axis = 0), rtol = 1e-12)
+
+
+def test_profiles_are_seeded_and_distinct(base):
+    (load, times) = base
+    profiles = loadprofiles.generate_profiles(load, times, 4, seed = 1)
+    np.testing.assert_array_equal(profiles, loadprofiles.generate_profiles(load, times, 4, seed = 1))
+    assert not np.array_equal(profiles, loadprofiles.generate_profiles(load, times, 4, seed = 2))
+    assert len(np.unique(profiles[:, :96], axis = 0)) == 4
+    assert (profiles >= 0).all()
+
+    # the time steps after the last whole day keep the base profile, scaled with the level of the household
+    level = profiles[:, -48:] / load[-48:]
+    np.testing.assert_allclose(level, level[:, :1] * np.ones(48))
@@ -0,0 +1,80 @@
+import optimizer
+import scenario
+import session
+
+import itertools
+import numpy as np
+import pytest
+
+(BATTERY_MIN, BATTERY_MAX, BATTERY_START) = (1.0, 4.0, 2.5)
+(RESIDENTIAL, FEEDIN, MIN_OFFER) = (0.3, 0.05, 0.5)
+
+def problem(seed, n = 6) -> tuple:
+    rng = np.random.default_rng(seed)
+    pv = rng.uniform(0, 3, n)
+    load = rng.uniform(0, 2, n)
+    prices = {m: rng.uniform(-0.05, 0.4, n) for m in optimizer.MARKETS}
+    available = {m: rng.random(n) < 0.6 for m in optimizer.MARKETS}
+    return (pv, load, prices, available)
+
+
+def revenue(pv, load, prices, available, battery) -> float:
+    """
+    :return: the revenue of the time steps from 1 on for the given battery states after each time step
+    """
+
+    total = 0.0
+    for k in range(1, len(pv)):
+        surplus = pv[k] - load[k] - (battery[k] - battery[k - 1])
+        best = max((prices[m][k] for m in optimizer.MARKETS if available[m][k]), default = -np.inf)
+        if(surplus < 0):
+            total += surplus * RESIDENTIAL
+        elif(surplus >= MIN_OFFER and best > FEEDIN):
+            total += surplus * best
+        else:
+            total += surplus * FEEDIN
+    return total
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_schedule_is_optimal_on_a_short_horizon(seed):
+    (pv, load, prices, available) = problem(seed)
+    levels = 4
+    schedule = optimizer.optimize_schedule(pv, load, prices, available, MIN_OFFER, BATTERY_MIN, BATTERY_MAX, BATTERY_START,
+                                           RESIDENTIAL, FEEDIN, levels)
+
+    # all sequences of discrete battery states after the time steps 1 to n - 1
+    state = np.linspace(BATTERY_MIN, BATTERY_MAX, levels)
+    best = max(revenue(pv, load, prices, available, [BATTERY_START] + [state[b] for b in path])
+               for path in itertools.product(range(levels), repeat = len(pv) - 1))
+
+    assert schedule["revenue"] == pytest.approx(best)
+    assert schedule["revenue"] == pytest.approx(revenue(pv, load, prices, available, schedule["battery"]))
+    assert schedule["battery"][0] == BATTERY_START
+    assert ((schedule["battery"][1:] >= BATTERY_MIN) & (schedule["battery"][1:] <= BATTERY_MAX)).all()
+
+    # the surplus is sold on an available market with the best price only
+    for k in np.flatnonzero(schedule["market"] >= 0):
+        market = optimizer.MARKETS[schedule["market"][k]]
+        assert available[market][k]
+        assert schedule["surplus"][k] >= MIN_OFFER
+        assert schedule["price"][k] == max(prices[m][k] for m in optimizer.MARKETS if available[m][k])
+
+
+def test_segments_do_not_look_beyond_the_cut():
+    (pv, load, prices, available) = problem(7, n = 8)
+    full = optimizer.optimize_schedule(pv, load, prices, available, MIN_OFFER, BATTERY_MIN, BATTERY_MAX, BATTERY_START,
+                                       RESIDENTIAL, FEEDIN, 4)
+    rolled = optimizer.optimize_schedule(pv, load, prices, available, MIN_OFFER, BATTERY_MIN, BATTERY_MAX, BATTERY_START,
+                                         RESIDENTIAL, FEEDIN, 4, segments = [4])
+    assert rolled["revenue"] <= full["revenue"] + 1e-12
+    assert ((rolled["battery"][1:] >= BATTERY_MIN) & (rolled["battery"][1:] <= BATTERY_MAX)).all()
+
+
+@pytest.mark.parametrize("rolling", [False, True])
+def test_optimizer_runs_respect_the_battery_limits(rolling):
+    sc = scenario.Scenario("scenario_test").variant("o", policy = "optimizer", optimizer_rolling = rolling, t_end = "2022-07-04 00:00")
+    result = session.Session().run(sc)
+    assert result.violations == 0
+    battery = result.log["battery_charge"].to_numpy()
+    assert (battery >= sc.battery_charge_min).all() and (battery <= sc.battery_charge_max).all()
@@ -0,0 +1,83 @@
+import orderbook
+
+import pickle
+import numpy as np
+import pytest
+
+def test_price_time_priority():
+    book = orderbook.OrderBook()
+    book.add("sell", 0.30, 1.0, "a")
+    book.add("sell", 0.20, 1.0, "b")
+    book.add("sell", 0.20, 1.0, "c")
+    book.add("sell", 0.10, 0.5, "d")
+
+    fills = book.submit("buy", 0.25, 2.0, "agent")
+    assert fills == [orderbook.Fill("agent", "d", 0.10, 0.5), orderbook.Fill("agent", "b", 0.20, 1.0), orderbook.Fill("agent", "c", 0.20, 0.5)]
+    assert book.depth("sell") == pytest.approx(1.5)
+
+
+def test_sell_orders_match_the_highest_bids_at_their_prices():
+    book = orderbook.OrderBook()
+    book.addMany("buy", [0.10, 0.30, 0.20], [1.0, 1.0, 1.0], "market")
+    fills = book.submit("sell", 0.15, 5.0, "agent")
+    assert [(f.buyer, f.seller, f.price, f.quantity) for f in fills] == [("market", "agent", 0.30, 1.0), ("market", "agent", 0.20, 1.0)]
+    assert book.depth("buy") == 1.0
+
+
+def test_partial_fills_and_resting_orders():
+    book = orderbook.OrderBook()
+    book.add("buy", 0.20, 3.0, "market")
+    assert book.submit("sell", 0.20, 1.0, "a") == [orderbook.Fill("market", "a", 0.20, 1.0)]
+    assert book.depth("buy") == 2.0
+
+    # the unfilled quantity is cancelled unless it rests in the book
+    assert book.submit("sell", 0.25, 1.0, "b") == []
+    assert book.depth("sell") == 0
+    assert book.submit("sell", 0.15, 3.0, "c", rest = True) == [orderbook.Fill("market", "c", 0.20, 2.0)]
+    assert book.depth("buy") == 0
+    assert book.depth("sell") == 1.0
+    assert book.submit("buy", 0.15, 2.0, "d") == [orderbook.Fill("d", "c", 0.15, 1.0)]
+
+
+def test_orders_added_at_once_arrive_before_later_ones():
+    book = orderbook.OrderBook()
+    book.add("sell", 0.20, 1.0, "first")
+    book.addMany("sell", [0.20, 0.20], [1.0, 1.0], "many")
+    book.add("sell", 0.20, 1.0, "last")
+    fills = book.submit("buy", 0.20, 4.0, "agent")
+    assert [f.seller for f in fills] == ["first", "many", "many", "last"]
+
+
+def test_pickled_books_keep_their_arrival_order():
+    book = orderbook.OrderBook()
+    book.addMany("sell", [0.20, 0.20], [1.0, 1.0], "early")
+    copy = pickle.loads(pickle.dumps(book))
+    assert copy.next_arrival == book.next_arrival == 2
+    for b in (book, copy):
+        b.add("sell", 0.20, 1.0, "late")
+    assert copy.submit("buy", 0.20, 3.0, "agent") == book.submit("buy", 0.20, 3.0, "agent")
+    assert book.next_arrival == 3
+
+
+def test_intraday_books_are_seeded_and_filled_lazily():
+    prices = np.linspace(0.1, 0.3, 200)
+    books = orderbook.IntradayOrderBooks(prices, seed = 3, orders = 10, depth = 5)
+    assert len(books.books) == 0
+
+    book = books.get(50)
+    assert list(books.books) == [50]
+    assert book.depth("buy") == pytest.approx(5) and book.depth("sell") == pytest.approx(5)
+    assert all(order[3] < prices[50] for order in book.bids)
+    assert all(order[3] > prices[50] for order in book.asks)
+
+    # the liquidity of a time step does not depend on the order of access
+    other = orderbook.IntradayOrderBooks(prices, seed = 3, orders = 10, depth = 5)
+    other.get(10)
+    assert sorted(other.get(50).asks) == sorted(book.asks)
+    different = orderbook.IntradayOrderBooks(prices, seed = 4, orders = 10, depth = 5)
+    assert sorted(different.get(50).asks) != sorted(book.asks)
+
+    fills = books.submit(50, "sell", 0.0, 1.0, "agent")
+    assert sum(f.quantity for f in fills) == pytest.approx(1.0)
+    books.release(50)
+    assert len(books.books) == 0
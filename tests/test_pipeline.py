@@ -0,0 +1,58 @@
+import pipeline
+import agent
+import scenario
+import logstore
+
+import pandas as pd
+import pytest
+
+def run(sc, log_store = None) -> agent.Agent:
+    ag = agent.Agent(sc)
+    ag.log_store = log_store
+    ag.run()
+    return ag
+
+
+@pytest.mark.parametrize("settings", [dict(), dict(battery_charge_min = 25, battery_charge_max = 15),
+                                      dict(fast_forward = False), dict(ic_order_book = True)])
+def test_logs_are_identical_with_and_without_the_pipeline(settings):
+    sc = scenario.Scenario("scenario_test").variant("p", **settings)
+    reference = run(sc.variant("p", log_pipeline = False))
+    ag = run(sc.variant("p", log_pipeline = True))
+    pd.testing.assert_frame_equal(reference.log_pd, ag.log_pd, check_exact = True)
+    pd.testing.assert_frame_equal(reference.action_log, ag.action_log, check_exact = True)
+    pd.testing.assert_frame_equal(reference.violation_log, ag.violation_log, check_exact = True)
+    assert reference.violations == ag.violations
+
+
+def test_stored_logs_are_identical_with_and_without_the_pipeline(tmp_path):
+    sc = scenario.Scenario("scenario_test").variant("p", battery_charge_min = 25, battery_charge_max = 15)
+    for log_pipeline in (False, True):
+        variant = sc.variant("p", log_pipeline = log_pipeline)
+        run(variant, logstore.LogStore(tmp_path / str(log_pipeline), variant))
+    for kind in logstore.SCHEMAS:
+        reference = logstore.load_log(tmp_path / "False" / kind)
+        pd.testing.assert_frame_equal(reference, logstore.load_log(tmp_path / "True" / kind), check_exact = True)
+    assert len(logstore.load_log(tmp_path / "True" / "violations")) > 0
+
+
+def test_a_failure_of_the_worker_stops_the_run(monkeypatch):
+    def failing(*args):
+        raise RuntimeError("check failed")
+    monkeypatch.setattr(agent, "check_step", failing) # only called by the worker for invalid time steps
+    sc = scenario.Scenario("scenario_test").variant("p", battery_charge_min = 25, battery_charge_max = 15, log_pipeline = True)
+    with pytest.raises(RuntimeError, match = "check failed"):
+        run(sc)
+
+
+def test_a_failed_worker_does_not_block_the_simulation(monkeypatch):
+    def failing(self, block):
+        raise RuntimeError("worker failed")
+    monkeypatch.setattr(pipeline.LogPipeline, "process", failing)
+    p = pipeline.LogPipeline(scenario.Scenario("scenario_test"), block_size = 1, blocks = 1)
+    with pytest.raises(RuntimeError, match = "worker failed"):
+        for index in range(100): # more blocks than the queue holds
+            p.push((index,) + (0,) * (len(pipeline.RECORD_FIELDS) - 1))
+    with pytest.raises(RuntimeError, match = "worker failed"):
+        p.close()
+    assert not p.thread.is_alive()
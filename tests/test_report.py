@@ -0,0 +1,68 @@
+import report
+import resultstore
+import logstore
+import scenario
+import session
+import config
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+# two short runs at different minimum offer quantities and asset levels
+VARIANTS = {"report_large": {"min-offer-quantity": 100, "battery-charge-max": 100},
+            "report_small": {"min-offer-quantity": 1, "battery-charge-max": 50}}
+
+@pytest.fixture(scope = "module")
+def runs(tmp_path_factory):
+    path = tmp_path_factory.mktemp("report")
+    with open(config.SCENARIO_PATH / "scenario_test.json") as f:
+        base = json.load(f)
+    (path / "scenarios").mkdir()
+    for name, values in VARIANTS.items():
+        with open(path / "scenarios" / f"{name}.json", "w") as f:
+            json.dump(dict(base, **values, **{"t-end": "2022-07-03 00:00"}), f)
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(config, "SCENARIO_PATH", path / "scenarios")
+        results = dict()
+        with resultstore.ResultStore(path / "results.db") as store:
+            for name in VARIANTS:
+                sc = scenario.Scenario(name)
+                results[name] = session.Session().run(sc, logstore.LogStore(path / "output" / name, sc))
+                store.addResult(results[name])
+        from_logs = report.load_logs(list(VARIANTS), path / "output")
+    with resultstore.ResultStore(path / "results.db") as store:
+        from_store = report.load_store(store)
+    return (results, from_logs, from_store, path)
+
+
+def test_logs_and_store_give_the_same_summary(runs):
+    (results, from_logs, from_store, _) = runs
+    from_store = from_store.set_index("name").loc[from_logs["name"]].reset_index()
+    for col in ["min_offer_quantity", "battery_charge_max", "asset_level"]:
+        assert from_logs[col].tolist() == from_store[col].tolist()
+    for col in report.REVENUES + ["costs_grid", "net_revenue", "pv", "load", "grid_demand", "grid_supply", "self_consumption", "self_sufficiency"]:
+        np.testing.assert_allclose(from_logs[col], from_store[col], rtol = 1e-5) # the logs are stored as float32
+    for name, row in from_logs.set_index("name").iterrows():
+        assert row["net_revenue"] == pytest.approx(results[name].kpis["net_revenue"], rel = 1e-5)
+
+
+def test_report_groups_the_runs_by_min_offer_quantity_and_asset_level(runs):
+    (results, summary, _, path) = runs
+    files = report.build_report(summary, path / "report")
+    assert [f.name for f in files] == ["summary.csv", "aggregates.csv", "net_revenue.png", "self_consumption.png", "revenue_by_market.png"]
+    assert all(f.stat().st_size > 0 for f in files)
+
+    # the asset levels are ordered by size, the runs are on the diagonal
+    small = report.asset_level(50, 45, 5)
+    large = report.asset_level(100, 45, 5)
+    expected = pd.DataFrame([[results["report_small"].kpis["net_revenue"], np.nan], [np.nan, results["report_large"].kpis["net_revenue"]]],
+                            index = pd.Index([1, 100], name = "min_offer_quantity"), columns = pd.Index([small, large], name = "asset_level"))
+    table = report.grouped(summary, "net_revenue")
+    pd.testing.assert_frame_equal(table, expected, check_dtype = False, check_index_type = False, rtol = 1e-5)
+
+    with open(path / "report" / "aggregates.csv") as f:
+        sections = [line[2:].strip() for line in f if line.startswith("# ")]
+    assert sections == ["net_revenue", "self_consumption", "self_sufficiency"] + report.REVENUES
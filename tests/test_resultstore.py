@@ -0,0 +1,101 @@
+import resultstore
+import scenario
+import session
+import kpi
+
+import json
+import sqlite3
+import numpy as np
+import pytest
+
+@pytest.fixture(scope = "module")
+def result():
+    sc = scenario.Scenario("scenario_test").variant("short", t_end = "2022-07-03 00:00")
+    return session.Session().run(sc)
+
+
+def test_run_round_trip(tmp_path, result):
+    with resultstore.ResultStore(tmp_path / "results.db") as store:
+        store.addResult(result)
+
+    with resultstore.ResultStore(tmp_path / "results.db") as store:
+        runs = store.query("SELECT * FROM runs")
+        assert len(runs) == 1
+        run = runs.iloc[0]
+        assert run["name"] == "short"
+        assert run["data_hash"] == resultstore.data_hash(result.scenario)
+        assert json.loads(run["scenario"]) == result.scenario.values
+        for col, value in resultstore.scenario_row(result.scenario).items():
+            assert run[col] == value or (value is None and run[col] is None)
+
+        kpis = store.query("SELECT name, value FROM kpis WHERE run_id = ?", (int(run["id"]),))
+        assert dict(zip(kpis["name"], kpis["value"])) == pytest.approx(result.kpis)
+
+        daily = store.daily(int(run["id"]))
+        expected = kpi.daily_kpis(result.log)
+        assert daily["date"].tolist() == expected["date"].tolist()
+        for col in resultstore.DAILY_COLUMNS:
+            np.testing.assert_allclose(daily[col], expected[col])
+
+
+def test_select_filters_and_columns(tmp_path, result):
+    base = result.scenario
+    with resultstore.ResultStore(tmp_path / "results.db", batch_size = 2) as store:
+        for battery in (10, 20, 30):
+            for policy in ("greedy", "optimizer"):
+                kpis = {"net_revenue": battery + (policy == "optimizer"), "violations": 0}
+                store.add(base.variant(f"b{battery}", battery_charge_max = battery, policy = policy), kpis)
+
+        selected = store.select(["net_revenue"], ["battery_charge_max"], policy = "optimizer")
+        assert sorted(selected["battery_charge_max"]) == [10, 20, 30]
+        assert sorted(selected["net_revenue"]) == [11, 21, 31]
+
+        selected = store.select(["net_revenue", "violations"], battery_charge_max = 20, fast_forward = False)
+        assert sorted(selected["net_revenue"]) == [20, 21]
+        assert (selected["violations"] == 0).all()
+
+        with pytest.raises(ValueError, match = "unknown scenario setting"):
+            store.select(["net_revenue"], ["battery_size"])
+
+
+def test_buffered_runs_are_written_on_close(tmp_path, result):
+    store = resultstore.ResultStore(tmp_path / "results.db", batch_size = 100)
+    store.add(result.scenario, result.kpis)
+    other = sqlite3.connect(tmp_path / "results.db")
+    assert other.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == 0
+    store.close()
+    assert other.execute("SELECT COUNT(*) FROM runs").fetchone()[0] == 1
+    other.close()
+
+
+def test_store_of_an_earlier_version_gets_new_columns(tmp_path, result, monkeypatch):
+    columns = dict(resultstore.SCENARIO_COLUMNS)
+    earlier = {col: sql_type for col, sql_type in columns.items() if col != "household_seed"}
+    monkeypatch.setattr(resultstore, "SCENARIO_COLUMNS", earlier)
+    with resultstore.ResultStore(tmp_path / "results.db") as store:
+        store.add(result.scenario, result.kpis)
+
+    monkeypatch.setattr(resultstore, "SCENARIO_COLUMNS", columns)
+    with resultstore.ResultStore(tmp_path / "results.db") as store:
+        store.add(result.scenario.variant("seed", household_seed = 3), result.kpis)
+        selected = store.select(["net_revenue"], ["household_seed"])
+    assert selected["household_seed"].isna().tolist() == [True, False]
+    assert selected["household_seed"].iloc[1] == 3
+
+
+def test_forecast_error_settings_are_queryable(tmp_path, result):
+    with resultstore.ResultStore(tmp_path / "results.db") as store:
+        for error in (0, 0.1, 0.3):
+            store.add(result.scenario.variant(f"error {error}", forecast_error_pv = error, forecast_error_seed = 7), result.kpis)
+        selected = store.select(["net_revenue"], ["forecast_error_pv", "forecast_error_seed"], forecast_error_pv = 0.3)
+    assert selected["forecast_error_pv"].tolist() == [0.3]
+    assert selected["forecast_error_seed"].tolist() == [7]
+
+
+def test_changes_are_stored_as_configured(tmp_path, result):
+    changes = [{"from": "2022-07-02 00:00", "grid-price-residential": 0.5}]
+    with resultstore.ResultStore(tmp_path / "results.db") as store:
+        store.add(result.scenario, result.kpis)
+        store.add(result.scenario.variant("changed", changes = changes), result.kpis)
+        selected = store.select(["net_revenue"], ["name", "changes"])
+    assert [json.loads(c) for c in selected.sort_values("name")["changes"]] == [changes, []]
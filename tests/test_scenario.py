@@ -0,0 +1,92 @@
+import scenario
+import session
+import environment as env
+import kpi
+import config
+
+import re
+import math
+import datetime as dt
+import pytest
+
+def test_t_delta_must_divide_a_day():
+    with pytest.raises(ValueError, match = "does not divide a day"):
+        scenario.Scenario("scenario_test").variant("t", t_delta = 7)
+
+
+def test_t_delta_must_be_aligned_with_the_start_and_gate_closures():
+    with pytest.raises(ValueError, match = "not aligned"):
+        scenario.Scenario("scenario_test").variant("t", t_delta = 60, t_start = "2022-07-01 00:30")
+    with pytest.raises(ValueError, match = "not aligned"):
+        scenario.Scenario("scenario_test").variant("t", t_delta = 60, day_ahead_closure = "11:45")
+
+
+@pytest.mark.parametrize("minutes, expected", [(5, 2 / 3), (15, 2), (60, 8)])
+def test_min_offer_quantity_is_scaled_with_the_time_step_size(minutes, expected):
+    sc = scenario.Scenario("scenario_test").variant("t", t_delta = minutes, min_offer_quantity = 2)
+    assert sc.min_offer_quantity == pytest.approx(expected)
+    sc.apply({"min-offer-quantity": 3})
+    assert sc.min_offer_quantity == pytest.approx(1.5 * expected)
+
+
+def test_offers_rounded_below_the_min_offer_quantity_are_valid():
+    sc = scenario.Scenario("scenario_test").variant("t", t_delta = 5, min_offer_quantity = 2)
+    market = env.Market(sc)
+    delivery = sc.t_start + dt.timedelta(hours = 1)
+    assert market.place_offer(("IC", delivery, math.nextafter(sc.min_offer_quantity, 0), 0.2))
+    assert market.place_offer(("IC", delivery, 2 / 3 - 1e-9, 0.2))
+    assert not market.place_offer(("IC", delivery, 0.66, 0.2))
+
+
+def violation_kinds(result) -> set:
+    """
+    :return: the kinds of the violations of a run, e.g. "invalid market offer", without the time steps and values
+    """
+
+    return set(re.sub(r"^\d+: ", "", text).split(":")[0] for text in result.violation_log["Text"])
+
+
+def test_other_time_step_sizes_cause_no_additional_violations():
+    s = session.Session()
+    base = scenario.Scenario("scenario_test").variant("t", min_offer_quantity = 2, t_end = "2022-07-03 00:00")
+    reference = s.run(base)
+    for minutes in (5, 30, 60):
+        result = s.run(base.variant("t", t_delta = minutes))
+        assert violation_kinds(result) <= violation_kinds(reference)
+
+
+@pytest.mark.parametrize("time", ["2022-07-01 00:00", "2022-07-08 00:15", "2022-06-30 12:00", "2022-07-02 00:05"])
+def test_changes_must_be_at_a_time_step_within_the_horizon(time):
+    with pytest.raises(ValueError, match = "is not a time step after the start"):
+        scenario.Scenario("scenario_test").variant("c", changes = [{"from": time, "grid-price-residential": 0.5}])
+
+
+def test_only_changeable_values_may_change():
+    with pytest.raises(ValueError, match = "pv-power-stc cannot change during a run"):
+        scenario.Scenario("scenario_test").variant("c", changes = [{"from": "2022-07-02 00:00", "pv-power-stc": 10}])
+    with pytest.raises(ValueError, match = "optimizer policy does not support changes"):
+        scenario.Scenario("scenario_test").variant("c", policy = "optimizer", changes = [{"from": "2022-07-02 00:00", "vola_da": 0}])
+
+
+def test_changes_are_sorted_and_applied():
+    changes = [{"from": "2022-07-05 00:00", "battery-charge-max": 12}, {"from": "2022-07-02 12:00", "grid-price-residential": 0.5}]
+    sc = scenario.Scenario("scenario_test").variant("c", changes = changes)
+    assert [t for (t, _) in sc.changes] == [dt.datetime(2022, 7, 2, 12), dt.datetime(2022, 7, 5)]
+
+    sc.apply(sc.changes[0][1])
+    assert sc.grid_price_residential == scenario.Scenario("scenario_test").variant("p", grid_price_residential = 0.5).grid_price_residential
+    assert sc.battery_charge_max == scenario.Scenario("scenario_test").battery_charge_max
+
+
+@pytest.mark.parametrize("name", ["scenario_40_middle", "scenario_80_high"])
+def test_hourly_kpis_stay_close_to_the_default_time_step_size(name):
+    s = session.Session()
+    base = scenario.Scenario(name).variant(name, fast_forward = True)
+    reference = s.run(base).kpis
+    hourly = s.run(base.variant(name, t_delta = 60)).kpis
+    assert abs(hourly["net_revenue"] - reference["net_revenue"]) <= config.RESOLUTION_MAX_DEVIATION * kpi.turnover(reference)
+    assert abs(hourly["revenue_grid"] - reference["revenue_grid"]) <= config.RESOLUTION_MAX_DEVIATION * kpi.turnover(reference)
+    assert abs(hourly["costs_grid"] - reference["costs_grid"]) <= config.RESOLUTION_MAX_DEVIATION * kpi.turnover(reference)
+    assert hourly["pv"] == pytest.approx(reference["pv"], rel = 1e-3)
+    assert hourly["load"] == pytest.approx(reference["load"], rel = 1e-3)
+    assert hourly["violations"] == 0
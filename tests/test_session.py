@@ -0,0 +1,89 @@
+import session
+import scenario
+import agent
+import optimizer
+import kpi
+import environment as env
+import config
+
+import json
+import numpy as np
+import pandas as pd
+import pytest
+
+def same(ag, result) -> None:
+    pd.testing.assert_frame_equal(ag.log_pd, result.log, check_exact = True)
+    pd.testing.assert_frame_equal(ag.action_log, result.actions, check_exact = True)
+    pd.testing.assert_frame_equal(ag.violation_log, result.violation_log, check_exact = True)
+    assert ag.violations == result.violations
+
+
+@pytest.mark.parametrize("settings", [dict(), dict(t_delta = 60, households = 3), dict(policy = "optimizer")])
+def test_session_runs_equal_agent_runs(settings):
+    sc = scenario.Scenario("scenario_test").variant("s", **settings)
+    ag = optimizer.OptimizerAgent(sc) if sc.policy == "optimizer" else agent.Agent(sc)
+    ag.run()
+    result = session.Session().run(sc)
+    same(ag, result)
+    assert result.kpis == kpi.compute_kpis(ag.log_pd, ag.action_log, ag.violations)
+
+
+def test_runs_share_the_data_but_not_their_views(monkeypatch):
+    reads = list()
+    read_series = env.read_series
+    def counted(sc, kind):
+        reads.append(kind)
+        return read_series(sc, kind)
+    monkeypatch.setattr(env, "read_series", counted)
+
+    base = scenario.Scenario("scenario_test")
+    variants = [base.variant("larger", pv_power_stc = 2 * base.pv_power_stc), base.variant("later", t_start = "2022-07-03 00:00"),
+                base.variant("hourly", t_delta = 60), base]
+    s = session.Session()
+    results = s.runMany(variants)
+    assert sorted(reads) == sorted(set(reads)) # every series is read once
+    assert len(s.data) == 1
+
+    # a variant run in between does not change the results of another one
+    for sc, result in zip(variants, results):
+        ag = agent.Agent(sc)
+        ag.run()
+        same(ag, result)
+
+
+def test_scenarios_are_given_as_names_dictionaries_or_objects():
+    s = session.Session()
+    with open(config.SCENARIO_PATH / "scenario_test.json") as f:
+        values = json.load(f)
+    by_name = s.run("scenario_test")
+    by_dict = s.run(values)
+    pd.testing.assert_frame_equal(by_name.log, by_dict.log, check_exact = True)
+    assert by_dict.scenario.name == "session"
+
+
+def test_views_are_resampled_to_the_time_step_size():
+    sc = scenario.Scenario("scenario_test")
+    hourly = sc.variant("hourly", t_delta = 60)
+    data = env.DataSet(sc)
+    quarter = data.view(sc, "load")
+    view = data.view(hourly, "load")
+    assert len(view) == hourly.number_of_intervals + hourly.forecast_steps
+    assert view["Time"].iloc[1] - view["Time"].iloc[0] == pd.Timedelta(minutes = 60)
+    column = config.DATA_COLUMNS["load"]
+    np.testing.assert_allclose(view[column].to_numpy()[:24], quarter[column].to_numpy()[:96].reshape(24, 4).sum(axis = 1))
+
+
+def test_kpis_and_daily_kpis_agree():
+    result = session.Session().run(scenario.Scenario("scenario_test"))
+    log = result.log
+    kpis = result.kpis
+    last = log.iloc[-1]
+    assert kpis["net_revenue"] == pytest.approx(last["offer_DA"] + last["offer_IA"] + last["offer_IC"] + last["grid_feedin"] - last["costs"])
+    for m in kpi.MARKETS:
+        assert kpis[f"offers_{m}"] == (result.actions["Market"] == m).sum()
+    assert kpis["steps"] == len(log)
+
+    daily = kpi.daily_kpis(log)
+    assert daily["date"].tolist() == sorted(set(pd.to_datetime(log["Time"]).dt.strftime("%Y-%m-%d")))
+    for col in ("net_revenue", "revenue_DA", "revenue_IA", "revenue_IC", "revenue_grid", "costs_grid", "pv", "load"):
+        assert daily[col].sum() == pytest.approx(kpis[col])
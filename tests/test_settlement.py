@@ -0,0 +1,53 @@
+import settlement
+import scenario
+import agent
+
+import numpy as np
+import pytest
+
+@pytest.fixture(scope = "module", params = [dict(), dict(t_delta = 60)])
+def run(request):
+    sc = scenario.Scenario("scenario_test").variant("s", **request.param)
+    ag = agent.Agent(sc)
+    ag.run()
+    return (sc, ag)
+
+
+def logged(ag) -> dict:
+    last = ag.log_pd.iloc[-1]
+    return {"revenue_DA": last["offer_DA"], "revenue_IA": last["offer_IA"], "revenue_IC": last["offer_IC"],
+            "revenue_grid": last["grid_feedin"], "costs_grid": last["costs"]}
+
+
+def test_revaluation_at_the_realized_prices_reproduces_the_run(run):
+    (sc, ag) = run
+    s = settlement.Settlement(ag.log_pd, ag.action_log, sc.t_start, sc.t_delta)
+    prices = settlement.realized_prices(ag.market, sc.number_of_intervals)
+    result = s.revalue(prices, sc.grid_price_residential, sc.grid_price_feedin)
+    expected = logged(ag)
+    for key, value in expected.items():
+        assert result[key] == pytest.approx(value, rel = 1e-9)
+    assert result["net_revenue"] == pytest.approx(expected["revenue_DA"] + expected["revenue_IA"] + expected["revenue_IC"] +
+                                                  expected["revenue_grid"] - expected["costs_grid"], rel = 1e-9)
+
+    # without prices, the logged values are kept
+    kept = s.revalue()
+    for key, value in expected.items():
+        assert kept[key] == pytest.approx(value, rel = 1e-9)
+
+
+def test_many_price_scenarios_at_once(run):
+    (sc, ag) = run
+    s = settlement.Settlement(ag.log_pd, ag.action_log, sc.t_start, sc.t_delta)
+    prices = settlement.realized_prices(ag.market, sc.number_of_intervals)
+    scenarios = settlement.perturbed_prices(prices, 20, 0.2, seed = 1)
+    tariffs = np.linspace(0.2, 0.4, 20)
+    result = s.revalue(scenarios, tariffs, sc.grid_price_feedin)
+    assert result["net_revenue"].shape == (20,)
+    for i in (0, 7, 19):
+        single = s.revalue({m: p[i] for m, p in scenarios.items()}, tariffs[i], sc.grid_price_feedin)
+        assert result["net_revenue"][i] == pytest.approx(single["net_revenue"])
+
+    summary = settlement.distribution(result["net_revenue"])
+    assert summary["p5"] <= summary["p50"] <= summary["p95"]
+    np.testing.assert_array_equal(scenarios["DA"], settlement.perturbed_prices(prices, 20, 0.2, seed = 1)["DA"])
@@ -0,0 +1,30 @@
+import sizing
+import scenario
+
+import datetime as dt
+
+def test_slices_keep_the_changes_in_effect_during_them():
+    changes = [{"from": "2022-07-06 00:00", "grid-price-residential": 0.7}, {"from": "2022-07-02 00:00", "grid-price-residential": 0.5},
+               {"from": "2022-07-03 12:00", "battery-charge-max": 8}, {"from": "2022-07-04 00:00", "vola_da": 0}]
+    sc = scenario.Scenario("scenario_test").variant("c", changes = changes)
+    sliced = sizing.slice_scenario(sc.values, dt.datetime(2022, 7, 3, 12), dt.datetime(2022, 7, 5))
+
+    assert (sliced.t_start, sliced.t_end) == (dt.datetime(2022, 7, 3, 12), dt.datetime(2022, 7, 5))
+    assert sliced.changes == [(dt.datetime(2022, 7, 4), {"vola_da": 0})]
+    assert sliced.grid_price_residential == sc.variant("p", grid_price_residential = 0.5).grid_price_residential
+    assert sliced.battery_charge_max == 8
+    assert sliced.fast_forward
+
+
+def test_slices_of_scenarios_without_changes():
+    sc = scenario.Scenario("scenario_test")
+    sliced = sizing.slice_scenario(sc.values, dt.datetime(2022, 7, 2), dt.datetime(2022, 7, 3))
+    assert sliced.changes == [] and "changes" not in sliced.values
+
+
+def test_time_slices_are_spread_over_the_horizon():
+    sc = scenario.Scenario("scenario_test")
+    slices = sizing.time_slices(sc, 3, days = 1)
+    assert slices[0] == (sc.t_start, sc.t_start + dt.timedelta(days = 1))
+    assert slices[-1] == (sc.t_end - dt.timedelta(days = 1), sc.t_end)
+    assert sizing.time_slices(sc, 7, days = 1) == [(sc.t_start, sc.t_end)]
@@ -0,0 +1,65 @@
+import snapshots
+import scenario
+import session
+
+import time
+import pandas as pd
+import pytest
+
+def test_eviction_deletes_the_least_recently_used_and_later_chain_positions_first(tmp_path):
+    cache = snapshots.SnapshotCache(tmp_path, max_bytes = 10 ** 9)
+    (earlier, later) = (time.time() - 100, time.time() - 50)
+    for (chain, start) in (("a", earlier), ("b", later)):
+        for position in range(3):
+            cache.put(f"{chain}{position}", {"rows": bytes(1000)}, snapshots.used_time(start, position))
+    size = (tmp_path / "a0.pkl").stat().st_size
+
+    def remaining() -> list:
+        return sorted(p.stem for p in tmp_path.glob("*.pkl"))
+
+    # using a snapshot of a chain makes it the most recently used
+    assert cache.get("a0", snapshots.used_time(time.time(), 0)) is not None
+
+    cache.max_bytes = 5.5 * size
+    cache.evict()
+    assert remaining() == ["a0", "b0", "b1", "b2"]
+
+    cache.max_bytes = 3.5 * size
+    cache.evict()
+    assert remaining() == ["a0", "b0", "b1"]
+    assert cache.size == 3 * size
+
+
+def test_the_cache_is_bounded_when_snapshots_are_put(tmp_path):
+    cache = snapshots.SnapshotCache(tmp_path, max_bytes = 10 ** 9)
+    cache.put("first", {"rows": bytes(1000)}, time.time() - 10)
+    size = (tmp_path / "first.pkl").stat().st_size
+    cache.max_bytes = 2.5 * size
+    cache.put("second", {"rows": bytes(1000)}, time.time() - 5)
+    cache.put("third", {"rows": bytes(1000)}, time.time())
+    assert sorted(p.stem for p in tmp_path.glob("*.pkl")) == ["second", "third"]
+
+
+def same(a, b) -> None:
+    pd.testing.assert_frame_equal(a.log, b.log, check_exact = True)
+    pd.testing.assert_frame_equal(a.actions, b.actions, check_exact = True)
+    pd.testing.assert_frame_equal(a.violation_log, b.violation_log, check_exact = True)
+    assert a.kpis == b.kpis
+
+
+@pytest.mark.parametrize("settings", [dict(), dict(fast_forward = True, ic_order_book = True)])
+def test_runs_continued_from_snapshots_are_identical_to_full_runs(tmp_path, settings):
+    sc = scenario.Scenario("scenario_test").variant("s", **settings)
+    changed = sc.variant("s", changes = [{"from": "2022-07-05 06:00", "grid-price-residential": 0.6, "battery-charge-max": 8}])
+    s = session.Session(snapshot_cache = snapshots.SnapshotCache(tmp_path))
+
+    # horizon extension
+    s.run(sc.variant("s", t_end = "2022-07-04 12:00"))
+    result = s.run(sc)
+    assert result.reused_steps == 3 * sc.steps_per_day
+    same(result, session.Session().run(sc))
+
+    # a change near the end
+    result = s.run(changed)
+    assert result.reused_steps == 4 * sc.steps_per_day
+    same(result, session.Session().run(changed))
@@ -0,0 +1,73 @@
+import synthdata
+import datastore
+import scenario
+import session
+import config
+
+import datetime as dt
+import numpy as np
+import pandas as pd
+import pytest
+
+START = dt.datetime(2031, 12, 20)
+
+@pytest.fixture(scope = "module")
+def series():
+    return synthdata.generate(START, 20, seed = 5)
+
+
+def test_generation_is_seeded(series):
+    again = synthdata.generate(START, 20, seed = 5)
+    other = synthdata.generate(START, 20, seed = 6)
+    for kind in config.DATA_FILES:
+        assert len(series[kind]) == 20 * synthdata.STEPS[kind]
+        np.testing.assert_array_equal(series[kind], again[kind])
+    assert any(not np.array_equal(series[kind], other[kind]) for kind in config.DATA_FILES)
+
+
+def test_source_days_match_the_season_and_day_type():
+    (_, source_dates) = synthdata.read_daily(config.DATA_PATH, "DA")
+    target_dates = pd.date_range("2030-12-01", "2032-02-15", freq = "D") # across two turns of the year and a leap year
+    chosen = source_dates[synthdata.source_days(source_dates, target_dates, np.random.default_rng(0))]
+
+    distance = np.abs(chosen.dayofyear.to_numpy() - target_dates.dayofyear.to_numpy())
+    assert (np.minimum(distance, 366 - distance) <= synthdata.SEASON_DAYS).all()
+    np.testing.assert_array_equal(chosen.dayofweek >= 5, target_dates.dayofweek >= 5)
+
+
+def test_all_series_of_a_day_come_from_the_same_source_day(series):
+    daily = {kind: synthdata.read_daily(config.DATA_PATH, kind) for kind in config.DATA_FILES}
+    for day in range(20):
+        sources = list()
+        for kind, (values, dates) in daily.items():
+            steps = synthdata.STEPS[kind]
+            rows = np.flatnonzero((values == series[kind][day * steps:(day + 1) * steps]).all(axis = 1))
+            sources.append(set(dates[rows]))
+        assert len(set.intersection(*sources)) > 0
+
+
+def test_output_in_the_data_folder_layout(tmp_path, series):
+    synthdata.write_csv(tmp_path, START, series)
+    for kind in config.DATA_FILES:
+        (values, dates) = synthdata.read_daily(tmp_path, kind)
+        assert dates[0] == START and len(dates) == 20
+        np.testing.assert_allclose(values.ravel(), series[kind])
+
+
+def test_output_in_the_store_layout(tmp_path, series):
+    store = datastore.DataStore(tmp_path / "store")
+    synthdata.write_store(store, START, series)
+    for kind in config.DATA_FILES:
+        np.testing.assert_array_equal(store.read(kind), series[kind])
+        assert store.info(kind)["step"] == dt.timedelta(days = 1) / synthdata.STEPS[kind]
+        assert store.end(kind) == START + dt.timedelta(days = 20)
+
+
+def test_runs_on_both_layouts_are_identical(tmp_path, series):
+    synthdata.write_csv(tmp_path / "data", START, series)
+    synthdata.write_store(datastore.DataStore(tmp_path / "store"), START, series)
+    sc = scenario.Scenario("scenario_test").variant("synthetic", t_start = "2031-12-21 00:00", t_end = "2032-01-05 00:00")
+    from_folder = session.Session().run(sc.variant("synthetic", data_path = str(tmp_path / "data")))
+    from_store = session.Session().run(sc.variant("synthetic", data_store = str(tmp_path / "store")))
+    assert from_folder.violations == 0
+    pd.testing.assert_frame_equal(from_folder.log, from_store.log)
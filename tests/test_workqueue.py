@@ -0,0 +1,192 @@
+import workqueue
+import resultstore
+import scenario
+import session
+import config
+
+import os
+import sys
+import time
+import subprocess
+import pandas as pd
+import pytest
+
+LEASE = 0.5 # [s]
+
+@pytest.fixture
+def queue(tmp_path):
+    return workqueue.WorkQueue(tmp_path / "queue", lease = LEASE, max_attempts = 3)
+
+
+def points(count) -> list:
+    sc = scenario.Scenario("scenario_test").variant("short", t_end = "2022-07-03 00:00")
+    return [sc.variant(f"short {battery}", battery_charge_max = battery) for battery in range(10, 10 + 5 * count, 5)]
+
+
+def expire(point) -> None:
+    """
+    Sets the last heartbeat of a claim to a time before the lease
+    """
+
+    past = time.time() - 10 * LEASE
+    os.utime(point["path"], (past, past))
+
+
+def complete(queue, point) -> bool:
+    daily = pd.DataFrame(dict({"date": ["2022-07-01"]}, **{col: [0.0] for col in resultstore.DAILY_COLUMNS}))
+    return queue.complete(point, "test", {"net_revenue": 1.0}, 0.1, daily, "hash")
+
+
+def test_duplicate_submissions_have_no_effect(queue):
+    sc = points(1)[0]
+    id = queue.submit(sc)
+    assert queue.submit(sc.variant(sc.name)) == id
+    assert queue.status() == {"pending": 1, "claimed": 0, "results": 0, "collected": 0, "failed": 0}
+
+    point = queue.claim("a")
+    queue.submit(sc)
+    assert queue.state(id) == "claimed"
+    assert complete(queue, point)
+    queue.submit(sc)
+    assert queue.status() == {"pending": 0, "claimed": 0, "results": 1, "collected": 0, "failed": 0}
+    assert queue.submit(sc.variant("other name")) != id
+
+
+def test_expired_leases_are_requeued(queue):
+    id = queue.submit(points(1)[0])
+    point = queue.claim("a")
+    assert queue.heartbeat(point)
+    assert queue.requeueStale() == 0
+
+    expire(point)
+    assert queue.requeueStale() == 1
+    assert queue.state(id) == "pending"
+    assert not queue.heartbeat(point)
+
+    point = queue.claim("b")
+    assert point["attempts"] == 1
+    assert point["path"].name == f"{id}@b.json"
+
+
+def test_points_fail_after_max_attempts(queue):
+    id = queue.submit(points(1)[0])
+    for _ in range(queue.max_attempts):
+        expire(queue.claim("a"))
+        queue.requeueStale()
+    assert queue.state(id) == "failed"
+    [failure] = queue.failures()
+    assert failure["attempts"] == queue.max_attempts
+    assert failure["error"] == f"lease expired {queue.max_attempts} times"
+    assert queue.claim("a") is None
+
+
+def test_late_results_and_errors_after_a_requeue_are_discarded(queue):
+    id = queue.submit(points(1)[0])
+    point = queue.claim("a")
+    expire(point)
+    queue.requeueStale()
+
+    assert not complete(queue, point)
+    assert not queue.fail(point, "a", "error")
+    assert queue.status() == {"pending": 1, "claimed": 0, "results": 0, "collected": 0, "failed": 0}
+
+    # the same after the point was claimed again by another worker, whose claim is kept
+    point_b = queue.claim("b")
+    assert not complete(queue, point)
+    assert queue.state(id) == "claimed"
+    assert complete(queue, point_b)
+    assert queue.status() == {"pending": 0, "claimed": 0, "results": 1, "collected": 0, "failed": 0}
+
+
+def test_runs_that_raise_are_failed(queue, monkeypatch):
+    def run(self, sc):
+        raise RuntimeError("no data")
+    monkeypatch.setattr(session.Session, "run", run)
+    id = queue.submit(points(1)[0])
+    assert workqueue.work(queue, "a", poll = 0.05) == 0
+    [failure] = queue.failures()
+    assert failure["id"] == id
+    assert failure["attempts"] == 1
+    assert "RuntimeError: no data" in failure["error"]
+
+
+@pytest.mark.parametrize("raises", [False, True])
+def test_a_stalled_worker_does_not_finish_a_requeued_point(queue, monkeypatch, raises):
+    # the first run stalls beyond its lease and the point is requeued by another worker meanwhile
+    original = session.Session.run
+    stalled = []
+    def run(self, sc):
+        if(len(stalled) == 0):
+            [claimed] = (queue.path / "claimed").glob("*.json")
+            stalled.append(claimed)
+            expire({"path": claimed})
+            assert queue.requeueStale() == 1
+            if(raises):
+                raise RuntimeError("stalled")
+        return original(self, sc)
+    monkeypatch.setattr(session.Session, "run", run)
+
+    id = queue.submit(points(1)[0])
+    assert workqueue.work(queue, "a", poll = 0.05) == 1
+    assert queue.status() == {"pending": 0, "claimed": 0, "results": 1, "collected": 0, "failed": 0}
+    [result] = queue.results()
+    assert result["id"] == id
+    assert result["attempts"] == 2
+
+
+def test_the_claim_of_a_killed_worker_is_run_by_another_one(queue):
+    id = queue.submit(points(1)[0])
+    claim = f"import workqueue, time; q = workqueue.WorkQueue({str(queue.path)!r}); q.claim('killed'); print('claimed', flush = True); time.sleep(60)"
+    killed = subprocess.Popen([sys.executable, "-c", claim], cwd = config.ROOT_PATH, stdout = subprocess.PIPE, text = True)
+    assert killed.stdout.readline() == "claimed\n"
+    killed.kill()
+    killed.wait()
+    killed.stdout.close()
+    assert queue.state(id) == "claimed"
+
+    assert workqueue.work(queue, "b", poll = 0.05) == 1
+    [result] = queue.results()
+    assert (result["worker"], result["attempts"]) == ("b", 2)
+
+
+def test_local_workers_run_all_points(queue):
+    sweep = points(4)
+    for sc in sweep:
+        queue.submit(sc)
+    workers = workqueue.start_workers(queue.path, 2)
+    for w in workers:
+        assert w.wait(timeout = 120) == 0
+    assert queue.status() == {"pending": 0, "claimed": 0, "results": 4, "collected": 0, "failed": 0}
+
+    expected = session.Session().run(sweep[2]).kpis
+    [result] = [r for r in queue.results() if r["name"] == sweep[2].name]
+    assert result["kpis"] == pytest.approx(expected)
+
+    with resultstore.ResultStore(queue.path / "results.db") as store:
+        assert queue.collect(store) == 4
+    assert queue.status() == {"pending": 0, "claimed": 0, "results": 0, "collected": 4, "failed": 0}
+    assert len(queue.results()) == 4 and len(queue.results(collected = False)) == 0
+    with resultstore.ResultStore(queue.path / "results.db") as store:
+        runs = store.query("SELECT name, data_hash FROM runs")
+    assert sorted(runs["name"]) == sorted(sc.name for sc in sweep)
+    assert set(runs["data_hash"]) == {resultstore.data_hash(sweep[0])}
+
+
+def test_results_are_collected_once_with_the_hash_of_the_worker(queue):
+    sweep = points(2)
+    for sc in sweep:
+        queue.submit(sc)
+    assert complete(queue, queue.claim("a"))
+    with resultstore.ResultStore(queue.path / "results.db") as store:
+        assert queue.collect(store) == 1
+        assert queue.collect(store) == 0
+        assert complete(queue, queue.claim("a"))
+        assert queue.collect(store) == 1
+        runs = store.query("SELECT name, data_hash FROM runs")
+    assert sorted(runs["name"]) == sorted(sc.name for sc in sweep)
+    assert runs["data_hash"].tolist() == ["hash", "hash"] # as written by the worker, not computed from the data of the coordinator
+
+    # collected points are finished, submitting them again has no effect
+    for sc in sweep:
+        queue.submit(sc)
+    assert queue.status() == {"pending": 0, "claimed": 0, "results": 0, "collected": 2, "failed": 0}
@@ -0,0 +1,411 @@
+import scenario
+import session
+import kpi
+import resultstore
+import config
+
+import os
+import sys
+import json
+import time
+import socket
+import hashlib
+import argparse
+import itertools
+import threading
+import traceback
+import subprocess
+from pathlib import Path
+import pandas as pd
+
+# This file contains a work queue in a directory on a shared filesystem, for running sweeps on several machines without a scheduler.
+# A coordinator submits sweep points, i.e. scenario configs as dictionaries, and any number of worker processes on any host
+# pull them, run them and write their results back. The queue consists of one JSON file per point in the folders
+#   pending/    points waiting for a worker
+#   claimed/    points being run, as <id>@<worker>.json, the modification time of the file is the last heartbeat of the worker
+#   results/    KPIs, daily aggregates and the hash of the input data of the finished points
+#   collected/  results that were written to a results store, so that collecting again does not add them twice
+#   failed/     points whose run raised an error, or whose lease expired too often
+# A worker claims a point by renaming its file from pending/ to claimed/, which succeeds for exactly one worker,
+# and renews its lease while the run progresses. Claims whose lease expired, e.g. because the worker or its host died,
+# are put back into pending/ by the next worker that looks for work. A point may therefore run twice if a worker
+# only stalled, the stalled worker then finds its claim gone and discards its result or error.
+#
+#   python workqueue.py submit <queue> scenario_40_middle --battery 10 20 30 --pv 20 40 60
+#   python workqueue.py work <queue>                   (on every machine, as often as there are CPUs)
+#   python workqueue.py status <queue>
+#   python workqueue.py collect <queue> --results output/results.db
+
+STATES = ["pending", "claimed", "results", "collected", "failed"]
+
+def point_id(name, values) -> str:
+    """
+    :return: the id of a sweep point, derived from its name and config so that submitting the same point again has no effect
+    """
+
+    text = json.dumps([name, values], sort_keys = True, default = str)
+    return hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def write_json(path, content) -> None:
+    """
+    Writes a JSON file atomically, so that other processes never see a partially written file
+    """
+
+    path = Path(path)
+    temporary = path.parent / f".{path.name}.{socket.gethostname()}.{os.getpid()}.tmp"
+    with open(temporary, "w") as f:
+        json.dump(content, f, default = str)
+    os.replace(temporary, path)
+
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class WorkQueue():
+    """
+    A work queue of sweep points in a directory on a shared filesystem
+    """
+
+    def __init__(self, path, lease = config.WORKQUEUE_LEASE, max_attempts = config.WORKQUEUE_MAX_ATTEMPTS) -> None:
+        """
+        :param path: the folder of the queue, created if it does not exist
+        :param lease: the time after the last heartbeat of a worker after which its claim is put back into the queue [s]
+        :param max_attempts: the number of expired leases of a point after which it is moved to failed/ instead of back into the queue
+        """
+
+        self.path = Path(path)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        for state in STATES + ["tmp"]:
+            (self.path / state).mkdir(parents = True, exist_ok = True)
+
+    def submit(self, sc : scenario.Scenario) -> str:
+        """
+        Adds a sweep point to the queue, unless it is already in the queue or finished
+        :param sc: the scenario of the point, it is submitted as its config dictionary
+        :return: the id of the point
+        """
+
+        id = point_id(sc.name, sc.values)
+        if(self.state(id) is None):
+            write_json(self.path / "pending" / f"{id}.json", {"id": id, "name": sc.name, "values": sc.values, "attempts": 0})
+        return id
+
+    def state(self, id):
+        """
+        :return: the state of a point, one of STATES, or None if it is not in the queue
+        """
+
+        for state in STATES:
+            if(state == "claimed"):
+                if(any((self.path / state).glob(f"{id}@*.json"))):
+                    return state
+            elif((self.path / state / f"{id}.json").exists()):
+                return state
+        return None
+
+    def status(self) -> dict:
+        """
+        :return: the number of points per state
+        """
+
+        return {state: len(list((self.path / state).glob("*.json"))) for state in STATES}
+
+    def claim(self, worker):
+        """
+        Claims the next pending point for a worker
+        :param worker: the name of the worker
+        :return: the point as a dictionary with the keys "id", "name", "values", "attempts" and "path" (of the claim file),
+        or None if no point is pending
+        """
+
+        pending = sorted(os.listdir(self.path / "pending"))
+        if(len(pending) == 0):
+            return None
+
+        # start at a position that depends on the worker, so that concurrent workers rarely compete for the same file
+        start = int(hashlib.sha1(worker.encode()).hexdigest(), 16) % len(pending)
+        for filename in pending[start:] + pending[:start]:
+            if(not filename.endswith(".json") or filename.startswith(".")):
+                continue
+            id = filename[:-len(".json")]
+            claimed = self.path / "claimed" / f"{id}@{worker}.json"
+            try:
+                os.rename(self.path / "pending" / filename, claimed) # atomic, only one worker succeeds
+            except FileNotFoundError:
+                continue # claimed by another worker in the meantime
+            os.utime(claimed) # the lease starts now, not at the submission
+
+            if(any((self.path / state / f"{id}.json").exists() for state in ("results", "collected"))): # finished by a worker whose lease had expired
+                claimed.unlink(missing_ok = True)
+                continue
+            point = read_json(claimed)
+            point["path"] = claimed
+            return point
+        return None
+
+    def heartbeat(self, point) -> bool:
+        """
+        Renews the lease of a claimed point
+        :return: whether the claim still exists, False if it was put back into the queue because the lease had expired
+        """
+
+        try:
+            os.utime(point["path"])
+            return True
+        except FileNotFoundError:
+            return False
+
+    def takeOver(self, point):
+        """
+        Takes over the claim of a point to finish it, so that it cannot be put back into the queue in the meantime
+        :return: the path of the taken over claim, or None if the claim was put back into the queue because its lease had expired
+        """
+
+        taken = self.path / "tmp" / f"{Path(point['path']).name}.{socket.gethostname()}.{os.getpid()}"
+        try:
+            os.rename(point["path"], taken)
+        except FileNotFoundError:
+            return None
+        return taken
+
+    def complete(self, point, worker, kpis, wall_time, daily, data_hash) -> bool:
+        """
+        Writes the result of a claimed point and removes the claim
+        :param point: the claimed point, see claim
+        :param worker: the name of the worker
+        :param kpis: the KPIs of the run, see kpi.compute_kpis
+        :param wall_time: the wall time of the run in seconds
+        :param daily: the daily aggregates of the run, see kpi.daily_kpis
+        :param data_hash: the hash of the input data the worker ran the point on, see resultstore.data_hash
+        :return: whether the result was written, False if the lease had expired and the point is back in the queue or failed
+        """
+
+        taken = self.takeOver(point)
+        if(taken is None):
+            return False
+        write_json(self.path / "results" / f"{point['id']}.json",
+                   {"id": point["id"], "name": point["name"], "values": point["values"], "worker": worker, "attempts": point["attempts"] + 1,
+                    "kpis": kpis, "wall_time": wall_time, "daily": daily.to_dict("records"), "data_hash": data_hash})
+        taken.unlink()
+        return True
+
+    def fail(self, point, worker, error) -> bool:
+        """
+        Moves a claimed point whose run raised an error to failed/
+        :param error: the error message
+        :return: whether the point was moved, False if the lease had expired and the point is back in the queue or failed
+        """
+
+        taken = self.takeOver(point)
+        if(taken is None):
+            return False
+        write_json(self.path / "failed" / f"{point['id']}.json",
+                   {"id": point["id"], "name": point["name"], "values": point["values"], "worker": worker, "attempts": point["attempts"] + 1,
+                    "error": error})
+        taken.unlink()
+        return True
+
+    def now(self) -> float:
+        """
+        :return: the current time of the shared filesystem, the lease times of workers on different hosts are compared with it
+        instead of the clock of this host
+        """
+
+        probe = self.path / "tmp" / f"now.{socket.gethostname()}.{os.getpid()}"
+        probe.touch()
+        now = probe.stat().st_mtime
+        probe.unlink()
+        return now
+
+    def requeueStale(self) -> int:
+        """
+        Puts the claims whose lease expired back into the queue, or moves them to failed/ after max_attempts claims
+        :return: the number of requeued points
+        """
+
+        claims = list((self.path / "claimed").glob("*.json"))
+        if(len(claims) == 0):
+            return 0
+
+        now = self.now()
+        requeued = 0
+        for claimed in claims:
+            try:
+                if(claimed.stat().st_mtime + self.lease > now):
+                    continue
+                # take over the claim first, so that only one of several workers that found it stale requeues it
+                taken = self.path / "tmp" / f"{claimed.name}.{socket.gethostname()}.{os.getpid()}"
+                os.rename(claimed, taken)
+            except FileNotFoundError:
+                continue # completed or taken over in the meantime
+
+            point = read_json(taken)
+            point["attempts"] += 1
+            if(point["attempts"] >= self.max_attempts):
+                point["error"] = f"lease expired {point['attempts']} times"
+                write_json(self.path / "failed" / f"{point['id']}.json", point)
+            else:
+                write_json(self.path / "pending" / f"{point['id']}.json", point)
+                requeued += 1
+            taken.unlink()
+        return requeued
+
+    def results(self, collected = True) -> list:
+        """
+        :param collected: whether to include the results that were already written to a results store
+        :return: the results of the finished points as dictionaries with the keys "id", "name", "values", "worker", "attempts",
+        "kpis", "wall_time", "daily" and "data_hash"
+        """
+
+        states = ["results", "collected"] if collected else ["results"]
+        paths = [path for state in states for path in (self.path / state).glob("*.json")]
+        return [read_json(path) for path in sorted(paths, key = lambda path: path.name)]
+
+    def failures(self) -> list:
+        """
+        :return: the failed points as dictionaries with the keys "id", "name", "values", "worker", "attempts" and "error"
+        """
+
+        return [read_json(path) for path in sorted((self.path / "failed").glob("*.json"))]
+
+    def collect(self, store) -> int:
+        """
+        Writes the results of the finished points that were not collected yet to a results store, with the hash of the input data
+        of the worker that ran them, and moves them to collected/
+        :param store: a resultstore.ResultStore
+        :return: the number of written results
+        """
+
+        results = self.results(collected = False)
+        for r in results:
+            store.add(scenario.Scenario(r["name"], r["values"]), r["kpis"], r["wall_time"], pd.DataFrame(r["daily"]), r["data_hash"])
+        store.flush()
+
+        # only moved once they are committed to the store, so that an interrupted collect writes them again instead of losing them
+        for r in results:
+            os.replace(self.path / "results" / f"{r['id']}.json", self.path / "collected" / f"{r['id']}.json")
+        return len(results)
+
+
+def worker_name() -> str:
+    """
+    :return: the name of this worker process, unique across the hosts that share the queue
+    """
+
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def work(queue : WorkQueue, worker = None, wait = False, poll = config.WORKQUEUE_POLL) -> int:
+    """
+    Runs the points of a queue until no point is left
+    :param queue: the queue
+    :param worker: the name of the worker, see worker_name if None
+    :param wait: whether to wait for new points when the queue is empty instead of returning,
+    the worker always waits as long as other workers hold claims that may still be requeued
+    :param poll: the time between two looks into an empty queue [s]
+    :return: the number of points whose result was written by this worker
+    """
+
+    worker = worker_name() if worker is None else worker
+    s = session.Session() # the data is read only once per worker
+    done = 0
+    while True:
+        point = queue.claim(worker)
+        if(point is None and queue.requeueStale() > 0):
+            point = queue.claim(worker)
+        if(point is None):
+            if(not wait and queue.status()["claimed"] == 0):
+                return done
+            time.sleep(poll)
+            continue
+
+        # renew the lease in the background while the run progresses
+        stop = threading.Event()
+        def renew():
+            while not stop.wait(queue.lease / 3):
+                if(not queue.heartbeat(point)):
+                    return
+        heartbeat = threading.Thread(target = renew, daemon = True)
+        heartbeat.start()
+        try:
+            result = s.run(scenario.Scenario(point["name"], point["values"]))
+        except Exception:
+            queue.fail(point, worker, traceback.format_exc())
+            continue
+        finally:
+            stop.set()
+            heartbeat.join()
+        if(queue.complete(point, worker, result.kpis, result.wall_time, kpi.daily_kpis(result.log), resultstore.data_hash(result.scenario))):
+            done += 1
+
+
+def start_workers(path, count, wait = False) -> list:
+    """
+    Starts worker processes on this host, e.g. to run a queue locally
+    :param path: the folder of the queue
+    :param count: the number of worker processes
+    :param wait: whether the workers wait for new points when the queue is empty, see work
+    :return: the list of subprocess.Popen of the workers
+    """
+
+    command = [sys.executable, str(config.ROOT_PATH / "workqueue.py"), "work", str(path)] + (["--wait"] if wait else [])
+    return [subprocess.Popen(command, cwd = config.ROOT_PATH) for _ in range(count)]
+
+
+def submit_grid(queue, name, battery_sizes, pv_sizes, load_multipliers = None) -> list:
+    """
+    Submits the full-horizon runs of all combinations of battery and pv sizes of a scenario
+    :param queue: the queue
+    :param name: the name of the base scenario
+    :param battery_sizes: the values of the maximum battery charge
+    :param pv_sizes: the values of the pv power under STC
+    :param load_multipliers: optional values of the load multiplier, the value of the scenario if None
+    :return: the ids of the points
+    """
+
+    sc = scenario.Scenario(name)
+    if(load_multipliers is None):
+        load_multipliers = [sc.load_multiplier]
+    return [queue.submit(sc.variant(name, battery_charge_max = battery, pv_power_stc = pv, load_multiplier = load))
+            for battery, pv, load in itertools.product(battery_sizes, pv_sizes, load_multipliers)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "work queue of sweep points in a folder on a shared filesystem")
+    commands = parser.add_subparsers(dest = "command", required = True)
+
+    submit = commands.add_parser("submit", help = "submit the runs of all combinations of battery and pv sizes of a scenario")
+    submit.add_argument("queue", help = "the folder of the queue")
+    submit.add_argument("scenario", help = "name of the base scenario in the scenarios folder")
+    submit.add_argument("--battery", type = float, nargs = "+", required = True, help = "maximum battery charges [kWh]")
+    submit.add_argument("--pv", type = float, nargs = "+", required = True, help = "pv powers under STC [kW]")
+    submit.add_argument("--load", type = float, nargs = "+", help = "load multipliers")
+
+    worker = commands.add_parser("work", help = "run points of the queue until it is empty")
+    worker.add_argument("queue", help = "the folder of the queue")
+    worker.add_argument("--wait", action = "store_true", help = "wait for new points instead of stopping when the queue is empty")
+    worker.add_argument("--lease", type = float, default = config.WORKQUEUE_LEASE, help = "lease time of a claim [s]")
+
+    status = commands.add_parser("status", help = "print the number of points per state")
+    status.add_argument("queue", help = "the folder of the queue")
+
+    collect = commands.add_parser("collect", help = "write the results of the finished points to a results store")
+    collect.add_argument("queue", help = "the folder of the queue")
+    collect.add_argument("--results", default = str(config.RESULTS_PATH), help = "the results store")
+    args = parser.parse_args()
+
+    if(args.command == "submit"):
+        ids = submit_grid(WorkQueue(args.queue), args.scenario, args.battery, args.pv, args.load)
+        print(f"{len(ids)} points submitted")
+    elif(args.command == "work"):
+        done = work(WorkQueue(args.queue, lease = args.lease), wait = args.wait)
+        print(f"{worker_name()}: {done} points run", file = sys.stderr)
+    elif(args.command == "status"):
+        print(", ".join(f"{state} {count}" for state, count in WorkQueue(args.queue).status().items()))
+    elif(args.command == "collect"):
+        with resultstore.ResultStore(args.results) as store:
+            print(f"{WorkQueue(args.queue).collect(store)} results written to {args.results}")